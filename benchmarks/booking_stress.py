@@ -0,0 +1,100 @@
+"""Concurrency stress test for booking-service reservations.
+
+Fires many parallel POST /bookings requests at a single room type for the
+same stay and reports throughput, latency percentiles and oversells (rooms
+handed out beyond what /availability reported free before the run).
+
+    python benchmarks/booking_stress.py --url http://localhost:5002 \
+        --hotel-id 1 --room-type-id 1 --requests 5000 --concurrency 200
+"""
+import argparse
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from load_stats import percentile
+
+
+def http(method, url, body=None, timeout=30):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'null')
+
+
+def free_rooms(args, check_in, check_out):
+    status, rooms = http('GET', f"{args.url}/availability?hotel_id={args.hotel_id}"
+                                f"&check_in={check_in}&check_out={check_out}")
+    if status != 200:
+        raise SystemExit(f"/availability returned {status}: {rooms}")
+    for room in rooms:
+        if room['id'] == args.room_type_id:
+            return room['available_rooms']
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5002')
+    parser.add_argument('--hotel-id', type=int, default=1)
+    parser.add_argument('--room-type-id', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--nights', type=int, default=3)
+    args = parser.parse_args()
+
+    # A random far-future stay keeps repeated runs independent of each other
+    check_in = date.today() + timedelta(days=random.randint(3650, 7300))
+    check_out = check_in + timedelta(days=args.nights)
+    before = free_rooms(args, check_in, check_out)
+
+    booking = {
+        'user_id': 1,
+        'hotel_id': args.hotel_id,
+        'room_type_id': args.room_type_id,
+        'check_in_date': check_in.isoformat(),
+        'check_out_date': check_out.isoformat(),
+        'total_amount': 100,
+        'guest_name': 'Stress Test',
+        'guest_email': 'stress@example.com',
+        'guest_phone': '000',
+    }
+
+    def attempt(_):
+        started = time.perf_counter()
+        status, _body = http('POST', f"{args.url}/bookings", booking)
+        return status, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(attempt, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+    created = sum(1 for status, _ in results if status == 201)
+    rejected = sum(1 for status, _ in results if status == 400)
+    errors = len(results) - created - rejected
+    after = free_rooms(args, check_in, check_out)
+
+    print(f"Stay:              {check_in} -> {check_out} ({args.nights} nights)")
+    print(f"Free before/after: {before} / {after}")
+    print(f"Requests:          {len(results)} at concurrency {args.concurrency}")
+    print(f"Created:           {created}")
+    print(f"Sold out (400):    {rejected}")
+    print(f"Errors:            {errors}")
+    print(f"Oversells:         {max(0, created - before)}")
+    print(f"Throughput:        {len(results) / elapsed:.1f} req/s")
+    print(f"Latency p50:       {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"Latency p99:       {percentile(latencies, 99) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Closed-loop HTTP load generator for comparing service entry points.
+
+Each client thread keeps one keep-alive connection and sends GET requests
+back to back for the given duration, cycling through the given paths.
+Several targets can be measured in one run, e.g. the Flask development
+server against gunicorn:
+
+    cd hotel-service
+    PYTHONPATH=.. python app.py                                   # :5001
+    PORT=6001 PYTHONPATH=.. gunicorn -c ../common/gunicorn_conf.py app:app
+
+    python benchmarks/http_load.py --path /hotels \
+        --target dev=http://localhost:5001 --target gunicorn=http://localhost:6001
+
+or the gunicorn app against the asyncio variant of the same service:
+
+    PORT=5005 PYTHONPATH=.. gunicorn -c ../common/gunicorn_conf.py app:app
+    PYTHONPATH=.. hypercorn --bind 0.0.0.0:6005 --workers 2 aio_app:app
+
+    python benchmarks/http_load.py --concurrency 500 \
+        --path /payments/user/1 --path /invoices/user/1 \
+        --target flask=http://localhost:5005 --target asyncio=http://localhost:6005
+"""
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+from load_stats import percentile
+
+
+def run(base_url, paths, concurrency, duration):
+    parts = urlsplit(base_url)
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        local_latencies, local_errors = [], 0
+        sent = 0
+        while time.perf_counter() < deadline:
+            path = paths[sent % len(paths)]
+            sent += 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.status >= 400:
+                    local_errors += 1
+                if resp.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+            except Exception:
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            local_latencies.append(time.perf_counter() - started)
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', action='append', required=True,
+                        help='label=base_url, may be repeated')
+    parser.add_argument('--path', action='append',
+                        help='request path, may be repeated (default /health)')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=15)
+    args = parser.parse_args()
+
+    print(f"{'target':<12} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for target in args.target:
+        label, _, url = target.partition('=')
+        result = run(url, args.path or ['/health'], args.concurrency, args.duration)
+        print(f"{label:<12} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+              f"{result['p50']:>8.1f} {result['p99']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
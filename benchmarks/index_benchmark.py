@@ -0,0 +1,234 @@
+"""Time the hot per-user / per-hotel queries with and without the indexes
+added by migration 2 (common/migrate.py).
+
+Seeds a scratch database with millions of rows (generated server-side, so
+seeding takes minutes rather than hours), drops the migration 2 indexes,
+times each query, applies the migration and times them again:
+
+    PYTHONPATH=. python benchmarks/index_benchmark.py --database hotel_booking_bench \\
+        --bookings 2000000 --reviews 1000000 --payments 1000000
+
+Uses the DB_HOST/DB_USER/DB_PASSWORD/DB_PORT settings of the services; the
+database named by --database is created if needed and should not be the
+live one. Seeding is skipped when the tables already hold data.
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+import mysql.connector
+
+from common import migrate
+from common.db import DB_CONFIG
+
+CHUNK = 100000
+
+QUERIES = [
+    ("bookings by user (GET /bookings/<user_id>)", """
+        SELECT b.*, h.name as hotel_name, h.location
+        FROM bookings b
+        JOIN hotels h ON b.hotel_id = h.id
+        WHERE b.user_id = %s
+        ORDER BY b.created_at DESC
+    """, lambda a: (random.randint(1, a.users),)),
+    ("overlapping bookings for a room type", """
+        SELECT COUNT(*) FROM bookings
+        WHERE hotel_id = %s AND room_type_id = %s AND status != 'cancelled'
+        AND check_in_date < %s AND check_out_date > %s
+    """, lambda a: _stay_params(a)),
+    ("reviews by hotel (GET /reviews/hotel/<id>)", """
+        SELECT r.*, u.username, u.first_name, u.last_name
+        FROM reviews r
+        LEFT JOIN users u ON r.user_id = u.id
+        WHERE r.hotel_id = %s
+        ORDER BY r.created_at DESC
+        LIMIT 100
+    """, lambda a: (random.randint(1, a.hotels),)),
+    ("payments by user (GET /payments/user/<id>)", """
+        SELECT * FROM payments WHERE user_id = %s ORDER BY created_at DESC
+    """, lambda a: (random.randint(1, a.users),)),
+    ("invoices by user (GET /invoices/user/<id>)", """
+        SELECT * FROM invoices WHERE user_id = %s ORDER BY created_at DESC
+    """, lambda a: (random.randint(1, a.users),)),
+    ("first keyset page (GET /bookings/all?limit=50)", """
+        SELECT * FROM bookings ORDER BY created_at DESC, id DESC LIMIT 50
+    """, lambda a: ()),
+    ("expired session batch (sweeper)", """
+        SELECT id FROM user_sessions WHERE expires_at < NOW() LIMIT 1000
+    """, lambda a: ()),
+]
+
+
+def _stay_params(args):
+    hotel_id = random.randint(1, args.hotels)
+    room_type_id = (hotel_id - 1) * 2 + random.randint(1, 2)
+    check_in = date(2024, 1, 1) + timedelta(days=random.randint(0, 729))
+    return hotel_id, room_type_id, check_in + timedelta(days=3), check_in
+
+
+def _seq(count):
+    return f"WITH RECURSIVE seq (n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM seq WHERE n < {count})"
+
+
+def insert_generated(cursor, conn, label, total, sql):
+    """Run `sql` (an INSERT ... SELECT over seq) in chunks of CHUNK rows."""
+    started = time.monotonic()
+    done = 0
+    while done < total:
+        count = min(CHUNK, total - done)
+        cursor.execute(sql.format(seq=_seq(count), offset=done))
+        conn.commit()
+        done += count
+        print(f"\r  {label}: {done:,}/{total:,}", end='', flush=True)
+    print(f"  ({time.monotonic() - started:.0f}s)")
+
+
+def seed(conn, args):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM bookings")
+    if cursor.fetchone()[0] and not args.reseed:
+        print("Tables already seeded; pass --reseed to start over")
+        return
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in ('room_types', 'user_sessions', 'bookings', 'reviews', 'payments', 'invoices',
+                  'hotels', 'users'):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    cursor.execute(f"SET SESSION cte_max_recursion_depth = {CHUNK + 1}")
+
+    print("Seeding")
+    insert_generated(cursor, conn, "hotels", args.hotels, """
+        INSERT INTO hotels (name, location, description, amenities, price_per_night, total_rooms)
+        {seq}
+        SELECT CONCAT('Hotel ', n + {offset}), CONCAT('City ', (n + {offset}) MOD 200), '',
+               'WiFi, Pool', 50 + (n MOD 400), 50
+        FROM seq
+    """)
+    insert_generated(cursor, conn, "room types", args.hotels * 2, """
+        INSERT INTO room_types (hotel_id, type_name, price, capacity, amenities)
+        {seq}
+        SELECT 1 + FLOOR((n + {offset} - 1) / 2), IF(n MOD 2, 'Standard', 'Deluxe'), 100, 2, ''
+        FROM seq
+    """)
+    insert_generated(cursor, conn, "users", args.users, """
+        INSERT INTO users (username, email, password_hash, created_at)
+        {seq}
+        SELECT CONCAT('user', n + {offset}), CONCAT('user', n + {offset}, '@example.com'), '',
+               NOW() - INTERVAL FLOOR(RAND() * 1000) DAY
+        FROM seq
+    """)
+    insert_generated(cursor, conn, "bookings", args.bookings, f"""
+        INSERT INTO bookings (user_id, hotel_id, room_type_id, check_in_date, check_out_date,
+                              total_amount, status, created_at)
+        {{seq}}
+        SELECT user_id, hotel_id, (hotel_id - 1) * 2 + 1 + FLOOR(RAND() * 2),
+               check_in, check_in + INTERVAL nights DAY, 100 * nights,
+               ELT(1 + FLOOR(RAND() * 3), 'pending', 'confirmed', 'cancelled'),
+               TIMESTAMP(check_in) - INTERVAL FLOOR(RAND() * 120) DAY
+        FROM (
+            SELECT 1 + FLOOR(RAND() * {args.users}) as user_id,
+                   1 + FLOOR(RAND() * {args.hotels}) as hotel_id,
+                   DATE('2024-01-01') + INTERVAL FLOOR(RAND() * 730) DAY as check_in,
+                   1 + FLOOR(RAND() * 7) as nights
+            FROM seq
+        ) s
+    """)
+    insert_generated(cursor, conn, "reviews", args.reviews, f"""
+        INSERT INTO reviews (user_id, hotel_id, rating, comment, created_at)
+        {{seq}}
+        SELECT 1 + FLOOR(RAND() * {args.users}), 1 + FLOOR(RAND() * {args.hotels}),
+               1 + FLOOR(RAND() * 5), 'Seeded review', NOW() - INTERVAL FLOOR(RAND() * 1000) DAY
+        FROM seq
+    """)
+    for table in ('payments', 'invoices'):
+        number = 'transaction_id' if table == 'payments' else 'invoice_number'
+        prefix = 'TXN' if table == 'payments' else 'INV'
+        insert_generated(cursor, conn, table, args.payments, f"""
+            INSERT INTO {table} (booking_id, user_id, amount, {number}, created_at)
+            {{seq}}
+            SELECT n + {{offset}}, 1 + FLOOR(RAND() * {args.users}), 100,
+                   CONCAT('{prefix}', n + {{offset}}), NOW() - INTERVAL FLOOR(RAND() * 1000) DAY
+            FROM seq
+        """)
+    insert_generated(cursor, conn, "sessions", args.sessions, f"""
+        INSERT INTO user_sessions (user_id, session_token, expires_at)
+        {{seq}}
+        SELECT 1 + FLOOR(RAND() * {args.users}), CONCAT('token', n + {{offset}}),
+               NOW() + INTERVAL (FLOOR(RAND() * 96) - 48) HOUR
+        FROM seq
+    """)
+    cursor.execute("ANALYZE TABLE bookings, reviews, payments, invoices, users, user_sessions")
+    cursor.fetchall()
+    cursor.close()
+
+
+def drop_indexes(conn):
+    cursor = conn.cursor()
+    for index in migrate.HOT_PATH_INDEXES:
+        if migrate.index_exists(cursor, index.table, index.name):
+            cursor.execute(f"ALTER TABLE {index.table} DROP INDEX {index.name}")
+    migrate.ensure_version_table(cursor)
+    cursor.execute("DELETE FROM schema_migrations WHERE version >= 2")
+    conn.commit()
+    cursor.close()
+
+
+def time_queries(conn, args):
+    cursor = conn.cursor()
+    results = {}
+    for label, sql, params in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            query_params = params(args)
+            started = time.perf_counter()
+            cursor.execute(sql, query_params)
+            cursor.fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[label] = statistics.median(samples)
+    cursor.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare hot query times before and after migration 2")
+    parser.add_argument('--database', default='hotel_booking_bench')
+    parser.add_argument('--hotels', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--bookings', type=int, default=2000000)
+    parser.add_argument('--reviews', type=int, default=1000000)
+    parser.add_argument('--payments', type=int, default=1000000, help="payments and invoices each")
+    parser.add_argument('--sessions', type=int, default=500000)
+    parser.add_argument('--repeat', type=int, default=20, help="runs per query (median is reported)")
+    parser.add_argument('--reseed', action='store_true')
+    args = parser.parse_args()
+
+    server = dict(DB_CONFIG)
+    server.pop('database')
+    conn = mysql.connector.connect(**server)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {args.database}")
+    cursor.close()
+    conn.database = args.database
+
+    migrate.migrate(conn, target=1)
+    seed(conn, args)
+
+    print("Dropping migration 2 indexes")
+    drop_indexes(conn)
+    before = time_queries(conn, args)
+
+    migrate.migrate(conn, target=2)
+    after = time_queries(conn, args)
+    conn.close()
+
+    width = max(len(label) for label, _, _ in QUERIES)
+    print(f"\n{'query':{width}}  {'before ms':>10}  {'after ms':>10}  {'speedup':>8}")
+    for label, _, _ in QUERIES:
+        speedup = before[label] / after[label] if after[label] else float('inf')
+        print(f"{label:{width}}  {before[label]:10.2f}  {after[label]:10.2f}  {speedup:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Compare JSON encoding of a large /bookings/all payload: Flask's default
+provider on dict rows against common.fast_json on tuple rows.
+
+No database is needed; rows with the column types of the /bookings/all
+query (ints, DECIMAL, DATE, TIMESTAMP, strings) are generated in memory:
+
+    PYTHONPATH=. python benchmarks/json_benchmark.py --rows 100000
+
+Each variant also includes building its rows the way the cursor would
+hand them over (dicts for dictionary=True, tuples otherwise), and the
+outputs are checked to parse to the same JSON. They are not byte-identical
+in general: orjson writes non-ASCII text as UTF-8 where Flask escapes it.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+
+from common import fast_json
+
+# (name, MySQL type code) as in cursor.description
+COLUMNS = [
+    ('id', 3), ('user_id', 3), ('hotel_id', 3), ('room_type_id', 3),
+    ('check_in_date', 10), ('check_out_date', 10), ('guests', 3),
+    ('total_amount', 246), ('status', 253), ('created_at', 7), ('updated_at', 7),
+    ('hotel_name', 253), ('location', 253), ('guest_name', 253),
+]
+
+
+def generate_rows(count):
+    rng = random.Random(42)
+    start = datetime(2025, 1, 1)
+    rows = []
+    for i in range(count):
+        check_in = date(2025, 1, 1) + timedelta(days=rng.randint(0, 365))
+        created = start + timedelta(seconds=rng.randint(0, 300 * 86400))
+        rows.append((
+            count - i, rng.randint(1, 200000), rng.randint(1, 5000), rng.randint(1, 20000),
+            check_in, check_in + timedelta(days=rng.randint(1, 14)), rng.randint(1, 4),
+            Decimal(rng.randint(5000, 500000)) / 100, rng.choice(['confirmed', 'cancelled', 'pending']),
+            created, created + timedelta(minutes=rng.randint(0, 600)),
+            f"Hotel {rng.randint(1, 5000)}", rng.choice(['Mumbai', 'Delhi', 'Goa', 'Pune']),
+            f"Guest {i}",
+        ))
+    return rows
+
+
+def flask_provider(app, rows):
+    names = [name for name, _ in COLUMNS]
+    dicts = [dict(zip(names, row)) for row in rows]
+    with app.app_context():
+        # What jsonify() sends: compact, sorted keys
+        return app.json.response(dicts).get_data()
+
+
+def fast_rows(rows):
+    return fast_json.RowEncoder(COLUMNS).encode(rows)
+
+
+def measure(fn, repeat):
+    times, out = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5, help="runs per variant (median is reported)")
+    args = parser.parse_args()
+
+    rows = generate_rows(args.rows)
+    app = Flask(__name__)
+    fast_app = Flask(__name__)
+    fast_app.json = fast_json.FastJSONProvider(fast_app)
+    print(f"{args.rows} rows, {len(COLUMNS)} columns, "
+          f"orjson {'available' if fast_json.orjson else 'not installed (stdlib fallback)'}")
+
+    baseline, expected = measure(lambda: flask_provider(app, rows), args.repeat)
+    print(f"  flask default provider, dict rows: {baseline * 1000:8.0f} ms  {len(expected) / 1e6:.1f} MB")
+    expected = json.loads(expected)
+    variants = [
+        ("FastJSONProvider, dict rows", lambda: flask_provider(fast_app, rows)),
+        ("RowEncoder, tuple rows", lambda: fast_rows(rows) + b'\n'),
+    ]
+    for label, fn in variants:
+        elapsed, body = measure(fn, args.repeat)
+        print(f"  {label + ':':34s}{elapsed * 1000:8.0f} ms  ({baseline / elapsed:.1f}x)"
+              f"  {'same JSON' if json.loads(body) == expected else 'OUTPUT DIFFERS'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+"""Latency statistics shared by the load benchmarks (http_load.py, booking_stress.py)."""
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
@@ -0,0 +1,277 @@
+"""asyncio variant of the booking service, a benchmark target.
+
+Serves the core booking routes of app.py with the same JSON shapes on Quart
+and aiomysql, so a worker keeps handling other requests while one waits on
+MySQL:
+
+    pip install -r requirements-async.txt
+    PYTHONPATH=.. hypercorn --bind 0.0.0.0:5002 --workers 2 aio_app:app
+
+It is not a deployment target: the /analytics endpoints,
+/availability/rebuild, /live, /ready, /metrics, /debug/queries,
+conditional GETs, compression, Idempotency-Key and read replicas exist
+only in app.py, which the container runs.
+"""
+import aiomysql
+import pymysql
+from quart import Quart, jsonify, request
+from quart_cors import cors
+
+from common.aio_db import close_pool, connection, init_pool, pool_stats
+from common.aio_pagination import keyset_response
+from common.db import get_db_connection
+from common import archive, conditional
+from common import rollups
+import availability
+import payment_events
+
+app = cors(Quart(__name__), allow_origin='*')
+
+@app.before_serving
+async def startup():
+    # Warm the pool; if MySQL is not up yet the first request retries
+    try:
+        await init_pool()
+    except Exception as e:
+        print(f"Error connecting to database: {e}")
+    # The archiver is a thread on the blocking pool, as in app.py
+    archive.start_archiver(get_db_connection)
+
+@app.after_serving
+async def shutdown():
+    await close_pool()
+
+async def try_reserve(cursor, hotel_id, room_type_id, check_in, check_out):
+    nights = availability.stay_nights(check_in, check_out)
+    if not nights:
+        return False
+    await cursor.executemany(availability.ENSURE_NIGHTS_SQL,
+                             availability.ensure_nights_params(hotel_id, room_type_id, nights))
+    await cursor.execute(availability.RESERVE_SQL,
+                         availability.reserve_params(hotel_id, room_type_id, nights))
+    return cursor.rowcount == len(nights)
+
+async def release(cursor, hotel_id, room_type_id, check_in, check_out):
+    nights = availability.stay_nights(check_in, check_out)
+    if not nights:
+        return
+    await cursor.executemany(availability.ENSURE_NIGHTS_SQL,
+                             availability.ensure_nights_params(hotel_id, room_type_id, nights))
+    await cursor.execute(availability.RELEASE_SQL,
+                         availability.release_params(hotel_id, room_type_id, nights))
+
+async def get_booking_stay(cursor, booking_id):
+    await cursor.execute("""
+        SELECT hotel_id, room_type_id, check_in_date, check_out_date, status
+        FROM bookings WHERE id = %s
+        FOR UPDATE
+    """, (booking_id,))
+    return await cursor.fetchone()
+
+async def missing_booking(cursor, booking_id):
+    await cursor.execute(archive.archived_row_sql('bookings'), (booking_id,))
+    if await cursor.fetchone():
+        return jsonify({"error": "Booking is archived and can no longer be changed"}), 409
+    return jsonify({"error": "Booking not found"}), 404
+
+async def apply_payment_events(cursor, events):
+    # Same steps as payment_events.apply_payment_events()
+    known = payment_events.known_events(events)
+    if not known:
+        return payment_events.result(events, known, [], [], [], set())
+    await cursor.execute(payment_events.seen_sql(len(known)), payment_events.seen_params(known))
+    fresh = payment_events.new_events(known, await cursor.fetchall())
+    if not fresh:
+        return payment_events.result(events, known, fresh, [], [], set())
+
+    await cursor.executemany(payment_events.RECORD_SQL, [(event['type'], event['key']) for event in fresh])
+
+    booking_ids = sorted({event['booking_id'] for event in fresh})
+    to_confirm = {event['booking_id'] for event in fresh
+                  if event['type'] == payment_events.PAYMENT_COMPLETED}
+    await cursor.execute(payment_events.lock_bookings_sql(len(booking_ids)), booking_ids)
+    confirmed, unavailable, hotels = [], [], {}
+    for booking_id, hotel_id, room_type_id, check_in, check_out, status in await cursor.fetchall():
+        hotels[booking_id] = hotel_id
+        if booking_id not in to_confirm or status == 'confirmed':
+            continue
+        if status == 'cancelled':
+            await cursor.execute(payment_events.SAVEPOINT_SQL)
+            if not await try_reserve(cursor, hotel_id, room_type_id, check_in, check_out):
+                await cursor.execute(payment_events.ROLLBACK_SAVEPOINT_SQL)
+                unavailable.append(booking_id)
+                continue
+        confirmed.append(booking_id)
+    if confirmed:
+        await cursor.execute(payment_events.confirm_sql(len(confirmed)), confirmed)
+    revenue = payment_events.revenue_params(fresh, hotels)
+    if revenue:
+        await cursor.executemany(rollups.RECORD_REVENUE_SQL, revenue)
+    return payment_events.result(events, known, fresh, confirmed, unavailable, set(hotels))
+
+async def bump_versions(*tables):
+    # Same counters as app.py's @changes, bumped once the write has committed
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(conditional.BUMP_SQL, conditional.bump_params(tables))
+                await conn.commit()
+    except Exception as e:
+        print(f"Error bumping table versions: {e}")
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    return jsonify({"status": "healthy", "service": "booking-service", "db_pool": pool_stats()})
+
+@app.route('/bookings', methods=['POST'])
+async def create_booking():
+    try:
+        data = await request.get_json()
+        availability.stay_dates(data, 'check_in_date', 'check_out_date')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                for attempt in range(availability.RESERVE_ATTEMPTS):
+                    try:
+                        if not await try_reserve(cursor, data['hotel_id'], data['room_type_id'],
+                                                 data['check_in_date'], data['check_out_date']):
+                            await conn.rollback()
+                            return jsonify({"error": "No rooms available for selected dates"}), 400
+
+                        await cursor.execute("""
+                            INSERT INTO bookings (user_id, hotel_id, room_type_id, check_in_date,
+                                                check_out_date, total_amount, guest_name, guest_email, guest_phone)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        """, (data['user_id'], data['hotel_id'], data['room_type_id'],
+                              data['check_in_date'], data['check_out_date'], data['total_amount'],
+                              data['guest_name'], data['guest_email'], data['guest_phone']))
+
+                        booking_id = cursor.lastrowid
+                        await cursor.execute(
+                            rollups.BOOKING_STATS_UPSERT.format(source=rollups.NEW_BOOKING_SOURCE),
+                            rollups.record_booking_params(data['hotel_id'], data['check_in_date'],
+                                                          data['check_out_date'], data['total_amount']))
+                        await conn.commit()
+                        break
+                    except pymysql.err.OperationalError as e:
+                        await conn.rollback()
+                        if e.args[0] not in availability.RETRYABLE_ERRORS or attempt == availability.RESERVE_ATTEMPTS - 1:
+                            raise
+
+        await bump_versions('bookings')
+        return jsonify({"message": "Booking created successfully", "booking_id": booking_id}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/bookings/<int:user_id>', methods=['GET'])
+async def get_user_bookings(user_id):
+    try:
+        async with connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                sql, params = archive.history("""
+                    SELECT b.*, h.name as hotel_name, h.location
+                    FROM {bookings} b
+                    JOIN hotels h ON b.hotel_id = h.id
+                    WHERE b.user_id = %s
+                """, (user_id,))
+                await cursor.execute(sql + " ORDER BY created_at DESC", params)
+                bookings = await cursor.fetchall()
+        return jsonify(bookings)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/bookings/all', methods=['GET'])
+async def get_all_bookings():
+    try:
+        return await keyset_response(app, """
+            SELECT b.*, h.name as hotel_name, h.location
+            FROM {bookings} b
+            JOIN hotels h ON b.hotel_id = h.id
+        """.format(**archive.requested_tables(request.args)), key_prefix='b.')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/bookings/<int:booking_id>/confirm', methods=['PUT'])
+async def confirm_booking(booking_id):
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                booking = await get_booking_stay(cursor, booking_id)
+                if booking is None:
+                    response = await missing_booking(cursor, booking_id)
+                    await conn.rollback()
+                    return response
+
+                # A cancelled booking gave its rooms back, so it has to take them again
+                if booking[4] == 'cancelled':
+                    if not await try_reserve(cursor, *booking[:4]):
+                        await conn.rollback()
+                        return jsonify({"error": "No rooms available for selected dates"}), 400
+
+                await cursor.execute("UPDATE bookings SET status = 'confirmed' WHERE id = %s", (booking_id,))
+                await conn.commit()
+        await bump_versions('bookings')
+        return jsonify({"message": "Booking confirmed successfully"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/bookings/<int:booking_id>/cancel', methods=['PUT'])
+async def cancel_booking(booking_id):
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                booking = await get_booking_stay(cursor, booking_id)
+                if booking is None:
+                    response = await missing_booking(cursor, booking_id)
+                    await conn.rollback()
+                    return response
+
+                if booking[4] != 'cancelled':
+                    await release(cursor, *booking[:4])
+
+                await cursor.execute("UPDATE bookings SET status = 'cancelled' WHERE id = %s", (booking_id,))
+                await conn.commit()
+        await bump_versions('bookings')
+        return jsonify({"message": "Booking cancelled successfully"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/events/payments', methods=['POST'])
+async def consume_payment_events():
+    try:
+        events = (await request.get_json())['events']
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                for attempt in range(availability.RESERVE_ATTEMPTS):
+                    try:
+                        summary = await apply_payment_events(cursor, events)
+                        await conn.commit()
+                        break
+                    except pymysql.err.OperationalError as e:
+                        await conn.rollback()
+                        if e.args[0] not in availability.RETRYABLE_ERRORS or attempt == availability.RESERVE_ATTEMPTS - 1:
+                            raise
+        await bump_versions('bookings')
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/availability', methods=['GET'])
+async def check_availability():
+    try:
+        check_in, check_out = availability.stay_dates(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        hotel_id = request.args.get('hotel_id')
+
+        async with connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(availability.HOTEL_AVAILABILITY_SQL,
+                                     availability.hotel_availability_params(hotel_id, check_in, check_out))
+                rooms = await cursor.fetchall()
+        return jsonify(rooms)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,149 @@
+"""Read side of the analytics rollups (common/rollups.py).
+
+Every query reads the daily rollup tables or the per-night
+room_availability counters, so the cost depends on the number of days and
+hotels asked for, not on the size of bookings or payments.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+import availability
+from common import rollups
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+
+
+def date_range(args, forward=False):
+    """Inclusive (start, end) from ?from=&to=.
+
+    Defaults to the last DEFAULT_DAYS days, or the next ones with forward.
+    """
+    try:
+        start = availability.to_date(args['from']) if args.get('from') else None
+        end = availability.to_date(args['to']) if args.get('to') else None
+    except ValueError:
+        raise ValueError("from and to must be dates (YYYY-MM-DD)")
+    span = timedelta(days=DEFAULT_DAYS - 1)
+    if start is None and end is None:
+        start, end = (date.today(), date.today() + span) if forward else (date.today() - span, date.today())
+    elif start is None:
+        start = end - span
+    elif end is None:
+        end = start + span
+    if start > end:
+        raise ValueError("from must not be after to")
+    if (end - start).days >= MAX_DAYS:
+        raise ValueError(f"At most {MAX_DAYS} days can be requested")
+    return start, end
+
+
+def _hotel_filter(hotel_id, column='hotel_id'):
+    if hotel_id is None:
+        return "", ()
+    return f" AND {column} = %s", (hotel_id,)
+
+
+def revenue(cursor, start, end, hotel_id=None):
+    where, params = _hotel_filter(hotel_id, 'r.hotel_id')
+    cursor.execute(f"""
+        SELECT r.day, r.hotel_id, h.name, r.payments, r.revenue, r.refunds, r.refunded
+        FROM daily_hotel_revenue r
+        LEFT JOIN hotels h ON h.id = r.hotel_id
+        WHERE r.day BETWEEN %s AND %s{where}
+        ORDER BY r.day, r.hotel_id
+    """, (start, end) + params)
+    days = []
+    totals = {"payments": 0, "revenue": Decimal(0), "refunds": 0, "refunded": Decimal(0)}
+    for day, row_hotel_id, hotel_name, payments, amount, refunds, refunded in cursor.fetchall():
+        days.append({
+            "day": day.isoformat(),
+            "hotel_id": row_hotel_id,
+            "hotel_name": hotel_name,
+            "payments": payments,
+            "revenue": amount,
+            "refunds": refunds,
+            "refunded": refunded,
+            "net_revenue": amount - refunded,
+        })
+        totals["payments"] += payments
+        totals["revenue"] += amount
+        totals["refunds"] += refunds
+        totals["refunded"] += refunded
+    totals["net_revenue"] = totals["revenue"] - totals["refunded"]
+    return {"from": start.isoformat(), "to": end.isoformat(), "days": days, "totals": totals}
+
+
+def occupancy(cursor, start, end, hotel_id=None):
+    """Rooms taken / rooms offered per night, over one hotel or all of them."""
+    where, params = _hotel_filter(hotel_id)
+    cursor.execute(f"SELECT COUNT(*) FROM room_types WHERE 1 = 1{where}", params)
+    capacity = cursor.fetchone()[0] * availability.ROOMS_PER_TYPE
+    # Nights without a counter row have never been booked
+    cursor.execute(f"""
+        SELECT available_date, SUM(%s - available_rooms)
+        FROM room_availability
+        WHERE available_date BETWEEN %s AND %s{where}
+        GROUP BY available_date
+    """, (availability.ROOMS_PER_TYPE, start, end) + params)
+    booked = {night: int(rooms) for night, rooms in cursor.fetchall()}
+    nights = []
+    night = start
+    while night <= end:
+        rooms = booked.get(night, 0)
+        nights.append({
+            "night": night.isoformat(),
+            "rooms_booked": rooms,
+            "capacity": capacity,
+            "occupancy_rate": round(rooms / capacity, 4) if capacity else 0,
+        })
+        night += timedelta(days=1)
+    total = sum(entry["rooms_booked"] for entry in nights)
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "nights": nights,
+        "average_occupancy_rate": round(total / (capacity * len(nights)), 4) if capacity else 0,
+    }
+
+
+def lead_time(cursor, start, end, hotel_id=None):
+    """Days between booking and check-in for bookings made in the range."""
+    where, params = _hotel_filter(hotel_id)
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(bookings), 0), COALESCE(SUM(nights), 0), COALESCE(SUM(lead_days_sum), 0),
+               {', '.join(f'COALESCE(SUM({column}), 0)' for column, _, _ in rollups.LEAD_BUCKETS)}
+        FROM daily_booking_stats
+        WHERE day BETWEEN %s AND %s{where}
+    """, (start, end) + params)
+    bookings, nights, lead_days, *histogram = cursor.fetchone()
+    labels = [f"{low}-{high}" if high is not None else f"{low}+" for _, low, high in rollups.LEAD_BUCKETS]
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "bookings": int(bookings),
+        "average_lead_days": round(float(lead_days) / int(bookings), 1) if bookings else 0,
+        "average_nights": round(float(nights) / int(bookings), 1) if bookings else 0,
+        "lead_time_histogram": {label: int(count) for label, count in zip(labels, histogram)},
+    }
+
+
+def summary(cursor):
+    cursor.execute("""
+        SELECT COALESCE(SUM(bookings), 0), COALESCE(SUM(booked_amount), 0)
+        FROM daily_booking_stats
+    """)
+    bookings, booked_amount = cursor.fetchone()
+    cursor.execute("""
+        SELECT COALESCE(SUM(payments), 0), COALESCE(SUM(revenue), 0), COALESCE(SUM(refunded), 0)
+        FROM daily_hotel_revenue
+    """)
+    payments, amount, refunded = cursor.fetchone()
+    return {
+        "total_bookings": int(bookings),
+        "booked_amount": booked_amount,
+        "total_payments": int(payments),
+        "revenue": amount,
+        "refunded": refunded,
+        "net_revenue": amount - refunded,
+    }
@@ -1,105 +1,84 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import mysql.connector
 import os
 from datetime import datetime, timedelta
 import json
+import mysql.connector
+from common.db import get_db_connection, pool_stats
+from common.metrics import instrument_app
+from common.query_profile import register_query_report
+from common.readiness import register_readiness
+from common.replicas import get_read_connection, register_read_routing
+from common.conditional import changes, conditional
+from common.compression import register_compression
+from common.fast_json import FastJSONProvider, rows_response
+from common.pagination import keyset_response
+from common.idempotency import IdempotencyStore, idempotent
+from common import archive, rollups
+import availability
+import payment_events
+import analytics
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
+instrument_app(app, 'booking-service')
+register_query_report(app)
+register_readiness(app, get_db_connection)
+register_read_routing(app)
+register_compression(app)
+idempotency = IdempotencyStore(get_db_connection)
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql-db'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'database': os.getenv('DB_NAME', 'hotel_booking'),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
-
-def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
-
-def init_db():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create bookings table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS bookings (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                hotel_id INT,
-                room_type_id INT,
-                check_in_date DATE NOT NULL,
-                check_out_date DATE NOT NULL,
-                total_amount DECIMAL(10,2),
-                status ENUM('pending', 'confirmed', 'cancelled') DEFAULT 'pending',
-                guest_name VARCHAR(255),
-                guest_email VARCHAR(255),
-                guest_phone VARCHAR(20),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create room_availability table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS room_availability (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                hotel_id INT,
-                room_type_id INT,
-                available_date DATE,
-                available_rooms INT DEFAULT 10,
-                UNIQUE KEY unique_availability (hotel_id, room_type_id, available_date)
-            )
-        """)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("Booking database initialized successfully")
-    except Exception as e:
-        print(f"Error initializing booking database: {e}")
+@app.before_request
+def ensure_archiver():
+    archive.start_archiver(get_db_connection)
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "booking-service"})
+    return jsonify({"status": "healthy", "service": "booking-service", "db_pool": pool_stats()})
 
 @app.route('/bookings', methods=['POST'])
+@idempotent(idempotency, 'bookings.create')
+@changes(get_db_connection, 'bookings')
 def create_booking():
     try:
         data = request.get_json()
+        availability.stay_dates(data, 'check_in_date', 'check_out_date')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Check room availability
-        cursor.execute("""
-            SELECT COUNT(*) FROM bookings 
-            WHERE hotel_id = %s AND room_type_id = %s 
-            AND status != 'cancelled'
-            AND ((check_in_date <= %s AND check_out_date > %s) 
-                 OR (check_in_date < %s AND check_out_date >= %s))
-        """, (data['hotel_id'], data['room_type_id'], 
-              data['check_in_date'], data['check_in_date'],
-              data['check_out_date'], data['check_out_date']))
-        
-        existing_bookings = cursor.fetchone()[0]
-        
-        if existing_bookings >= 10:  # Max 10 rooms per type
-            return jsonify({"error": "No rooms available for selected dates"}), 400
-        
-        # Create booking
-        cursor.execute("""
-            INSERT INTO bookings (user_id, hotel_id, room_type_id, check_in_date, 
-                                check_out_date, total_amount, guest_name, guest_email, guest_phone)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (data['user_id'], data['hotel_id'], data['room_type_id'],
-              data['check_in_date'], data['check_out_date'], data['total_amount'],
-              data['guest_name'], data['guest_email'], data['guest_phone']))
-        
-        booking_id = cursor.lastrowid
-        conn.commit()
+        # Take the rooms first: the conditional decrement of the per-night
+        # counters is what stops concurrent requests from overselling
+        for attempt in range(availability.RESERVE_ATTEMPTS):
+            try:
+                if not availability.try_reserve(cursor, data['hotel_id'], data['room_type_id'],
+                                                data['check_in_date'], data['check_out_date']):
+                    conn.rollback()
+                    cursor.close()
+                    conn.close()
+                    return jsonify({"error": "No rooms available for selected dates"}), 400
+                
+                # Create booking
+                cursor.execute("""
+                    INSERT INTO bookings (user_id, hotel_id, room_type_id, check_in_date, 
+                                        check_out_date, total_amount, guest_name, guest_email, guest_phone)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (data['user_id'], data['hotel_id'], data['room_type_id'],
+                      data['check_in_date'], data['check_out_date'], data['total_amount'],
+                      data['guest_name'], data['guest_email'], data['guest_phone']))
+                
+                booking_id = cursor.lastrowid
+                rollups.record_booking(cursor, data['hotel_id'], data['check_in_date'],
+                                       data['check_out_date'], data['total_amount'])
+                conn.commit()
+                break
+            except mysql.connector.errors.DatabaseError as e:
+                conn.rollback()
+                if e.errno not in availability.RETRYABLE_ERRORS or attempt == availability.RESERVE_ATTEMPTS - 1:
+                    raise
         cursor.close()
         conn.close()
         
@@ -108,47 +87,75 @@ def create_booking():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/bookings/<int:user_id>', methods=['GET'])
+@conditional(get_read_connection, 'bookings', 'hotels')
 def get_user_bookings(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT b.*, h.name as hotel_name, h.location 
-            FROM bookings b 
-            JOIN hotels h ON b.hotel_id = h.id 
-            WHERE b.user_id = %s 
-            ORDER BY b.created_at DESC
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        # Includes archived stays
+        sql, params = archive.history("""
+            SELECT b.*, h.name as hotel_name, h.location
+            FROM {bookings} b
+            JOIN hotels h ON b.hotel_id = h.id
+            WHERE b.user_id = %s
         """, (user_id,))
-        bookings = cursor.fetchall()
+        cursor.execute(sql + " ORDER BY created_at DESC", params)
+        response = rows_response(cursor)
         cursor.close()
         conn.close()
-        return jsonify(bookings)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/bookings/all', methods=['GET'])
+@conditional(get_read_connection, 'bookings', 'hotels')
 def get_all_bookings():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT b.*, h.name as hotel_name, h.location 
-            FROM bookings b 
-            JOIN hotels h ON b.hotel_id = h.id 
-            ORDER BY b.created_at DESC
-        """)
-        bookings = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(bookings)
+        return keyset_response(app, get_read_connection, """
+            SELECT b.*, h.name as hotel_name, h.location
+            FROM {bookings} b
+            JOIN hotels h ON b.hotel_id = h.id
+        """.format(**archive.requested_tables(request.args)), key_prefix='b.')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def get_booking_stay(cursor, booking_id):
+    # Lock the booking row so concurrent status changes adjust inventory once
+    cursor.execute("""
+        SELECT hotel_id, room_type_id, check_in_date, check_out_date, status
+        FROM bookings WHERE id = %s
+        FOR UPDATE
+    """, (booking_id,))
+    return cursor.fetchone()
+
+def missing_booking(cursor, booking_id):
+    # Closed stays move to bookings_archive and can no longer change
+    if archive.is_archived(cursor, 'bookings', booking_id):
+        return jsonify({"error": "Booking is archived and can no longer be changed"}), 409
+    return jsonify({"error": "Booking not found"}), 404
+
 @app.route('/bookings/<int:booking_id>/confirm', methods=['PUT'])
+@changes(get_db_connection, 'bookings')
 def confirm_booking(booking_id):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        booking = get_booking_stay(cursor, booking_id)
+        if booking is None:
+            response = missing_booking(cursor, booking_id)
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return response
+        
+        # A cancelled booking gave its rooms back, so it has to take them again
+        if booking[4] == 'cancelled':
+            if not availability.try_reserve(cursor, *booking[:4]):
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                return jsonify({"error": "No rooms available for selected dates"}), 400
+        
         cursor.execute("UPDATE bookings SET status = 'confirmed' WHERE id = %s", (booking_id,))
         conn.commit()
         cursor.close()
@@ -158,10 +165,22 @@ def confirm_booking(booking_id):
         return jsonify({"error": str(e)}), 500
 
 @app.route('/bookings/<int:booking_id>/cancel', methods=['PUT'])
+@changes(get_db_connection, 'bookings')
 def cancel_booking(booking_id):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        booking = get_booking_stay(cursor, booking_id)
+        if booking is None:
+            response = missing_booking(cursor, booking_id)
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            return response
+        
+        if booking[4] != 'cancelled':
+            availability.release(cursor, *booking[:4])
+        
         cursor.execute("UPDATE bookings SET status = 'cancelled' WHERE id = %s", (booking_id,))
         conn.commit()
         cursor.close()
@@ -170,42 +189,142 @@ def cancel_booking(booking_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/events/payments', methods=['POST'])
+@changes(get_db_connection, 'bookings')
+def consume_payment_events():
+    # Internal: called by the payment-service outbox dispatcher
+    try:
+        events = request.get_json()['events']
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        for attempt in range(availability.RESERVE_ATTEMPTS):
+            try:
+                summary = payment_events.apply_payment_events(cursor, events)
+                conn.commit()
+                break
+            except mysql.connector.errors.DatabaseError as e:
+                conn.rollback()
+                if e.errno not in availability.RETRYABLE_ERRORS or attempt == availability.RESERVE_ATTEMPTS - 1:
+                    raise
+        cursor.close()
+        conn.close()
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/availability', methods=['GET'])
 def check_availability():
+    try:
+        check_in, check_out = availability.stay_dates(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     try:
         hotel_id = request.args.get('hotel_id')
-        check_in = request.args.get('check_in')
-        check_out = request.args.get('check_out')
         
-        conn = get_db_connection()
+        conn = get_read_connection()
         cursor = conn.cursor(dictionary=True)
         
-        # Get available rooms for the date range
-        cursor.execute("""
-            SELECT rt.*, 
-                   (10 - COALESCE(booked.count, 0)) as available_rooms
-            FROM room_types rt
-            LEFT JOIN (
-                SELECT room_type_id, COUNT(*) as count
-                FROM bookings
-                WHERE hotel_id = %s 
-                AND status != 'cancelled'
-                AND ((check_in_date <= %s AND check_out_date > %s) 
-                     OR (check_in_date < %s AND check_out_date >= %s))
-                GROUP BY room_type_id
-            ) booked ON rt.id = booked.room_type_id
-            WHERE rt.hotel_id = %s
-            HAVING available_rooms > 0
-        """, (hotel_id, check_in, check_in, check_out, check_out, hotel_id))
+        # Get available rooms for the date range from the per-night counters
+        cursor.execute(availability.HOTEL_AVAILABILITY_SQL,
+                       availability.hotel_availability_params(hotel_id, check_in, check_out))
         
-        availability = cursor.fetchall()
+        rooms = cursor.fetchall()
         cursor.close()
         conn.close()
         
-        return jsonify(availability)
+        return jsonify(rooms)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/availability/rebuild', methods=['POST'])
+def rebuild_availability():
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        availability.rebuild(cursor)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return jsonify({"message": "Availability rebuilt successfully"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def analytics_hotel_id():
+    return request.args.get('hotel_id', type=int)
+
+@app.route('/analytics/revenue', methods=['GET'])
+def revenue_analytics():
+    try:
+        start, end = analytics.date_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        report = analytics.revenue(cursor, start, end, analytics_hotel_id())
+        cursor.close()
+        conn.close()
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/analytics/occupancy', methods=['GET'])
+def occupancy_analytics():
+    try:
+        start, end = analytics.date_range(request.args, forward=True)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        report = analytics.occupancy(cursor, start, end, analytics_hotel_id())
+        cursor.close()
+        conn.close()
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/analytics/lead-time', methods=['GET'])
+def lead_time_analytics():
+    try:
+        start, end = analytics.date_range(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        report = analytics.lead_time(cursor, start, end, analytics_hotel_id())
+        cursor.close()
+        conn.close()
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/analytics/summary', methods=['GET'])
+def analytics_summary():
+    try:
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        report = analytics.summary(cursor)
+        cursor.close()
+        conn.close()
+        return jsonify(report)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/analytics/rebuild', methods=['POST'])
+def rebuild_analytics():
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        rollups.backfill(cursor)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return jsonify({"message": "Analytics rollups rebuilt successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    init_db()
-    app.run(host='0.0.0.0', port=5002, debug=True)
\ No newline at end of file
+    # Development server only; the container runs gunicorn (see common/gunicorn_conf.py)
+    app.run(host='0.0.0.0', port=5002, debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
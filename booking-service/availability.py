@@ -0,0 +1,173 @@
+"""Per-night room inventory kept in the room_availability table.
+
+Each (hotel_id, room_type_id, available_date) row holds the number of rooms
+still free for that night. A night with no row has never been booked and is
+fully available. Bookings cover the nights [check_in_date, check_out_date).
+"""
+from datetime import date, datetime, timedelta
+
+from common import archive
+
+ROOMS_PER_TYPE = 10  # Max 10 rooms per type
+
+# Deadlock and lock wait timeout; the whole reservation is simply retried
+RETRYABLE_ERRORS = (1213, 1205)
+RESERVE_ATTEMPTS = 3
+
+# Statements are shared with the asyncio app (aio_app.py), which runs them
+# through aiomysql instead of the helpers below
+ENSURE_NIGHTS_SQL = """
+    INSERT IGNORE INTO room_availability (hotel_id, room_type_id, available_date, available_rooms)
+    VALUES (%s, %s, %s, %s)
+"""
+
+RESERVE_SQL = """
+    UPDATE room_availability
+    SET available_rooms = available_rooms - 1
+    WHERE hotel_id = %s AND room_type_id = %s
+    AND available_date >= %s AND available_date < %s
+    AND available_rooms > 0
+"""
+
+RELEASE_SQL = """
+    UPDATE room_availability
+    SET available_rooms = LEAST(available_rooms + 1, %s)
+    WHERE hotel_id = %s AND room_type_id = %s
+    AND available_date >= %s AND available_date < %s
+"""
+
+# Rooms free per room type of a hotel; nights without a counter row have
+# never been booked
+HOTEL_AVAILABILITY_SQL = """
+    SELECT rt.*,
+           CASE
+               WHEN ra.tracked_nights IS NULL THEN %s
+               WHEN ra.tracked_nights < %s THEN LEAST(ra.min_available, %s)
+               ELSE ra.min_available
+           END as available_rooms
+    FROM room_types rt
+    LEFT JOIN (
+        SELECT room_type_id, MIN(available_rooms) as min_available,
+               COUNT(*) as tracked_nights
+        FROM room_availability
+        WHERE hotel_id = %s
+        AND available_date >= %s AND available_date < %s
+        GROUP BY room_type_id
+    ) ra ON rt.id = ra.room_type_id
+    WHERE rt.hotel_id = %s
+    HAVING available_rooms > 0
+"""
+
+
+def to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def stay_dates(args, check_in='check_in', check_out='check_out'):
+    """(check-in, check-out) dates from query args or a JSON body, or ValueError."""
+    if not args.get(check_in) or not args.get(check_out):
+        raise ValueError(f"{check_in} and {check_out} are required")
+    try:
+        first, last = to_date(args[check_in]), to_date(args[check_out])
+    except (TypeError, ValueError):
+        raise ValueError(f"{check_in} and {check_out} must be dates (YYYY-MM-DD)")
+    if last <= first:
+        raise ValueError(f"{check_out} must be after {check_in}")
+    return first, last
+
+
+def stay_nights(check_in, check_out):
+    check_in, check_out = to_date(check_in), to_date(check_out)
+    return [check_in + timedelta(days=i) for i in range((check_out - check_in).days)]
+
+
+def _night_range(nights):
+    return nights[0], nights[-1] + timedelta(days=1)
+
+
+def rooms_free(cursor, hotel_id, room_type_id, check_in, check_out):
+    nights = stay_nights(check_in, check_out)
+    if not nights:
+        return 0
+    cursor.execute("""
+        SELECT MIN(available_rooms), COUNT(*)
+        FROM room_availability
+        WHERE hotel_id = %s AND room_type_id = %s
+        AND available_date >= %s AND available_date < %s
+    """, (hotel_id, room_type_id) + _night_range(nights))
+    min_available, tracked_nights = cursor.fetchone()
+    if not tracked_nights:
+        return ROOMS_PER_TYPE
+    if tracked_nights < len(nights):
+        return min(min_available, ROOMS_PER_TYPE)
+    return min_available
+
+
+def ensure_nights_params(hotel_id, room_type_id, nights):
+    return [(hotel_id, room_type_id, night, ROOMS_PER_TYPE) for night in nights]
+
+
+def reserve_params(hotel_id, room_type_id, nights):
+    return (hotel_id, room_type_id) + _night_range(nights)
+
+
+def release_params(hotel_id, room_type_id, nights):
+    return (ROOMS_PER_TYPE, hotel_id, room_type_id) + _night_range(nights)
+
+
+def hotel_availability_params(hotel_id, check_in, check_out):
+    nights = len(stay_nights(check_in, check_out))
+    return (ROOMS_PER_TYPE, nights, ROOMS_PER_TYPE,
+            hotel_id, check_in, check_out, hotel_id)
+
+
+def _ensure_nights(cursor, hotel_id, room_type_id, nights):
+    cursor.executemany(ENSURE_NIGHTS_SQL, ensure_nights_params(hotel_id, room_type_id, nights))
+
+
+def try_reserve(cursor, hotel_id, room_type_id, check_in, check_out):
+    """Take one room on every night of the stay, or none at all.
+
+    The decrement only applies to nights that still have a room free and
+    row-locks just those nights, so concurrent bookings for the same room
+    type serialize on the counters instead of overselling. Returns False
+    when any night is full; the caller must then roll back.
+    """
+    nights = stay_nights(check_in, check_out)
+    if not nights:
+        return False
+    _ensure_nights(cursor, hotel_id, room_type_id, nights)
+    cursor.execute(RESERVE_SQL, reserve_params(hotel_id, room_type_id, nights))
+    return cursor.rowcount == len(nights)
+
+
+def release(cursor, hotel_id, room_type_id, check_in, check_out):
+    nights = stay_nights(check_in, check_out)
+    if not nights:
+        return
+    _ensure_nights(cursor, hotel_id, room_type_id, nights)
+    cursor.execute(RELEASE_SQL, release_params(hotel_id, room_type_id, nights))
+
+
+def rebuild(cursor):
+    # Recompute every counter from the bookings that still hold rooms,
+    # archived ones included so past nights keep their occupancy
+    cursor.execute("DELETE FROM room_availability")
+    cursor.execute(*archive.history("""
+        SELECT hotel_id, room_type_id, check_in_date, check_out_date
+        FROM {bookings}
+        WHERE status != 'cancelled'
+    """))
+    held = {}
+    for hotel_id, room_type_id, check_in, check_out in cursor.fetchall():
+        for night in stay_nights(check_in, check_out):
+            key = (hotel_id, room_type_id, night)
+            held[key] = held.get(key, 0) + 1
+    cursor.executemany("""
+        INSERT INTO room_availability (hotel_id, room_type_id, available_date, available_rooms)
+        VALUES (%s, %s, %s, %s)
+    """, [key + (ROOMS_PER_TYPE - count,) for key, count in held.items()])
@@ -0,0 +1,132 @@
+"""Apply the payment events published by payment-service.
+
+payment-service no longer updates the bookings table; its outbox
+dispatcher delivers payment.completed and payment.refunded events in
+batches to POST /events/payments. Delivery is at least once, so every
+event key (the payment's transaction_id) is recorded in processed_events
+in the same transaction that applies the event, and an event seen before
+is skipped.
+
+A completed payment confirms its booking. A booking that was cancelled
+in the meantime has to take its rooms again, exactly like
+PUT /bookings/<id>/confirm. Both event types also update the
+daily_hotel_revenue rollup (common/rollups.py).
+"""
+import availability
+from common import rollups
+
+PAYMENT_COMPLETED = 'payment.completed'
+PAYMENT_REFUNDED = 'payment.refunded'
+EVENT_TYPES = (PAYMENT_COMPLETED, PAYMENT_REFUNDED)
+
+# Statements are shared with the asyncio app (aio_app.py)
+RECORD_SQL = """
+    INSERT INTO processed_events (event_type, event_key)
+    VALUES (%s, %s)
+"""
+
+# try_reserve() may have taken some nights before finding a full one; the
+# rest of the batch must still commit, so only that attempt is undone
+SAVEPOINT_SQL = "SAVEPOINT reserve_again"
+ROLLBACK_SAVEPOINT_SQL = "ROLLBACK TO SAVEPOINT reserve_again"
+
+
+def _placeholders(count):
+    return ', '.join(['%s'] * count)
+
+
+def seen_sql(count):
+    return f"""
+        SELECT event_type, event_key FROM processed_events
+        WHERE (event_type, event_key) IN ({', '.join(['(%s, %s)'] * count)})
+    """
+
+
+def seen_params(known):
+    return [value for event_id in known for value in event_id]
+
+
+def lock_bookings_sql(count):
+    # Fixed lock order so concurrent batches cannot deadlock on each other
+    return f"""
+        SELECT id, hotel_id, room_type_id, check_in_date, check_out_date, status
+        FROM bookings WHERE id IN ({_placeholders(count)})
+        ORDER BY id
+        FOR UPDATE
+    """
+
+
+def confirm_sql(count):
+    return f"UPDATE bookings SET status = 'confirmed' WHERE id IN ({_placeholders(count)})"
+
+
+def known_events(events):
+    """Events this service handles keyed by (type, transaction id), duplicates dropped."""
+    return {(event['type'], event['key']): event for event in events if event.get('type') in EVENT_TYPES}
+
+
+def new_events(known, seen_rows):
+    seen = {tuple(row) for row in seen_rows}
+    return [event for event_id, event in known.items() if event_id not in seen]
+
+
+def revenue_params(fresh, hotels):
+    """daily_hotel_revenue rows for the events whose booking exists."""
+    rows = []
+    for event in fresh:
+        hotel_id = hotels.get(event['booking_id'])
+        if hotel_id is None:
+            continue
+        if event['type'] == PAYMENT_COMPLETED:
+            rows.append(rollups.payment_params(event.get('paid_on'), hotel_id, event['amount']))
+        else:
+            rows.append(rollups.refund_params(event.get('refunded_on'), hotel_id, event['amount']))
+    return rows
+
+
+def result(events, known, fresh, confirmed, unavailable, found):
+    booking_ids = {event['booking_id'] for event in fresh}
+    return {
+        "received": len(events),
+        "duplicates": len(known) - len(fresh),
+        "confirmed": len(confirmed),
+        "unavailable": sorted(unavailable),
+        "missing": sorted(booking_ids - found),
+    }
+
+
+def apply_payment_events(cursor, events):
+    """Apply a batch inside the caller's transaction; returns a summary."""
+    known = known_events(events)
+    if not known:
+        return result(events, known, [], [], [], set())
+    cursor.execute(seen_sql(len(known)), seen_params(known))
+    fresh = new_events(known, cursor.fetchall())
+    if not fresh:
+        return result(events, known, fresh, [], [], set())
+
+    # A concurrent delivery of the same event fails here on the primary
+    # key, and that whole batch is rolled back and redelivered
+    cursor.executemany(RECORD_SQL, [(event['type'], event['key']) for event in fresh])
+
+    booking_ids = sorted({event['booking_id'] for event in fresh})
+    to_confirm = {event['booking_id'] for event in fresh if event['type'] == PAYMENT_COMPLETED}
+    cursor.execute(lock_bookings_sql(len(booking_ids)), booking_ids)
+    confirmed, unavailable, hotels = [], [], {}
+    for booking_id, hotel_id, room_type_id, check_in, check_out, status in cursor.fetchall():
+        hotels[booking_id] = hotel_id
+        if booking_id not in to_confirm or status == 'confirmed':
+            continue
+        if status == 'cancelled':
+            cursor.execute(SAVEPOINT_SQL)
+            if not availability.try_reserve(cursor, hotel_id, room_type_id, check_in, check_out):
+                cursor.execute(ROLLBACK_SAVEPOINT_SQL)
+                unavailable.append(booking_id)
+                continue
+        confirmed.append(booking_id)
+    if confirmed:
+        cursor.execute(confirm_sql(len(confirmed)), confirmed)
+    revenue = revenue_params(fresh, hotels)
+    if revenue:
+        cursor.executemany(rollups.RECORD_REVENUE_SQL, revenue)
+    return result(events, known, fresh, confirmed, unavailable, set(hotels))
@@ -0,0 +1,66 @@
+"""aiomysql pool for the optional asyncio apps (aio_app.py).
+
+Uses the same DB_* and DB_POOL_* settings as common/db.py. Requires the
+packages in the service's requirements-async.txt.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiomysql
+
+from common.db import DB_CONFIG, POOL_RECYCLE, POOL_SIZE, POOL_TIMEOUT, PoolExhausted
+
+_pool = None
+
+
+async def init_pool():
+    global _pool
+    if _pool is None:
+        _pool = await aiomysql.create_pool(
+            host=DB_CONFIG['host'],
+            port=DB_CONFIG['port'],
+            user=DB_CONFIG['user'],
+            password=DB_CONFIG['password'],
+            db=DB_CONFIG['database'],
+            minsize=1,
+            maxsize=POOL_SIZE,
+            pool_recycle=POOL_RECYCLE,
+            autocommit=False,
+        )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+@asynccontextmanager
+async def connection():
+    pool = await init_pool()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise PoolExhausted(f"No database connection available after {POOL_TIMEOUT}s "
+                            f"(pool size {POOL_SIZE})")
+    try:
+        yield conn
+    finally:
+        # Never hand a connection back with an open transaction
+        if not conn.closed:
+            await conn.rollback()
+        pool.release(conn)
+
+
+def pool_stats():
+    if _pool is None:
+        return {'size': POOL_SIZE, 'open': 0, 'idle': 0, 'in_use': 0}
+    return {
+        'size': _pool.maxsize,
+        'open': _pool.size,
+        'idle': _pool.freesize,
+        'in_use': _pool.size - _pool.freesize,
+    }
@@ -0,0 +1,60 @@
+"""asyncio counterpart of common/pagination.py for the Quart apps.
+
+Same query parameters, cursor format and response shapes.
+"""
+import aiomysql
+from quart import jsonify, request
+
+from common.aio_db import connection
+from common.fast_json import RowEncoder
+from common.pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, STREAM_BATCH_SIZE,
+                               decode_cursor, keyset_sql, page_response)
+
+
+async def keyset_response(app, sql, params=(), key_prefix='', has_where=False):
+    limit = request.args.get('limit', type=int)
+    cursor_arg = request.args.get('cursor')
+    try:
+        after = decode_cursor(cursor_arg) if cursor_arg else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query_params = tuple(params)
+    if after is not None:
+        query_params += (after[0], after[0], after[1])
+
+    if limit is None and after is None:
+        return stream_json_array(app, keyset_sql(sql, key_prefix, has_where, None), query_params)
+
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    async with connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(keyset_sql(sql, key_prefix, has_where, after) + " LIMIT %s",
+                                 query_params + (limit + 1,))
+            rows = await cursor.fetchall()
+            encoder = RowEncoder(cursor.description)
+    return page_response(app, encoder, rows, limit)
+
+
+def stream_json_array(app, sql, params=()):
+    async def generate():
+        try:
+            async with connection() as conn:
+                # Server-side cursor so rows arrive in batches instead of all at once
+                async with conn.cursor(aiomysql.SSCursor) as cursor:
+                    await cursor.execute(sql, params)
+                    encoder = RowEncoder(cursor.description)
+                    yield b'['
+                    first = True
+                    while True:
+                        rows = await cursor.fetchmany(STREAM_BATCH_SIZE)
+                        if not rows:
+                            break
+                        chunk = encoder.encode(rows)[1:-1]
+                        yield chunk if first else b',' + chunk
+                        first = False
+                    yield b']'
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+
+    return app.response_class(generate(), mimetype='application/json')
@@ -0,0 +1,337 @@
+"""Cold archive for closed bookings and their payments and invoices.
+
+bookings, payments and invoices only ever grow, but almost every query is
+about current and future stays. The archiver moves closed stays out of
+the live tables into bookings_archive, payments_archive and
+invoices_archive:
+
+- A booking is closed once its check-out is ARCHIVE_AFTER_DAYS in the
+  past and none of its payments is pending. Invoice status is not
+  consulted: invoices are issued as 'sent' and nothing moves them on.
+  It moves together with its payments and invoices, in one transaction
+  per batch of ARCHIVE_BATCH bookings.
+- The archive tables have the live tables' columns (so ``SELECT *`` lines
+  up), use compressed InnoDB pages, and are partitioned by month:
+  bookings by check_out_date, payments and invoices by created_at. New
+  monthly partitions are split off the catch-all p_future partition as
+  time goes on. With ARCHIVE_RETENTION_MONTHS set, months older than that
+  are dropped, a metadata-only operation.
+
+The live tables and their indexes then only hold recent and upcoming
+stays. History reads go through history(), which runs a query against the
+live tables and their archives as one UNION ALL; the per-user booking,
+payment and invoice lists use it, and the admin /all lists read the
+archive instead of the live tables with ``?archived=1``.
+
+Booking Service runs the archiver in the background (one worker across
+all replicas at a time); it can also be run once from a job:
+
+    python -m common.archive
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', 90))
+ARCHIVE_BATCH = int(os.getenv('ARCHIVE_BATCH', 500))
+ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', 3600))
+# 0 keeps archived months forever
+ARCHIVE_RETENTION_MONTHS = int(os.getenv('ARCHIVE_RETENTION_MONTHS', 0))
+
+LIVE_TABLES = {'bookings': 'bookings', 'payments': 'payments', 'invoices': 'invoices'}
+ARCHIVE_TABLES = {table: f"{table}_archive" for table in LIVE_TABLES}
+
+# (live table, partitioning column, bound of a month, unique keys to relax)
+ARCHIVES = [
+    ('bookings', 'check_out_date', "'{month}'", []),
+    ('payments', 'created_at', "UNIX_TIMESTAMP('{month} 00:00:00')", ['transaction_id']),
+    ('invoices', 'created_at', "UNIX_TIMESTAMP('{month} 00:00:00')", ['invoice_number']),
+]
+
+MONTH_PARTITION = re.compile(r'^p(\d{4})(\d{2})$')
+
+CLOSED_BOOKINGS_SQL = """
+    SELECT b.id FROM bookings b
+    WHERE b.check_out_date < %s
+    AND NOT EXISTS (SELECT 1 FROM payments p
+                    WHERE p.booking_id = b.id AND p.payment_status = 'pending')
+    ORDER BY b.check_out_date, b.id
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+
+def tables(archived=False):
+    """Table names to format a ``{bookings}``/``{payments}``/``{invoices}`` query with."""
+    return ARCHIVE_TABLES if archived else LIVE_TABLES
+
+
+def requested_tables(args):
+    """Archive tables for a request with ?archived=1, else the live ones."""
+    return tables(args.get('archived', '').lower() in ('1', 'true', 'yes'))
+
+
+def history(template, params=()):
+    """(sql, params) running `template` on the live tables and their archives.
+
+    `template` is a SELECT without ORDER BY naming its tables as
+    ``{bookings}``, ``{payments}`` and ``{invoices}``; an ORDER BY appended
+    to the result sorts the combined rows by output column name.
+    """
+    sql = f"{template.format(**LIVE_TABLES)}\n    UNION ALL\n{template.format(**ARCHIVE_TABLES)}"
+    return sql, tuple(params) * 2
+
+
+def archive_tables_exist(cursor):
+    """Whether the archive tables have been created (migration 10)."""
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name IN ({_placeholders(len(ARCHIVE_TABLES))})
+    """, tuple(ARCHIVE_TABLES.values()))
+    return cursor.fetchone()[0] == len(ARCHIVE_TABLES)
+
+
+def archived_row_sql(table):
+    """Statement finding the row of live `table` with id %s in its archive."""
+    return f"SELECT 1 FROM {ARCHIVE_TABLES[table]} WHERE id = %s LIMIT 1"
+
+
+def is_archived(cursor, table, row_id):
+    """Whether row `row_id`, no longer in live `table`, was moved to its archive."""
+    cursor.execute(archived_row_sql(table), (row_id,))
+    return cursor.fetchone() is not None
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _partition(month, bound):
+    end = _next_month(month)
+    return (f"PARTITION p{month:%Y%m} VALUES LESS THAN "
+            f"({bound.format(month=end.isoformat())})")
+
+
+def _is_partitioned(cursor, table):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+        LIMIT 1
+    """, (table,))
+    return cursor.fetchone() is not None
+
+
+def _unique_exists(cursor, table, name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s AND non_unique = 0
+        LIMIT 1
+    """, (table, name))
+    return cursor.fetchone() is not None
+
+
+def create_archive_tables(cursor):
+    """Migration step: the three archive tables, each with an empty catch-all partition.
+
+    Partitioned tables need the partitioning column in every unique key,
+    so the archive's primary key becomes (id, column) and the live tables'
+    unique keys become plain indexes; uniqueness was already enforced
+    while the rows were live.
+    """
+    for table, column, _, uniques in ARCHIVES:
+        archive = ARCHIVE_TABLES[table]
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive} LIKE {table}")
+        if _is_partitioned(cursor, archive):
+            continue
+        changes = [
+            "MODIFY id INT NOT NULL",
+            f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, {column})",
+        ]
+        for name in uniques:
+            if _unique_exists(cursor, archive, name):
+                changes.append(f"DROP INDEX {name}, ADD INDEX {name} ({name})")
+        if column == 'check_out_date':
+            partitioning = f"PARTITION BY RANGE COLUMNS ({column})"
+        else:
+            partitioning = f"PARTITION BY RANGE (UNIX_TIMESTAMP({column}))"
+        cursor.execute(f"""
+            ALTER TABLE {archive} {', '.join(changes)},
+                ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+            {partitioning} (PARTITION p_future VALUES LESS THAN (MAXVALUE))
+        """)
+
+
+def month_partitions(cursor, archive):
+    """Months that have their own partition, oldest first."""
+    cursor.execute("""
+        SELECT partition_name FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (archive,))
+    months = []
+    for name, in cursor.fetchall():
+        match = MONTH_PARTITION.match(name or '')
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def ensure_partitions(cursor, today=None):
+    """Split monthly partitions off p_future up to next month.
+
+    The first split starts at the oldest row still in the live table, so
+    everything archived later has a month of its own.
+    """
+    through = _next_month(_month_start(today or date.today()))
+    for table, column, bound, _ in ARCHIVES:
+        archive = ARCHIVE_TABLES[table]
+        existing = month_partitions(cursor, archive)
+        if existing:
+            month = _next_month(existing[-1])
+        else:
+            cursor.execute(f"SELECT MIN({column}) FROM {table}")
+            oldest = cursor.fetchone()[0]
+            month = _month_start(oldest) if oldest else _month_start(through)
+        new = []
+        while month <= through:
+            new.append(_partition(month, bound))
+            month = _next_month(month)
+        if new:
+            # p_future holds nothing this far ahead, so the split copies no rows
+            cursor.execute(f"""
+                ALTER TABLE {archive} REORGANIZE PARTITION p_future INTO (
+                    {', '.join(new)},
+                    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+                )
+            """)
+
+
+def drop_expired_partitions(cursor, today=None):
+    """Drop archived months older than ARCHIVE_RETENTION_MONTHS; returns partitions dropped."""
+    if ARCHIVE_RETENTION_MONTHS <= 0:
+        return 0
+    oldest_kept = _month_start(today or date.today())
+    for _ in range(ARCHIVE_RETENTION_MONTHS):
+        oldest_kept = _month_start(oldest_kept - timedelta(days=1))
+    dropped = 0
+    for table, _, _, _ in ARCHIVES:
+        archive = ARCHIVE_TABLES[table]
+        expired = [f"p{month:%Y%m}" for month in month_partitions(cursor, archive) if month < oldest_kept]
+        if expired:
+            cursor.execute(f"ALTER TABLE {archive} DROP PARTITION {', '.join(expired)}")
+            dropped += len(expired)
+    return dropped
+
+
+def _placeholders(count):
+    return ', '.join(['%s'] * count)
+
+
+def archive_batch(cursor, cutoff, limit=ARCHIVE_BATCH):
+    """Move up to `limit` bookings closed before `cutoff`; returns how many moved.
+
+    Call inside a transaction; the bookings stay locked until it commits.
+    """
+    cursor.execute(CLOSED_BOOKINGS_SQL, (cutoff, limit))
+    ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return 0
+    in_ids = _placeholders(len(ids))
+    # Children first on the way out, parents first on the way in
+    cursor.execute(f"INSERT INTO bookings_archive SELECT * FROM bookings WHERE id IN ({in_ids})", ids)
+    for table in ('payments', 'invoices'):
+        cursor.execute(f"INSERT INTO {table}_archive SELECT * FROM {table} WHERE booking_id IN ({in_ids})",
+                       ids)
+    for table in ('invoices', 'payments'):
+        cursor.execute(f"DELETE FROM {table} WHERE booking_id IN ({in_ids})", ids)
+    cursor.execute(f"DELETE FROM bookings WHERE id IN ({in_ids})", ids)
+    return len(ids)
+
+
+def run_archiver(get_connection, today=None):
+    """One archiving pass; returns the number of bookings moved."""
+    today = today or date.today()
+    cutoff = today - timedelta(days=ARCHIVE_AFTER_DAYS)
+    conn = get_connection()
+    cursor = conn.cursor()
+    moved = 0
+    try:
+        # Only one worker across all replicas archives at a time
+        cursor.execute("SELECT GET_LOCK('booking_archive', 0)")
+        if not cursor.fetchone()[0]:
+            return 0
+        try:
+            ensure_partitions(cursor, today)
+            dropped = drop_expired_partitions(cursor, today)
+            if dropped:
+                print(f"Dropped {dropped} expired archive partitions")
+            while True:
+                count = archive_batch(cursor, cutoff)
+                conn.commit()
+                moved += count
+                if count < ARCHIVE_BATCH:
+                    break
+            if moved or dropped:
+                # The ?archived=1 lists changed. Imported here as
+                # common.conditional depends on common.migrate, which uses this module
+                from common.conditional import bump_versions
+                bump_versions(cursor, 'bookings', 'payments', 'invoices')
+                conn.commit()
+            return moved
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('booking_archive')")
+            cursor.fetchone()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+_archiver_pid = None
+_archiver_lock = threading.Lock()
+
+
+def start_archiver(get_connection, interval=ARCHIVE_INTERVAL):
+    # Started lazily from a request so each forked worker gets its own thread
+    global _archiver_pid
+    if interval <= 0 or _archiver_pid == os.getpid():
+        return
+    with _archiver_lock:
+        if _archiver_pid == os.getpid():
+            return
+        _archiver_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                moved = run_archiver(get_connection)
+                if moved:
+                    print(f"Archived {moved} closed bookings")
+            except Exception as e:
+                print(f"Error archiving bookings: {e}")
+
+    threading.Thread(target=run, name='booking-archiver', daemon=True).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Move closed bookings, payments and invoices to the archive")
+    parser.parse_args(argv)
+
+    from common.migrate import connect
+    moved = run_archiver(connect)
+    print(f"Archived {moved} closed bookings")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
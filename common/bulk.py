@@ -0,0 +1,51 @@
+"""Helpers for bulk-write endpoints.
+
+Items are validated one by one so a bad item is reported by its index
+instead of failing the request. The valid ones are written with batched
+multi-row INSERTs inside the caller's transaction.
+"""
+
+MAX_BULK_ITEMS = 50000
+BATCH_SIZE = 1000
+
+
+class BulkError(ValueError):
+    pass
+
+
+def bulk_items(data):
+    if not isinstance(data, list):
+        raise BulkError("Request body must be a JSON array")
+    if not data:
+        raise BulkError("Request body must contain at least one item")
+    if len(data) > MAX_BULK_ITEMS:
+        raise BulkError(f"At most {MAX_BULK_ITEMS} items per request")
+    return data
+
+
+def build_rows(items, build):
+    # build(item) returns the INSERT parameters or raises for a bad item
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError("Item must be a JSON object")
+            rows.append(build(item))
+        except KeyError as e:
+            errors.append({"index": index, "error": f"Missing field {e}"})
+        except (TypeError, ValueError) as e:
+            errors.append({"index": index, "error": str(e)})
+    return rows, errors
+
+
+def insert_batches(cursor, sql, rows, batch_size=BATCH_SIZE):
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(sql, rows[start:start + batch_size])
+
+
+def bulk_result(inserted, errors):
+    return {
+        "message": f"{inserted} items inserted, {len(errors)} rejected",
+        "inserted": inserted,
+        "errors": errors,
+    }
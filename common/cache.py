@@ -0,0 +1,116 @@
+"""Response cache with TTL and LRU eviction.
+
+Entries are stored already serialized so a hit can be written straight to
+the response. The cache lives in the worker process by default; setting
+CACHE_REDIS_URL stores entries in Redis instead so every replica shares
+them (requires the ``redis`` package). Callers key entries by a content
+version, so nothing is ever invalidated; superseded entries age out.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+
+
+class LocalBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, body = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, body)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    # LRU eviction is left to the Redis maxmemory-policy (allkeys-lru)
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, body, ttl):
+        self._client.set(key, body, ex=max(1, int(ttl)))
+        return 0
+
+    def delete(self, keys):
+        if keys:
+            self._client.delete(*keys)
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    def __init__(self, name, ttl=300, max_entries=1024, redis_url=CACHE_REDIS_URL):
+        self.name = name
+        self.ttl = ttl
+        self.backend = RedisBackend(redis_url) if redis_url else LocalBackend(max_entries)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _key(self, key):
+        return f"{self.name}:{key}"
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def get(self, key):
+        try:
+            body = self.backend.get(self._key(key))
+        except Exception:
+            # A cache outage should only cost a database round trip
+            body = None
+        self._count('hits' if body is not None else 'misses')
+        return body
+
+    def set(self, key, body):
+        try:
+            self._count('evictions', self.backend.set(self._key(key), body, self.ttl))
+        except Exception:
+            pass
+        return body
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'backend': 'redis' if isinstance(self.backend, RedisBackend) else 'local',
+            'entries': self.backend.size(),
+            'ttl': self.ttl,
+            'hit_ratio': round(counters['hits'] / lookups, 3) if lookups else 0.0,
+            **counters,
+        }
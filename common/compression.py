@@ -0,0 +1,99 @@
+"""gzip/brotli compression of JSON responses, negotiated by Accept-Encoding.
+
+Brotli is used when the client prefers or accepts it and the ``brotli``
+package is installed; otherwise gzip. Bodies under COMPRESS_MIN_SIZE bytes
+are sent as they are. Streamed responses (the unpaginated /all lists) are
+compressed chunk by chunk and flushed after each one, so rows still reach
+the client while the query is being read.
+"""
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+# Fast settings: most of the size reduction for a fraction of the CPU
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 5))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html', 'text/csv')
+
+
+def choose_encoding(accept_encodings):
+    """'br', 'gzip' or None for a werkzeug Accept-Encoding header."""
+    gzip_quality = accept_encodings['gzip']
+    br_quality = accept_encodings['br'] if brotli is not None else 0
+    if br_quality and br_quality >= gzip_quality:
+        return 'br'
+    return 'gzip' if gzip_quality else None
+
+
+class Compressor:
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self._stream = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+            self.compress = self._stream.process
+            self._flush = self._stream.flush
+            self._finish = self._stream.finish
+        else:
+            # wbits 31 writes the gzip header and trailer
+            self._stream = zlib.compressobj(COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress = self._stream.compress
+            self._flush = lambda: self._stream.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._stream.flush
+
+    def flush(self):
+        return self._flush()
+
+    def finish(self):
+        return self._finish()
+
+
+def compress(data, encoding):
+    compressor = Compressor(encoding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks, encoding):
+    compressor = Compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            out = compressor.compress(chunk) + compressor.flush()
+            if out:
+                yield out
+        yield compressor.finish()
+    finally:
+        # Closes the view's generator, which returns its connection
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def register_compression(app):
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < COMPRESS_MIN_SIZE:
+                return response
+            response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,172 @@
+"""Conditional GET from per-table version counters.
+
+table_versions holds a counter per table that list endpoints read from.
+Every write endpoint bumps the counters of the tables it changed once its
+transaction has committed (@changes, or bump_versions() where only some
+requests write). A read endpoint declares the tables its response is built
+from (@conditional); its ETag is a hash of their counters and the schema
+version, and Last-Modified is the newest bump among them.
+
+The counters are read with one primary-key lookup *before* the view runs:
+
+- If-None-Match with the current ETag (or, without one, If-Modified-Since
+  not older than Last-Modified) is answered 304 without running the
+  view's query at all.
+- Otherwise the view runs and its 200 carries the ETag. As the counters
+  were read first, the body is never older than its ETag; at worst a body
+  written during the request gets the previous ETag and is re-sent once.
+
+Bumping after commit keeps the hot counter rows out of the write
+transactions, so concurrent bookings do not queue on them. The ETags are
+weak (W/) because compression changes the bytes, not the content.
+
+A view that must not cost a database round trip at all (hotel-service's
+cached catalog) passes max_age: the counters are then kept in the worker
+for that many seconds and re-read at once after a write through the same
+worker (@changes). Writes through other workers or replicas show up
+within max_age instead.
+"""
+import functools
+import hashlib
+import math
+import threading
+import time
+
+from common.migrate import LATEST_VERSION
+
+# Statement is shared with the asyncio apps (aio_app.py)
+BUMP_SQL = """
+    INSERT INTO table_versions (table_name, version)
+    VALUES (%s, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+
+def bump_params(tables):
+    return [(table,) for table in sorted(set(tables))]
+
+
+def bump_versions(cursor, *tables):
+    cursor.executemany(BUMP_SQL, bump_params(tables))
+
+
+def _placeholders(count):
+    return ', '.join(['%s'] * count)
+
+
+def read_versions(cursor, tables):
+    """Return (etag value, Last-Modified epoch seconds or None)."""
+    tables = sorted(set(tables))
+    cursor.execute(f"""
+        SELECT table_name, version, UNIX_TIMESTAMP(updated_at), UNIX_TIMESTAMP(NOW(3))
+        FROM table_versions
+        WHERE table_name IN ({_placeholders(len(tables))})
+    """, tables)
+    rows = cursor.fetchall()
+    versions = {table: version for table, version, _, _ in rows}
+    tag = f"{LATEST_VERSION}|" + '|'.join(f"{table}:{versions.get(table, 0)}" for table in tables)
+    modified = None
+    if rows:
+        # Last-Modified has whole seconds. It is only sent once its second
+        # is over, so a later bump can never share it and be missed
+        modified = math.ceil(max(updated for _, _, updated, _ in rows))
+        if modified > rows[0][3]:
+            modified = None
+    return hashlib.sha1(tag.encode()).hexdigest()[:20], modified
+
+
+# sorted tables -> (monotonic read time, etag, modified), for max_age views
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def forget_versions(*tables):
+    """Drop kept counters that involve `tables`, so the next read sees a local write."""
+    with _versions_lock:
+        for key in [key for key in _versions if set(key) & set(tables)]:
+            del _versions[key]
+
+
+def _kept_versions(get_connection, tables, max_age):
+    key = tuple(sorted(set(tables)))
+    now = time.monotonic()
+    kept = _versions.get(key)
+    if kept is not None and now - kept[0] < max_age:
+        return kept[1:]
+    conn = get_connection()
+    cursor = conn.cursor()
+    etag, modified = read_versions(cursor, tables)
+    cursor.close()
+    conn.close()
+    if max_age > 0:
+        with _versions_lock:
+            _versions[key] = (now, etag, modified)
+    return etag, modified
+
+
+def changes(get_connection, *tables):
+    """Decorate a Flask write view to bump `tables` after a successful response."""
+    from flask import make_response
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code < 400:
+                try:
+                    conn = get_connection()
+                    cursor = conn.cursor()
+                    bump_versions(cursor, *tables)
+                    conn.commit()
+                    cursor.close()
+                    conn.close()
+                except Exception as e:
+                    # The write stands; clients may get 304 for it until the next bump
+                    print(f"Error bumping table versions: {e}")
+                # After the bump, so a concurrent read cannot keep the old counters
+                forget_versions(*tables)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional(get_connection, *tables, max_age=0):
+    """Decorate a Flask GET view with ETag/Last-Modified and 304 answers.
+
+    The ETag value is also left in flask.g.content_version for views that
+    cache their body per version. With max_age the counters are read at
+    most once per max_age seconds per worker (see the module docstring).
+    """
+    from flask import g, make_response, request
+    from werkzeug.http import http_date
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                etag, modified = _kept_versions(get_connection, tables, max_age)
+            except Exception as e:
+                print(f"Error reading table versions: {e}")
+                return view(*args, **kwargs)
+            g.content_version = etag
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = (since is not None and modified is not None
+                                and modified <= since.timestamp())
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if modified is not None:
+                response.headers['Last-Modified'] = http_date(modified)
+            # Cache, but always revalidate
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
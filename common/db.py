@@ -0,0 +1,297 @@
+"""Pooled MySQL connections shared by all services.
+
+Each worker process keeps a bounded pool of connections. Connections are
+health-checked when borrowed, recycled once they are older than
+DB_POOL_RECYCLE seconds, and callers block for up to DB_POOL_TIMEOUT
+seconds when every connection is in use.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+
+from common import metrics, query_profile
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'mysql-db'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', 'password'),
+    'database': os.getenv('DB_NAME', 'hotel_booking'),
+    'port': int(os.getenv('DB_PORT', 3306))
+}
+
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+class TimedCursor:
+    """Cursor proxy that records how long each statement takes."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+    @contextmanager
+    def _timed(self, operation, params):
+        started = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe_query(operation, elapsed, failed)
+            query_profile.record(operation, params, elapsed, failed)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        with self._timed(operation, params):
+            return self._cursor.execute(operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        # Plans are captured with the first row's parameters
+        first = seq_params[0] if isinstance(seq_params, (list, tuple)) and seq_params else None
+        with self._timed(operation, first):
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+
+
+class PooledConnection:
+    """Proxy that hands the connection back to the pool on close()."""
+
+    def __init__(self, pool, conn, created_at):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise mysql.connector.errors.OperationalError("Connection already returned to pool")
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self.__getattr__('cursor')(*args, **kwargs))
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn, self._created_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Handlers that return early without close() still give the
+        # connection back once the proxy goes out of scope.
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    def __init__(self, config, size=POOL_SIZE, timeout=POOL_TIMEOUT, recycle=POOL_RECYCLE):
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self._idle = []
+        self._open = 0
+        self._cond = threading.Condition()
+        self._waiting = 0
+        # monotonic start of each current wait, for the longest-wait stat
+        self._wait_starts = []
+        self._counters = {
+            'acquired': 0,
+            'created': 0,
+            'recycled': 0,
+            'broken': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.config)
+        with self._cond:
+            self._counters['created'] += 1
+        return conn, time.monotonic()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    def _usable(self, conn, created_at):
+        if time.monotonic() - created_at > self.recycle:
+            with self._cond:
+                self._counters['recycled'] += 1
+            return False
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self._counters['broken'] += 1
+            return False
+
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                waited = False
+                wait_started = time.monotonic()
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise PoolExhausted(
+                            f"No database connection available after {timeout}s "
+                            f"(pool size {self.size})")
+                    if not waited:
+                        self._counters['waits'] += 1
+                        waited = True
+                    self._waiting += 1
+                    self._wait_starts.append(wait_started)
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                        self._wait_starts.remove(wait_started)
+                if waited:
+                    self._counters['wait_seconds'] += time.monotonic() - wait_started
+                metrics.db_pool_wait.observe(time.monotonic() - wait_started if waited else 0)
+                if self._idle:
+                    # LIFO keeps the hottest connections busy and lets
+                    # the rest age out via recycle.
+                    conn, created_at = self._idle.pop()
+                else:
+                    self._open += 1
+                    conn = None
+
+            if conn is None:
+                try:
+                    conn, created_at = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._open -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._usable(conn, created_at):
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._counters['acquired'] += 1
+            return PooledConnection(self, conn, created_at)
+
+    def release(self, conn, created_at):
+        try:
+            # Never hand out a connection with someone else's open transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            with self._cond:
+                self._counters['broken'] += 1
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at))
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            longest_wait = time.monotonic() - min(self._wait_starts) if self._wait_starts else 0
+            return {
+                'size': self.size,
+                'open': self._open,
+                'idle': idle,
+                'in_use': self._open - idle,
+                'waiting': self._waiting,
+                'longest_wait': round(longest_wait, 3),
+                **self._counters,
+            }
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    # Pools are per process; a forked worker must not reuse its parent's sockets
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool(DB_CONFIG)
+                _pool_pid = pid
+    return _pool
+
+
+def get_db_connection(timeout=None):
+    return get_pool().acquire(timeout)
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+db_pool_connections = metrics.REGISTRY.gauge(
+    'db_pool_connections', 'Pooled connections by state', ['state'])
+db_pool_waiting = metrics.REGISTRY.gauge(
+    'db_pool_waiting', 'Threads waiting to borrow a connection')
+
+
+def _collect_pool_metrics():
+    # Only report a pool this process actually opened
+    if _pool is None or _pool_pid != os.getpid():
+        return
+    stats = _pool.stats()
+    for state in ('open', 'idle', 'in_use'):
+        db_pool_connections.set(stats[state], state=state)
+    db_pool_waiting.set(stats['waiting'])
+
+
+metrics.REGISTRY.add_collector(_collect_pool_metrics)
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
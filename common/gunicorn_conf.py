@@ -0,0 +1,44 @@
+"""Gunicorn settings shared by every service image.
+
+    gunicorn -c common/gunicorn_conf.py app:app
+
+Workers are threaded (gthread) so a worker keeps serving other requests
+while one of its threads waits on MySQL. Each worker has its own DB pool,
+so a pod opens up to WEB_WORKERS * DB_POOL_SIZE connections.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 4))
+
+# Recycle workers periodically so slow leaks cannot build up; the jitter
+# keeps them from all restarting at once
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 1000))
+
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+keepalive = int(os.getenv('WEB_KEEPALIVE', 5))
+# Must stay below the pod's terminationGracePeriodSeconds (30s by default)
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 25))
+
+accesslog = '-'
+errorlog = '-'
+
+# Workers share metrics through snapshot files so /metrics covers the pod
+os.environ.setdefault('METRICS_DIR', '/tmp/service-metrics')
+
+
+def on_starting(server):
+    from common import metrics
+    metrics.reset_directory(os.environ['METRICS_DIR'])
+
+
+def post_fork(server, worker):
+    # Drop anything the master recorded before forking
+    from common import metrics, query_profile
+    metrics.REGISTRY.reset()
+    if query_profile.profile is not None:
+        query_profile.profile.reset()
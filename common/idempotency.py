@@ -0,0 +1,234 @@
+"""Idempotency-Key support for POST endpoints that create rows.
+
+A client that retries a create after a timeout sends the same
+Idempotency-Key header. The first request with a key claims it in the
+idempotency_keys table, runs, and stores its response; every later
+request with that key gets the stored response back (with
+Idempotent-Replayed: true) without touching the business tables.
+
+- Same key with a different body: 422.
+- Same key while the first request is still running: 409 with Retry-After.
+- A 5xx response is not stored, so the key can be retried.
+- A claim whose request died before storing a response is taken over
+  after IDEMPOTENCY_LOCK_SECONDS, which is longer than gunicorn lets a
+  request run.
+
+Keys expire after IDEMPOTENCY_TTL seconds and are removed by a background
+sweeper.
+"""
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+
+import mysql.connector
+
+from common.metrics import REGISTRY
+
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', 60))
+IDEMPOTENCY_SWEEP_INTERVAL = int(os.getenv('IDEMPOTENCY_SWEEP_INTERVAL', 600))
+IDEMPOTENCY_SWEEP_BATCH = int(os.getenv('IDEMPOTENCY_SWEEP_BATCH', 1000))
+MAX_KEY_LENGTH = 255
+
+HEADER = 'Idempotency-Key'
+
+# claim() outcomes
+CLAIMED = 'claimed'
+REPLAY = 'replayed'
+MISMATCH = 'mismatch'
+IN_PROGRESS = 'in_progress'
+
+idempotency_requests = REGISTRY.counter(
+    'idempotency_requests_total', 'Requests carrying an Idempotency-Key by outcome',
+    ['scope', 'outcome'])
+
+
+def request_hash(method, path, body):
+    # Key order and whitespace in a JSON body do not make it a different request
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode()
+    except ValueError:
+        pass
+    return hashlib.sha256(method.encode() + b' ' + path.encode() + b'\n' + body).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, get_connection, ttl=IDEMPOTENCY_TTL, lock_seconds=IDEMPOTENCY_LOCK_SECONDS):
+        self.get_connection = get_connection
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+
+    def claim(self, scope, key, digest):
+        """Return (outcome, stored); stored is (status, body) for REPLAY."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            for _ in range(2):
+                try:
+                    cursor.execute("""
+                        INSERT INTO idempotency_keys (scope, idempotency_key, request_hash, expires_at)
+                        VALUES (%s, %s, %s, NOW() + INTERVAL %s SECOND)
+                    """, (scope, key, digest, self.ttl))
+                    conn.commit()
+                    return CLAIMED, None
+                except mysql.connector.errors.IntegrityError:
+                    conn.rollback()
+
+                cursor.execute("""
+                    SELECT request_hash, status_code, response,
+                           expires_at < NOW(), locked_at < NOW() - INTERVAL %s SECOND
+                    FROM idempotency_keys
+                    WHERE scope = %s AND idempotency_key = %s
+                """, (self.lock_seconds, scope, key))
+                row = cursor.fetchone()
+                if row is None:
+                    continue
+                stored_hash, status_code, response, expired, stale = row
+                if expired:
+                    cursor.execute("""
+                        DELETE FROM idempotency_keys
+                        WHERE scope = %s AND idempotency_key = %s AND expires_at < NOW()
+                    """, (scope, key))
+                    conn.commit()
+                    continue
+                if stored_hash != digest:
+                    return MISMATCH, None
+                if status_code is not None:
+                    return REPLAY, (status_code, response)
+                if stale:
+                    # The request that claimed the key died without answering
+                    cursor.execute("""
+                        UPDATE idempotency_keys SET locked_at = NOW()
+                        WHERE scope = %s AND idempotency_key = %s AND status_code IS NULL
+                        AND locked_at < NOW() - INTERVAL %s SECOND
+                    """, (scope, key, self.lock_seconds))
+                    claimed = cursor.rowcount == 1
+                    conn.commit()
+                    if claimed:
+                        return CLAIMED, None
+                return IN_PROGRESS, None
+            return IN_PROGRESS, None
+        finally:
+            cursor.close()
+            conn.close()
+
+    def complete(self, scope, key, status_code, response):
+        self._write("""
+            UPDATE idempotency_keys SET status_code = %s, response = %s
+            WHERE scope = %s AND idempotency_key = %s
+        """, (status_code, response, scope, key))
+
+    def release(self, scope, key):
+        self._write("""
+            DELETE FROM idempotency_keys
+            WHERE scope = %s AND idempotency_key = %s AND status_code IS NULL
+        """, (scope, key))
+
+    def _write(self, sql, params):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def purge_expired(self, batch=IDEMPOTENCY_SWEEP_BATCH):
+        """Delete expired keys in batches; returns the number of rows removed."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        removed = 0
+        try:
+            while True:
+                cursor.execute("""
+                    DELETE FROM idempotency_keys
+                    WHERE expires_at < NOW()
+                    LIMIT %s
+                """, (batch,))
+                deleted = cursor.rowcount
+                conn.commit()
+                removed += deleted
+                if deleted < batch:
+                    return removed
+        finally:
+            cursor.close()
+            conn.close()
+
+
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+def start_sweeper(store, interval=IDEMPOTENCY_SWEEP_INTERVAL):
+    # Started lazily from a request so each forked worker gets its own thread
+    global _sweeper_pid
+    if interval <= 0 or _sweeper_pid == os.getpid():
+        return
+    with _sweeper_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                removed = store.purge_expired()
+                if removed:
+                    print(f"Removed {removed} expired idempotency keys")
+            except Exception as e:
+                print(f"Error sweeping idempotency keys: {e}")
+
+    threading.Thread(target=run, name='idempotency-sweeper', daemon=True).start()
+
+
+def idempotent(store, scope):
+    """Decorate a Flask view so requests with an Idempotency-Key run once."""
+    from flask import Response, jsonify, make_response, request
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+            start_sweeper(store)
+            try:
+                outcome, stored = store.claim(
+                    scope, key, request_hash(request.method, request.path, request.get_data()))
+            except Exception as e:
+                return jsonify({"error": str(e)}), 500
+            idempotency_requests.inc(scope=scope, outcome=outcome)
+
+            if outcome == REPLAY:
+                status_code, body = stored
+                return Response(body, status=status_code, mimetype='application/json',
+                                headers={'Idempotent-Replayed': 'true'})
+            if outcome == MISMATCH:
+                return jsonify({"error": f"{HEADER} was already used with a different request"}), 422
+            if outcome == IN_PROGRESS:
+                return (jsonify({"error": f"A request with this {HEADER} is still being processed"}),
+                        409, {'Retry-After': '1'})
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                store.release(scope, key)
+                raise
+            try:
+                if response.status_code >= 500 or response.is_streamed:
+                    store.release(scope, key)
+                else:
+                    store.complete(scope, key, response.status_code, response.get_data(as_text=True))
+            except Exception as e:
+                # The work is done; a retry will get 409 until the claim goes stale
+                print(f"Error storing idempotent response: {e}")
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,369 @@
+"""Request, database and pool metrics in the Prometheus text format.
+
+Every service exposes GET /metrics through instrument_app(). Metrics live
+in the worker process; when METRICS_DIR is set (the gunicorn config sets
+it) each worker also writes a snapshot there every few seconds and
+/metrics merges the snapshots, so a scrape that lands on any worker
+reports the whole pod. Counters and histograms of workers that have exited
+are folded into a single file so totals never go backwards; their gauges
+are dropped.
+"""
+import fcntl
+import json
+import os
+import re
+import threading
+import time
+
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LABEL_SEP = '\x1f'
+DEAD_FILE = 'dead.json'
+
+
+class Metric:
+    def __init__(self, registry, name, help, labelnames, type, buckets=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.type = type
+        self.buckets = tuple(buckets) if buckets else None
+        self._lock = registry._lock
+        # label values -> number, or [bucket counts..., sum, count] for histograms
+        self._samples = {}
+
+    def _key(self, labels):
+        return LABEL_SEP.join(str(labels.get(name, '')) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = self._samples.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._samples[key] = value
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            sample = self._samples.get(key)
+            if sample is None:
+                sample = self._samples[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample[i] += 1
+                    break
+            sample[-2] += value
+            sample[-1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            samples = {key: list(value) if isinstance(value, list) else value
+                       for key, value in self._samples.items()}
+        return {'help': self.help, 'type': self.type, 'labels': list(self.labelnames),
+                'buckets': list(self.buckets) if self.buckets else None, 'samples': samples}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def _add(self, name, help, labelnames, type, buckets=None):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Metric(self, name, help, labelnames, type, buckets)
+            return self._metrics[name]
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(name, help, labelnames, 'counter')
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(name, help, labelnames, 'gauge')
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(name, help, labelnames, 'histogram', buckets)
+
+    def reset(self):
+        # A forked worker must not report the samples its parent recorded
+        with self._lock:
+            for metric in self._metrics.values():
+                metric._samples.clear()
+
+    def add_collector(self, collect):
+        """Register a callable run before every snapshot, e.g. to set gauges."""
+        self._collectors.append(collect)
+
+    def snapshot(self):
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+REGISTRY = Registry()
+
+http_requests_in_flight = REGISTRY.gauge(
+    'http_requests_in_flight', 'Requests currently being handled', ['service'])
+http_request_duration = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency by route and status',
+    ['service', 'method', 'route', 'status'])
+http_request_size = REGISTRY.histogram(
+    'http_request_size_bytes', 'Request body size by route',
+    ['service', 'method', 'route'], buckets=SIZE_BUCKETS)
+http_response_size = REGISTRY.histogram(
+    'http_response_size_bytes', 'Response body size by route (buffered responses only)',
+    ['service', 'method', 'route'], buckets=SIZE_BUCKETS)
+db_query_duration = REGISTRY.histogram(
+    'db_query_duration_seconds', 'Time spent in cursor.execute()/executemany() by statement',
+    ['statement'])
+db_query_errors = REGISTRY.counter(
+    'db_query_errors_total', 'Statements that raised an error', ['statement'])
+db_pool_wait = REGISTRY.histogram(
+    'db_pool_wait_seconds', 'Time spent waiting to borrow a pooled connection')
+
+
+_IN_LIST = re.compile(r'\bIN\s*\(\s*%s(?:\s*,\s*%s)+\s*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'(VALUES\s*\([^)]*\))(?:\s*,\s*\([^)]*\))+', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+_statement_labels = {}
+
+
+def normalize_sql(sql):
+    """Squeeze whitespace and fold variable-length IN/VALUES lists."""
+    text = sql.decode() if isinstance(sql, bytes) else str(sql)
+    text = _WHITESPACE.sub(' ', text).strip()
+    text = _IN_LIST.sub('IN (%s, ...)', text)
+    return _VALUES_LIST.sub(r'\1, ...', text)
+
+
+def statement_label(sql):
+    """Bounded metric label for a SQL string."""
+    label = _statement_labels.get(sql)
+    if label is None:
+        label = normalize_sql(sql)[:200]
+        if len(_statement_labels) < 10000:
+            _statement_labels[sql] = label
+    return label
+
+
+def observe_query(sql, seconds, failed=False):
+    label = statement_label(sql)
+    db_query_duration.observe(seconds, statement=label)
+    if failed:
+        db_query_errors.inc(statement=label)
+
+
+# --- Exposition ---
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(snapshot):
+    lines = []
+    for name in sorted(snapshot):
+        metric = snapshot[name]
+        lines.append(f'# HELP {name} {metric["help"]}')
+        lines.append(f'# TYPE {name} {metric["type"]}')
+        names = metric['labels']
+        for key in sorted(metric['samples']):
+            values = key.split(LABEL_SEP) if names else []
+            sample = metric['samples'][key]
+            if metric['type'] != 'histogram':
+                lines.append(f'{name}{_labels(names, values)} {_number(sample)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['buckets'], sample):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(names, values, [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(names, values, [("le", "+Inf")])} {sample[-1]}')
+            lines.append(f'{name}_sum{_labels(names, values)} {_number(sample[-2])}')
+            lines.append(f'{name}_count{_labels(names, values)} {sample[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+# --- Multi-process aggregation ---
+
+def merge(target, snapshot, gauges=True):
+    for name, metric in snapshot.items():
+        if metric['type'] == 'gauge' and not gauges:
+            continue
+        merged = target.setdefault(name, dict(metric, samples={}))
+        samples = merged['samples']
+        for key, value in metric['samples'].items():
+            current = samples.get(key)
+            if current is None:
+                samples[key] = list(value) if isinstance(value, list) else value
+            elif isinstance(value, list):
+                samples[key] = [a + b for a, b in zip(current, value)]
+            else:
+                samples[key] = current + value
+    return target
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path, snapshot):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def flush(directory=METRICS_DIR):
+    if directory:
+        _write(os.path.join(directory, f'{os.getpid()}.json'), REGISTRY.snapshot())
+
+
+def collect(directory=METRICS_DIR):
+    """Snapshot of this process merged with every other worker's file."""
+    if not directory:
+        return REGISTRY.snapshot()
+    own = REGISTRY.snapshot()
+    _write(os.path.join(directory, f'{os.getpid()}.json'), own)
+    with open(os.path.join(directory, 'lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead_path = os.path.join(directory, DEAD_FILE)
+        dead = _read(dead_path) or {}
+        total = merge({}, own)
+        folded = False
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == DEAD_FILE:
+                continue
+            pid = int(filename[:-5])
+            if pid == os.getpid():
+                continue
+            snapshot = _read(os.path.join(directory, filename))
+            if snapshot is None:
+                continue
+            if _pid_alive(pid):
+                merge(total, snapshot)
+            else:
+                merge(dead, snapshot, gauges=False)
+                os.remove(os.path.join(directory, filename))
+                folded = True
+        if folded:
+            _write(dead_path, dead)
+        return merge(total, dead)
+
+
+def reset_directory(directory=METRICS_DIR):
+    # Called by the gunicorn master before workers start
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for filename in os.listdir(directory):
+        if filename.endswith('.json'):
+            os.remove(os.path.join(directory, filename))
+
+
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def start_flusher(directory=METRICS_DIR, interval=METRICS_FLUSH_INTERVAL):
+    # Started lazily from a request so each forked worker gets its own thread
+    global _flusher_pid
+    if not directory or _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+
+    def run():
+        while True:
+            try:
+                flush(directory)
+            except Exception as e:
+                print(f"Error writing metrics snapshot: {e}")
+            time.sleep(interval)
+
+    threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+
+# --- Flask integration ---
+
+def instrument_app(app, service):
+    """Time every request and serve GET /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        start_flusher()
+        g._metrics_started = time.perf_counter()
+        g._metrics_in_flight = True
+        http_requests_in_flight.inc(service=service)
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_request_duration.observe(time.perf_counter() - started, service=service,
+                                      method=request.method, route=route,
+                                      status=response.status_code)
+        if request.content_length:
+            http_request_size.observe(request.content_length, service=service,
+                                      method=request.method, route=route)
+        if not response.is_streamed:
+            http_response_size.observe(response.calculate_content_length() or 0, service=service,
+                                       method=request.method, route=route)
+        return response
+
+    @app.teardown_request
+    def _finish_request(exc):
+        # Runs even when the handler raised, so the gauge cannot drift
+        if g.pop('_metrics_in_flight', False):
+            http_requests_in_flight.dec(service=service)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(render(collect()), content_type=CONTENT_TYPE)
+
+    return app
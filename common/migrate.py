@@ -0,0 +1,435 @@
+"""Versioned schema and seed migrations for the shared hotel_booking database.
+
+    python -m common.migrate            # apply everything pending
+    python -m common.migrate --status   # list applied and pending versions
+
+This is the only place the schema is created or seeded. Run it once per
+deploy (the schema-migrate Kubernetes Job, or the schema-migrate service
+in docker-compose); the services themselves never touch the schema.
+Applied versions are recorded in schema_migrations, runners on different
+pods serialize on a MySQL named lock, and every step is safe to repeat,
+so a migration interrupted half way can simply be run again.
+"""
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+import mysql.connector
+
+from common import archive, rollups, seed
+from common.db import DB_CONFIG
+
+LOCK_NAME = 'hotel_booking.schema_migrations'
+LOCK_TIMEOUT = 600
+
+Migration = namedtuple('Migration', ['version', 'name', 'steps'])
+Index = namedtuple('Index', ['table', 'name', 'columns'])
+
+
+def index_exists(cursor, table, name):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, name))
+    return cursor.fetchone() is not None
+
+
+def add_index(index):
+    def step(cursor):
+        if index_exists(cursor, index.table, index.name):
+            return
+        # Online DDL: reads and writes continue while the index builds
+        cursor.execute(f"ALTER TABLE {index.table} ADD INDEX {index.name} ({', '.join(index.columns)}), "
+                       "ALGORITHM=INPLACE, LOCK=NONE")
+    step.description = f"index {index.table}.{index.name}"
+    return step
+
+
+BASE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS hotels (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        location VARCHAR(255) NOT NULL,
+        description TEXT,
+        amenities TEXT,
+        price_per_night DECIMAL(10,2),
+        total_rooms INT DEFAULT 50,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS room_types (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        hotel_id INT,
+        type_name VARCHAR(100) NOT NULL,
+        price DECIMAL(10,2),
+        capacity INT,
+        amenities TEXT,
+        FOREIGN KEY (hotel_id) REFERENCES hotels(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(255) UNIQUE NOT NULL,
+        email VARCHAR(255) UNIQUE NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        first_name VARCHAR(255),
+        last_name VARCHAR(255),
+        phone VARCHAR(20),
+        is_admin BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_sessions (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        session_token VARCHAR(255) UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bookings (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        hotel_id INT,
+        room_type_id INT,
+        check_in_date DATE NOT NULL,
+        check_out_date DATE NOT NULL,
+        total_amount DECIMAL(10,2),
+        status ENUM('pending', 'confirmed', 'cancelled') DEFAULT 'pending',
+        guest_name VARCHAR(255),
+        guest_email VARCHAR(255),
+        guest_phone VARCHAR(20),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS room_availability (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        hotel_id INT,
+        room_type_id INT,
+        available_date DATE,
+        available_rooms INT DEFAULT 10,
+        UNIQUE KEY unique_availability (hotel_id, room_type_id, available_date)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS reviews (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT,
+        hotel_id INT,
+        booking_id INT,
+        rating INT CHECK (rating >= 1 AND rating <= 5),
+        comment TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS hotel_rating_stats (
+        hotel_id INT PRIMARY KEY,
+        rating_sum INT NOT NULL DEFAULT 0,
+        rating_count INT NOT NULL DEFAULT 0,
+        rating_1 INT NOT NULL DEFAULT 0,
+        rating_2 INT NOT NULL DEFAULT 0,
+        rating_3 INT NOT NULL DEFAULT 0,
+        rating_4 INT NOT NULL DEFAULT 0,
+        rating_5 INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS payments (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        booking_id INT,
+        user_id INT,
+        amount DECIMAL(10,2),
+        payment_method VARCHAR(50),
+        payment_status ENUM('pending', 'completed', 'failed', 'refunded') DEFAULT 'pending',
+        transaction_id VARCHAR(255) UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS invoices (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        booking_id INT,
+        user_id INT,
+        invoice_number VARCHAR(50) UNIQUE,
+        amount DECIMAL(10,2),
+        tax_amount DECIMAL(10,2) DEFAULT 0,
+        total_amount DECIMAL(10,2),
+        status ENUM('draft', 'sent', 'paid', 'overdue') DEFAULT 'draft',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+# Per-user and per-hotel lookups, the booking overlap predicate, the
+# created_at keyset pages behind the admin lists and the session sweeper
+HOT_PATH_INDEXES = [
+    Index('bookings', 'idx_bookings_stay',
+          ['hotel_id', 'room_type_id', 'status', 'check_in_date', 'check_out_date']),
+    Index('bookings', 'idx_bookings_user_created', ['user_id', 'created_at']),
+    Index('bookings', 'idx_bookings_created', ['created_at']),
+    Index('reviews', 'idx_reviews_hotel_created', ['hotel_id', 'created_at']),
+    Index('reviews', 'idx_reviews_user_created', ['user_id', 'created_at']),
+    Index('reviews', 'idx_reviews_created', ['created_at']),
+    Index('payments', 'idx_payments_user_created', ['user_id', 'created_at']),
+    Index('payments', 'idx_payments_created', ['created_at']),
+    Index('invoices', 'idx_invoices_user_created', ['user_id', 'created_at']),
+    Index('invoices', 'idx_invoices_created', ['created_at']),
+    Index('users', 'idx_users_created', ['created_at']),
+    Index('user_sessions', 'idx_user_sessions_expires', ['expires_at']),
+]
+
+# payment-service/outbox.py writes outbox_events in the payment transaction;
+# booking-service/payment_events.py records each consumed event once
+PAYMENT_EVENTS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS outbox_events (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        event_type VARCHAR(64) NOT NULL,
+        event_key VARCHAR(255) NOT NULL,
+        payload TEXT NOT NULL,
+        attempts INT NOT NULL DEFAULT 0,
+        last_error VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        published_at TIMESTAMP NULL,
+        UNIQUE KEY unique_outbox_event (event_type, event_key),
+        KEY idx_outbox_unpublished (published_at, id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS processed_events (
+        event_type VARCHAR(64) NOT NULL,
+        event_key VARCHAR(255) NOT NULL,
+        processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (event_type, event_key)
+    )
+    """,
+]
+
+# common/idempotency.py: one row per Idempotency-Key until it expires
+IDEMPOTENCY_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        scope VARCHAR(64) NOT NULL,
+        idempotency_key VARCHAR(255) NOT NULL,
+        request_hash CHAR(64) NOT NULL,
+        status_code SMALLINT NULL,
+        response MEDIUMTEXT NULL,
+        locked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (scope, idempotency_key),
+        KEY idx_idempotency_expires (expires_at)
+    )
+    """,
+]
+
+# Daily rollups behind the /analytics endpoints (common/rollups.py)
+ANALYTICS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS daily_booking_stats (
+        day DATE NOT NULL,
+        hotel_id INT NOT NULL,
+        bookings INT NOT NULL DEFAULT 0,
+        nights INT NOT NULL DEFAULT 0,
+        booked_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+        lead_days_sum BIGINT NOT NULL DEFAULT 0,
+        lead_0_1 INT NOT NULL DEFAULT 0,
+        lead_2_7 INT NOT NULL DEFAULT 0,
+        lead_8_30 INT NOT NULL DEFAULT 0,
+        lead_31_90 INT NOT NULL DEFAULT 0,
+        lead_91_plus INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, hotel_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS daily_hotel_revenue (
+        day DATE NOT NULL,
+        hotel_id INT NOT NULL,
+        payments INT NOT NULL DEFAULT 0,
+        revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+        refunds INT NOT NULL DEFAULT 0,
+        refunded DECIMAL(14,2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, hotel_id)
+    )
+    """,
+]
+
+# Logout and forced expiry for signed session tokens (common/session_tokens.py)
+SESSION_REVOCATION_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS revoked_sessions (
+        jti CHAR(32) PRIMARY KEY,
+        user_id INT NOT NULL,
+        revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        KEY idx_revoked_sessions_expires (expires_at)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS session_cutoffs (
+        user_id INT PRIMARY KEY,
+        not_before TIMESTAMP NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        KEY idx_session_cutoffs_expires (expires_at)
+    )
+    """,
+]
+
+# Version counters behind the ETags of the list endpoints (common/conditional.py)
+TABLE_VERSIONS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name VARCHAR(64) PRIMARY KEY,
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
+    )
+    """,
+    """
+    INSERT IGNORE INTO table_versions (table_name, version)
+    VALUES ('hotels', 1), ('room_types', 1), ('reviews', 1), ('users', 1),
+           ('bookings', 1), ('payments', 1), ('invoices', 1)
+    """,
+]
+
+# Archiving closed stays (common/archive.py): finding them by check-out
+# and moving their payments and invoices by booking, then the archive
+# tables, which copy these indexes
+ARCHIVE_INDEXES = [
+    Index('bookings', 'idx_bookings_check_out', ['check_out_date']),
+    Index('payments', 'idx_payments_booking', ['booking_id']),
+    Index('invoices', 'idx_invoices_booking', ['booking_id']),
+]
+
+MIGRATIONS = [
+    Migration(1, 'base schema', BASE_SCHEMA),
+    Migration(2, 'hot path indexes', [add_index(index) for index in HOT_PATH_INDEXES]),
+    Migration(3, 'sample data', [seed.seed_admin, seed.seed_catalog, seed.seed_reviews]),
+    Migration(4, 'backfill counter tables', [seed.backfill_rating_stats, seed.backfill_room_availability]),
+    Migration(5, 'payment event outbox', PAYMENT_EVENTS_SCHEMA),
+    Migration(6, 'idempotency keys', IDEMPOTENCY_SCHEMA),
+    Migration(7, 'analytics rollups', ANALYTICS_SCHEMA + [
+        add_index(Index('room_availability', 'idx_availability_date', ['available_date'])),
+        rollups.backfill,
+    ]),
+    Migration(8, 'session revocations', SESSION_REVOCATION_SCHEMA),
+    Migration(9, 'table versions', TABLE_VERSIONS_SCHEMA),
+    Migration(10, 'booking archive', [add_index(index) for index in ARCHIVE_INDEXES]
+              + [archive.create_archive_tables]),
+]
+
+# Services report not ready until the database is at least this version
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def connect(wait=0):
+    """Connect directly (no pool), retrying for up to `wait` seconds while
+    the database starts."""
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return mysql.connector.connect(**DB_CONFIG)
+        except mysql.connector.Error as e:
+            if time.monotonic() >= deadline:
+                raise
+            print(f"Waiting for database: {e}")
+            time.sleep(2)
+
+
+def ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    ensure_version_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def pending(cursor, target=None):
+    applied = applied_versions(cursor)
+    return [m for m in MIGRATIONS
+            if m.version not in applied and (target is None or m.version <= target)]
+
+
+def run_step(cursor, step):
+    if callable(step):
+        step(cursor)
+    else:
+        cursor.execute(step)
+
+
+def migrate(conn, target=None, log=print):
+    """Apply pending migrations up to `target`; returns the versions applied."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError(f"Could not acquire migration lock within {LOCK_TIMEOUT}s")
+        try:
+            # Re-read under the lock; another runner may have just finished
+            todo = pending(cursor, target)
+            for migration in todo:
+                started = time.monotonic()
+                log(f"Applying migration {migration.version}: {migration.name}")
+                for step in migration.steps:
+                    run_step(cursor, step)
+                cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                               (migration.version, migration.name))
+                conn.commit()
+                log(f"Applied migration {migration.version} in {time.monotonic() - started:.1f}s")
+            return [m.version for m in todo]
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def status(conn):
+    cursor = conn.cursor()
+    try:
+        applied = applied_versions(cursor)
+        return [(m.version, m.name, m.version in applied) for m in MIGRATIONS]
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply hotel_booking schema migrations")
+    parser.add_argument('--target', type=int, help="highest version to apply")
+    parser.add_argument('--status', action='store_true', help="list migrations and exit")
+    parser.add_argument('--wait', type=int, default=60,
+                        help="seconds to keep retrying while the database starts (default 60)")
+    args = parser.parse_args(argv)
+
+    conn = connect(args.wait)
+    try:
+        if args.status:
+            for version, name, applied in status(conn):
+                print(f"{version:4d}  {'applied' if applied else 'pending':8s} {name}")
+            return 0
+        applied = migrate(conn, args.target)
+        if not applied:
+            print("Schema is up to date")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Keyset pagination and streaming JSON for list endpoints.
+
+List endpoints are ordered newest first on (created_at, id). With
+``?limit=N`` a page is returned as ``{"items": [...], "next_cursor": ...}``;
+passing ``next_cursor`` back as ``?cursor=`` continues after the last row
+without an OFFSET scan. Without ``limit`` the full list is streamed as a
+plain JSON array, fetching rows in batches so worker memory stays flat.
+
+Rows are fetched as tuples and encoded by common.fast_json.RowEncoder.
+The JSON has the same structure and values as jsonify() of dict rows,
+though not always the same bytes (see common/fast_json.py).
+"""
+import base64
+from datetime import datetime
+
+from flask import jsonify, request
+
+from common.fast_json import RowEncoder
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_sql(sql, key_prefix, has_where, after):
+    created_at, row_id = f"{key_prefix}created_at", f"{key_prefix}id"
+    if after is not None:
+        sql += " AND" if has_where else " WHERE"
+        sql += f" ({created_at} < %s OR ({created_at} = %s AND {row_id} < %s))"
+    return sql + f" ORDER BY {created_at} DESC, {row_id} DESC"
+
+
+def keyset_response(app, get_connection, sql, params=(), key_prefix='', has_where=False):
+    """Serve ``sql`` (a SELECT without ORDER BY) as a page or a stream.
+
+    ``key_prefix`` is the table alias of the listed table, e.g. ``'b.'``.
+    """
+    limit = request.args.get('limit', type=int)
+    cursor_arg = request.args.get('cursor')
+    try:
+        after = decode_cursor(cursor_arg) if cursor_arg else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query_params = tuple(params)
+    if after is not None:
+        query_params += (after[0], after[0], after[1])
+
+    if limit is None and after is None:
+        return stream_json_array(app, get_connection, keyset_sql(sql, key_prefix, has_where, None),
+                                 query_params)
+
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(keyset_sql(sql, key_prefix, has_where, after) + " LIMIT %s",
+                   query_params + (limit + 1,))
+    rows = cursor.fetchall()
+    encoder = RowEncoder(cursor.description)
+    cursor.close()
+    conn.close()
+    return page_response(app, encoder, rows, limit)
+
+
+def page_response(app, encoder, rows, limit):
+    """``{"items": ..., "next_cursor": ...}`` for up to limit + 1 tuple rows."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[encoder.index('created_at')], last[encoder.index('id')])
+    # Keys in jsonify's (sorted) order
+    body = b'{"items":' + encoder.encode(rows) + b',"next_cursor":' + \
+        (f'"{next_cursor}"' if next_cursor else 'null').encode() + b'}\n'
+    return app.response_class(body, mimetype='application/json')
+
+
+def stream_json_array(app, get_connection, sql, params=()):
+    # The connection is opened before the response starts so that
+    # connection errors still surface as a normal 500 from the handler
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    encoder = RowEncoder(cursor.description)
+
+    def generate():
+        try:
+            yield b'['
+            first = True
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                # Each batch encodes as "[...]"; strip the brackets to splice it in
+                chunk = encoder.encode(rows)[1:-1]
+                yield chunk if first else b',' + chunk
+                first = False
+            yield b']'
+        except Exception as e:
+            # Headers are already sent; cut the body short so the client
+            # sees invalid JSON rather than a silently truncated list
+            print(f"Error streaming response: {e}")
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+            conn.close()
+
+    return app.response_class(generate(), mimetype='application/json')
@@ -0,0 +1,235 @@
+"""Opt-in slow-query profiling for the pooled cursor layer.
+
+With QUERY_PROFILE=1 every statement run through a pooled cursor is
+grouped by a normalized fingerprint (whitespace squeezed, literals and
+IN/VALUES lists folded). Statements slower than QUERY_SLOW_MS are
+logged, and the first slow execution of each fingerprint is EXPLAINed in
+a background thread on a dedicated connection, so the request that hit
+it is not delayed. GET /debug/queries on each service lists the worst
+fingerprints of the worker that answers; DELETE resets them.
+
+The report shows the service's SQL, so it is not public: with
+QUERY_PROFILE_TOKEN set it requires ``Authorization: Bearer <token>``,
+otherwise it only answers requests from the host itself.
+
+Only the statement text is kept; parameter values are used for the
+EXPLAIN and then dropped, since some of them are credentials.
+"""
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+from common import metrics
+
+QUERY_PROFILE = os.getenv('QUERY_PROFILE', '0') == '1'
+QUERY_SLOW_MS = float(os.getenv('QUERY_SLOW_MS', 100))
+QUERY_PROFILE_SIZE = int(os.getenv('QUERY_PROFILE_SIZE', 500))
+# Re-EXPLAIN a fingerprint that is still slow after this many seconds
+QUERY_EXPLAIN_REFRESH = int(os.getenv('QUERY_EXPLAIN_REFRESH', 600))
+QUERY_PROFILE_TOKEN = os.getenv('QUERY_PROFILE_TOKEN', '')
+
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+SORT_KEYS = ('total_ms', 'max_ms', 'avg_ms', 'slow_calls', 'calls')
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_fingerprints = {}
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(sql):
+    text = _fingerprints.get(sql)
+    if text is None:
+        text = metrics.normalize_sql(sql)
+        text = _STRING.sub('?', text)
+        text = _NUMBER.sub('?', text)
+        text = text.replace('%s', '?')
+        if len(_fingerprints) < 10000:
+            _fingerprints[sql] = text
+    return text
+
+
+class QueryProfile:
+    def __init__(self, slow_ms=QUERY_SLOW_MS, max_entries=QUERY_PROFILE_SIZE,
+                 explain_refresh=QUERY_EXPLAIN_REFRESH):
+        self.slow_ms = slow_ms
+        self.max_entries = max_entries
+        self.explain_refresh = explain_refresh
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._explain_queue = queue.Queue(maxsize=100)
+        self._explainer_pid = None
+        self.dropped = 0
+        self.started_at = time.time()
+
+    def record(self, sql, params, seconds, failed=False):
+        text = fingerprint(sql)
+        elapsed_ms = seconds * 1000
+        slow = elapsed_ms >= self.slow_ms
+        explain = False
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    self.dropped += 1
+                    return
+                entry = self._entries[text] = {
+                    'id': hashlib.md5(text.encode()).hexdigest()[:12],
+                    'fingerprint': text,
+                    'calls': 0,
+                    'errors': 0,
+                    'slow_calls': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'last_slow_at': None,
+                    'explain': None,
+                    'explained_at': None,
+                    'explain_pending': False,
+                }
+            entry['calls'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            if failed:
+                entry['errors'] += 1
+            if slow:
+                entry['slow_calls'] += 1
+                entry['last_slow_at'] = time.time()
+                stale = (entry['explained_at'] is None
+                         or time.time() - entry['explained_at'] > self.explain_refresh)
+                if stale and not entry['explain_pending'] and not failed and self._explainable(sql):
+                    entry['explain_pending'] = explain = True
+        if slow:
+            logger.warning("Slow query (%.1f ms) [%s]: %s", elapsed_ms, entry['id'], text)
+        if explain:
+            self._queue_explain(text, sql, params)
+
+    def _explainable(self, sql):
+        text = sql.decode() if isinstance(sql, bytes) else str(sql)
+        return text.lstrip().upper().startswith(EXPLAINABLE)
+
+    def _queue_explain(self, text, sql, params):
+        self._start_explainer()
+        try:
+            self._explain_queue.put_nowait((text, sql, params))
+        except queue.Full:
+            with self._lock:
+                self._entries[text]['explain_pending'] = False
+
+    def _start_explainer(self):
+        # One thread per worker process, started on first use
+        if self._explainer_pid == os.getpid():
+            return
+        with self._lock:
+            if self._explainer_pid == os.getpid():
+                return
+            self._explainer_pid = os.getpid()
+        threading.Thread(target=self._run_explainer, name='query-explainer', daemon=True).start()
+
+    def _run_explainer(self):
+        conn = None
+        while True:
+            text, sql, params = self._explain_queue.get()
+            try:
+                if conn is None or not conn.is_connected():
+                    conn = _connect()
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    cursor.execute(f"EXPLAIN {sql}", params)
+                    plan = cursor.fetchall()
+                finally:
+                    cursor.close()
+                    # EXPLAIN of UPDATE/DELETE changes nothing, but never
+                    # leave a transaction open on this connection
+                    conn.rollback()
+            except Exception as e:
+                logger.warning("Error explaining query: %s", e)
+                plan = [{"error": str(e)}]
+                conn = None
+            with self._lock:
+                entry = self._entries.get(text)
+                if entry is not None:
+                    entry['explain'] = plan
+                    entry['explained_at'] = time.time()
+                    entry['explain_pending'] = False
+
+    def report(self, sort='total_ms', limit=20, slow_only=True):
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()
+                       if entry['slow_calls'] or not slow_only]
+        for entry in entries:
+            entry['avg_ms'] = round(entry['total_ms'] / entry['calls'], 3)
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+            del entry['explain_pending']
+        entries.sort(key=lambda entry: entry[sort], reverse=True)
+        return {
+            "pid": os.getpid(),
+            "since": self.started_at,
+            "slow_ms": self.slow_ms,
+            "fingerprints": len(entries),
+            "dropped": self.dropped,
+            "queries": entries[:limit],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.dropped = 0
+            self.started_at = time.time()
+
+
+def _connect():
+    import mysql.connector
+    from common.db import DB_CONFIG
+    return mysql.connector.connect(**DB_CONFIG)
+
+
+profile = QueryProfile() if QUERY_PROFILE else None
+
+
+def record(sql, params, seconds, failed=False):
+    if profile is not None:
+        profile.record(sql, params, seconds, failed)
+
+
+def report_allowed(request):
+    if QUERY_PROFILE_TOKEN:
+        return hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {QUERY_PROFILE_TOKEN}")
+    # No token configured: only from inside the container or pod
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+def register_query_report(app):
+    """Serve GET/DELETE /debug/queries when profiling is enabled."""
+    if profile is None:
+        return app
+    from flask import jsonify, request
+
+    @app.route('/debug/queries', methods=['GET'])
+    def query_report():
+        if not report_allowed(request):
+            return jsonify({"error": "Forbidden"}), 403
+        try:
+            sort = request.args.get('sort', 'total_ms')
+            if sort not in SORT_KEYS:
+                return jsonify({"error": f"sort must be one of {', '.join(SORT_KEYS)}"}), 400
+            limit = min(max(int(request.args.get('limit', 20)), 1), QUERY_PROFILE_SIZE)
+            slow_only = request.args.get('all') != '1'
+            return jsonify(profile.report(sort, limit, slow_only))
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    @app.route('/debug/queries', methods=['DELETE'])
+    def reset_query_report():
+        if not report_allowed(request):
+            return jsonify({"error": "Forbidden"}), 403
+        profile.reset()
+        return jsonify({"message": "Query profile reset"})
+
+    return app
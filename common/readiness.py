@@ -0,0 +1,179 @@
+"""Liveness, readiness and load shedding for the database-backed services.
+
+Services no longer create or seed the schema at boot, and the connection
+pool only connects on first use, so a worker is up as soon as gunicorn
+has imported the app.
+
+GET /live answers as long as the worker can serve a request; it never
+touches MySQL, so a database outage does not get pods restarted.
+
+GET /ready tells Kubernetes when to send traffic: a connection must be
+borrowed from the pool within READY_TIMEOUT seconds, SELECT 1 must
+succeed, and the schema must be at the version this code expects
+(common/migrate.py LATEST_VERSION), i.e. the migrate Job has run. The
+result is cached per worker for READY_CACHE_SECONDS and only one thread
+runs the check at a time, so probes never pile onto the database. A slow
+SELECT 1 or a pool with waiters is reported as "degraded" (still 200),
+and so are configured read replicas that are all down or lagging
+(common/replicas.py), since reads then fall back to the primary.
+
+While the pool is saturated, other requests are turned away at once with
+503 and Retry-After instead of queueing for DB_POOL_TIMEOUT and failing
+with 500. Saturated means DB_SHED_WAITING threads are queued for a pooled
+connection, or one has been queued for DB_SHED_WAIT_SECONDS. A worker only
+has WEB_THREADS threads, so the waiting threshold defaults to all of them
+but the one handling the request being checked.
+"""
+import os
+import threading
+import time
+
+from common import metrics
+from common.db import pool_stats
+from common.migrate import LATEST_VERSION
+from common.replicas import REPLICA_MAX_LAG, replica_stats
+
+READY_CACHE_SECONDS = float(os.getenv('READY_CACHE_SECONDS', 1))
+READY_TIMEOUT = float(os.getenv('READY_TIMEOUT', 1))
+READY_SLOW_MS = float(os.getenv('READY_SLOW_MS', 200))
+WEB_THREADS = int(os.getenv('WEB_THREADS', 4))
+DB_SHED_WAITING = int(os.getenv('DB_SHED_WAITING', max(1, WEB_THREADS - 1)))
+DB_SHED_WAIT_SECONDS = float(os.getenv('DB_SHED_WAIT_SECONDS', 1))
+
+# Never shed or gate the probes and the operational endpoints
+UNSHED_PATHS = ('/health', '/live', '/ready', '/metrics', '/debug/')
+
+requests_shed = metrics.REGISTRY.counter(
+    'http_requests_shed_total', 'Requests rejected with 503 because the connection pool was saturated',
+    ['route'])
+ready_check_duration = metrics.REGISTRY.histogram(
+    'ready_check_duration_seconds', 'Time taken by the readiness database check')
+
+
+def schema_version(cursor):
+    cursor.execute("SELECT MAX(version) FROM schema_migrations")
+    row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
+class ReadinessCheck:
+    def __init__(self, get_connection, ttl=READY_CACHE_SECONDS, timeout=READY_TIMEOUT,
+                 slow_ms=READY_SLOW_MS):
+        self.get_connection = get_connection
+        self.ttl = ttl
+        self.timeout = timeout
+        self.slow_ms = slow_ms
+        self._schema_ok = False
+        self._result = None
+        self._lock = threading.Lock()
+
+    def _fresh(self, result):
+        return result is not None and time.monotonic() - result['_checked'] < self.ttl
+
+    def result(self):
+        """Return the cached result, re-checking at most once per ttl."""
+        result = self._result
+        if self._fresh(result):
+            return result
+        # Whoever holds the lock is already checking; everyone else gets
+        # the previous answer rather than opening another connection
+        if not self._lock.acquire(blocking=result is None):
+            return result
+        try:
+            if not self._fresh(self._result):
+                self._result = self.check()
+            return self._result
+        finally:
+            self._lock.release()
+
+    def check(self):
+        started = time.perf_counter()
+        status, reasons, latency_ms = 'ready', [], None
+        try:
+            latency_ms, reason = self._query()
+            if reason:
+                status = 'not ready'
+                reasons.append(reason)
+            elif latency_ms > self.slow_ms:
+                status = 'degraded'
+                reasons.append(f"SELECT 1 took {latency_ms:.0f} ms")
+        except Exception as e:
+            status = 'not ready'
+            reasons.append(str(e))
+        ready_check_duration.observe(time.perf_counter() - started)
+
+        pool = pool_stats()
+        if status == 'ready' and pool['waiting']:
+            status = 'degraded'
+            reasons.append(f"{pool['waiting']} threads waiting for a connection")
+        replicas = replica_stats()
+        if status == 'ready' and replicas and all(r['lag'] is None or r['lag'] > REPLICA_MAX_LAG
+                                                  for r in replicas):
+            # Reads still work, from the primary
+            status = 'degraded'
+            reasons.append("no read replica is usable")
+        return {
+            'status': status,
+            'reasons': reasons,
+            'db_latency_ms': None if latency_ms is None else round(latency_ms, 3),
+            'db_pool': pool,
+            'db_replicas': replicas,
+            '_checked': time.monotonic(),
+        }
+
+    def _query(self):
+        """Return (SELECT 1 latency in ms, reason the service is not ready or None)."""
+        conn = self.get_connection(timeout=self.timeout)
+        try:
+            cursor = conn.cursor()
+            try:
+                started = time.perf_counter()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                latency_ms = (time.perf_counter() - started) * 1000
+                if self._schema_ok:
+                    return latency_ms, None
+                try:
+                    version = schema_version(cursor)
+                except Exception:
+                    version = 0
+                if version < LATEST_VERSION:
+                    return latency_ms, f"schema at version {version}, need {LATEST_VERSION}"
+                # The schema never moves backwards, so this is checked only once
+                self._schema_ok = True
+                return latency_ms, None
+            finally:
+                cursor.close()
+        finally:
+            conn.close()
+
+
+def overloaded(pool=None):
+    pool = pool or pool_stats()
+    return pool['waiting'] >= DB_SHED_WAITING or pool['longest_wait'] >= DB_SHED_WAIT_SECONDS
+
+
+def register_readiness(app, get_connection):
+    """Serve GET /live and GET /ready, and shed load while the pool is saturated."""
+    from flask import jsonify, request
+
+    readiness_check = ReadinessCheck(get_connection)
+
+    @app.before_request
+    def _shed_load():
+        if request.path.startswith(UNSHED_PATHS) or not overloaded():
+            return None
+        requests_shed.inc(route=request.url_rule.rule if request.url_rule else 'unmatched')
+        return jsonify({"error": "Service is overloaded, retry shortly"}), 503, {'Retry-After': '1'}
+
+    @app.route('/live', methods=['GET'])
+    def liveness():
+        return jsonify({"status": "alive"})
+
+    @app.route('/ready', methods=['GET'])
+    def readiness():
+        result = readiness_check.result()
+        body = {key: value for key, value in result.items() if not key.startswith('_')}
+        return jsonify(body), 503 if result['status'] == 'not ready' else 200
+
+    return app
@@ -0,0 +1,239 @@
+"""Read/write splitting across MySQL read replicas.
+
+get_db_connection() always returns a primary connection. Read-only
+handlers call get_read_connection() instead, which hands out a connection
+to one of the DB_REPLICAS (comma-separated host[:port], same credentials
+as the primary) when one is fresh enough, and a primary connection
+otherwise. Without DB_REPLICAS every read goes to the primary as before.
+
+Each worker checks every replica's lag (SHOW REPLICA STATUS) every
+DB_REPLICA_CHECK_INTERVAL seconds. A replica whose lag is unknown, whose
+replication is stopped or who is more than DB_REPLICA_MAX_LAG seconds
+behind is skipped; among the rest the least lagged and least busy wins.
+A server that reports no replica status (a stand-in for local testing)
+counts as up to date.
+
+Read-your-writes: register_read_routing() stamps every successful write
+response with the time of the write, as the db_last_write cookie and the
+X-Last-Write header. A later read carrying either is only sent to a
+replica that had caught up to that time when it was last checked, so a
+client always sees its own booking, payment or review. Services calling
+each other can forward the header.
+"""
+import os
+import random
+import threading
+import time
+
+from common import metrics
+from common.db import DB_CONFIG, POOL_SIZE, ConnectionPool, get_db_connection
+
+DB_REPLICAS = [host.strip() for host in os.getenv('DB_REPLICAS', '').split(',') if host.strip()]
+REPLICA_POOL_SIZE = int(os.getenv('DB_REPLICA_POOL_SIZE', POOL_SIZE))
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 2))
+REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 1))
+# Borrowing from a busy replica gives up quickly and reads the primary
+REPLICA_ACQUIRE_TIMEOUT = float(os.getenv('DB_REPLICA_ACQUIRE_TIMEOUT', 0.1))
+STICKY_SECONDS = int(os.getenv('DB_STICKY_SECONDS', 60))
+
+LAST_WRITE_COOKIE = 'db_last_write'
+LAST_WRITE_HEADER = 'X-Last-Write'
+# Seconds_Behind_Source is whole seconds
+LAG_MARGIN = 1
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+db_reads = metrics.REGISTRY.counter(
+    'db_reads_total', 'Read connections by target and routing reason', ['target', 'reason'])
+db_replica_lag = metrics.REGISTRY.gauge(
+    'db_replica_lag_seconds', 'Replication lag at the last check, -1 when unusable', ['replica'])
+
+
+def parse_host(host):
+    name, _, port = host.partition(':')
+    return name, int(port) if port else DB_CONFIG['port']
+
+
+class Replica:
+    def __init__(self, host):
+        self.name = host
+        name, port = parse_host(host)
+        self.pool = ConnectionPool({**DB_CONFIG, 'host': name, 'port': port}, size=REPLICA_POOL_SIZE)
+        self.lag = None
+        self.checked_at = None
+
+    def check(self):
+        try:
+            conn = self.pool.acquire(REPLICA_CHECK_INTERVAL)
+            try:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("SHOW REPLICA STATUS")
+                status = cursor.fetchone()
+                cursor.close()
+            finally:
+                conn.close()
+            if status is None:
+                lag = 0
+            else:
+                # Renamed from Seconds_Behind_Master in MySQL 8.0.22; NULL
+                # while replication is stopped
+                lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        except Exception as e:
+            print(f"Error checking replica {self.name}: {e}")
+            lag = None
+        self.lag = lag
+        self.checked_at = time.time()
+        db_replica_lag.set(-1 if lag is None else lag, replica=self.name)
+
+    def usable(self, now):
+        return (self.lag is not None and self.lag <= REPLICA_MAX_LAG
+                and now - self.checked_at < 3 * REPLICA_CHECK_INTERVAL)
+
+    def caught_up_to(self, written_at):
+        return self.checked_at - self.lag - LAG_MARGIN >= written_at
+
+    def stats(self):
+        return {'replica': self.name, 'lag': self.lag, **self.pool.stats()}
+
+
+class ReplicaSet:
+    def __init__(self, hosts):
+        self.replicas = [Replica(host) for host in hosts]
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start_monitor(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+
+        def run():
+            while True:
+                for replica in self.replicas:
+                    replica.check()
+                time.sleep(REPLICA_CHECK_INTERVAL)
+
+        threading.Thread(target=run, name='replica-monitor', daemon=True).start()
+
+    def choose(self, written_at=None):
+        """Return (replica or None, reason)."""
+        now = time.time()
+        usable = [r for r in self.replicas if r.usable(now)]
+        if not usable:
+            return None, 'lagging'
+        if written_at is not None:
+            usable = [r for r in usable if r.caught_up_to(written_at)]
+            if not usable:
+                return None, 'recent_write'
+        # Random tie-break so equally fresh, equally idle replicas share the load
+        return min(usable, key=lambda r: (r.lag, r.pool.stats()['in_use'], random.random())), 'replica'
+
+    def stats(self):
+        return [replica.stats() for replica in self.replicas]
+
+
+_replicas = None
+_replicas_pid = None
+_replicas_lock = threading.Lock()
+
+
+def get_replicas():
+    # Per process like the primary pool; None when no replicas are configured
+    global _replicas, _replicas_pid
+    if not DB_REPLICAS:
+        return None
+    pid = os.getpid()
+    if _replicas is None or _replicas_pid != pid:
+        with _replicas_lock:
+            if _replicas is None or _replicas_pid != pid:
+                _replicas = ReplicaSet(DB_REPLICAS)
+                _replicas_pid = pid
+    _replicas.start_monitor()
+    return _replicas
+
+
+def _request():
+    """Flask's request and g, or (None, None) outside a request."""
+    try:
+        from flask import g, has_request_context, request
+    except ImportError:
+        return None, None
+    if not has_request_context():
+        return None, None
+    return request, g
+
+
+def request_last_write():
+    """Time of this client's last write, from the request, or None."""
+    request, _ = _request()
+    if request is None:
+        return None
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def get_read_connection(timeout=None, since=None):
+    """Connection for a read-only query.
+
+    since is a time.time() the data must be at least as new as, on top of
+    the requesting client's own last write.
+
+    Within one request every read goes to the server the first one used
+    (or to the primary), so reads never see the data move backwards, e.g.
+    a version checked before a query is never newer than its result.
+    """
+    replicas = get_replicas()
+    if replicas is None:
+        return get_db_connection(timeout)
+    written_at = max(filter(None, (since, request_last_write())), default=None)
+    _, g = _request()
+    pinned = g.get('db_read_source') if g is not None else None
+    if pinned is None:
+        replica, reason = replicas.choose(written_at)
+    elif pinned == 'primary':
+        replica, reason = None, 'pinned'
+    else:
+        replica = next(r for r in replicas.replicas if r.name == pinned)
+        reason = 'pinned'
+        if written_at is not None and not replica.caught_up_to(written_at):
+            replica, reason = None, 'recent_write'
+    if replica is not None:
+        try:
+            conn = replica.pool.acquire(REPLICA_ACQUIRE_TIMEOUT if timeout is None
+                                        else min(timeout, REPLICA_ACQUIRE_TIMEOUT))
+            db_reads.inc(target='replica', reason=reason)
+            if g is not None:
+                g.db_read_source = replica.name
+            return conn
+        except Exception:
+            reason = 'replica_unavailable'
+    db_reads.inc(target='primary', reason=reason)
+    conn = get_db_connection(timeout)
+    if g is not None:
+        # Anything read later in this request is at least this new
+        g.db_read_source = 'primary'
+    return conn
+
+
+def replica_stats():
+    replicas = get_replicas()
+    return replicas.stats() if replicas else []
+
+
+def register_read_routing(app):
+    """Stamp successful writes so the client's next reads see them."""
+    from flask import request
+
+    @app.after_request
+    def _stamp_write(response):
+        if request.method not in READ_METHODS and response.status_code < 400:
+            written_at = f"{time.time():.3f}"
+            response.headers[LAST_WRITE_HEADER] = written_at
+            response.set_cookie(LAST_WRITE_COOKIE, written_at, max_age=STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,156 @@
+"""Daily analytics rollups behind booking-service's /analytics endpoints.
+
+daily_booking_stats holds bookings created per (day, hotel): count,
+nights, booked amount and a lead-time histogram. create_booking()
+upserts it in the booking transaction.
+
+daily_hotel_revenue holds payments and refunds per (day, hotel). It is
+upserted when booking-service consumes the payment events, in the same
+transaction that records the event as processed, so a redelivered event
+is never counted twice.
+
+Occupancy needs no table of its own: room_availability already holds the
+rooms taken per night.
+
+backfill() rebuilds both tables from bookings and payments, archived
+ones included (common/archive.py), with one set-based GROUP BY per month
+of data, using the same aggregation as the incremental path.
+"""
+from datetime import date
+
+from common import archive
+
+# (column, min lead days, max lead days or None)
+LEAD_BUCKETS = [
+    ('lead_0_1', 0, 1),
+    ('lead_2_7', 2, 7),
+    ('lead_8_30', 8, 30),
+    ('lead_31_90', 31, 90),
+    ('lead_91_plus', 91, None),
+]
+LEAD_COLUMNS = ', '.join(column for column, _, _ in LEAD_BUCKETS)
+
+
+def _bucket_sum(low, high):
+    if high is None:
+        return f"SUM(days_ahead >= {low})"
+    return f"SUM(days_ahead BETWEEN {low} AND {high})"
+
+
+BOOKING_STATS_UPSERT = f"""
+    INSERT INTO daily_booking_stats (day, hotel_id, bookings, nights, booked_amount, lead_days_sum,
+                                     {LEAD_COLUMNS})
+    SELECT created_on, hotel, COUNT(*), SUM(stay_nights), SUM(amount), SUM(days_ahead),
+           {', '.join(_bucket_sum(low, high) for _, low, high in LEAD_BUCKETS)}
+    FROM ({{source}}) created
+    GROUP BY created_on, hotel
+    ON DUPLICATE KEY UPDATE
+        bookings = bookings + VALUES(bookings),
+        nights = nights + VALUES(nights),
+        booked_amount = booked_amount + VALUES(booked_amount),
+        lead_days_sum = lead_days_sum + VALUES(lead_days_sum),
+        {', '.join(f'{column} = {column} + VALUES({column})' for column, _, _ in LEAD_BUCKETS)}
+"""
+
+# Derived column names differ from the table's so the UPDATE clause is
+# unambiguous. A booking being created now counts its lead time from today
+NEW_BOOKING_SOURCE = """
+    SELECT CURDATE() as created_on, %s as hotel, DATEDIFF(%s, %s) as stay_nights, %s as amount,
+           GREATEST(DATEDIFF(%s, CURDATE()), 0) as days_ahead
+"""
+
+BOOKINGS_SOURCE = """
+    SELECT DATE(created_at) as created_on, hotel_id as hotel,
+           DATEDIFF(check_out_date, check_in_date) as stay_nights, total_amount as amount,
+           GREATEST(DATEDIFF(check_in_date, DATE(created_at)), 0) as days_ahead
+    FROM {bookings}
+    WHERE created_at >= %s AND created_at < %s
+"""
+
+REVENUE_UPDATE = """
+    ON DUPLICATE KEY UPDATE
+        payments = payments + VALUES(payments),
+        revenue = revenue + VALUES(revenue),
+        refunds = refunds + VALUES(refunds),
+        refunded = refunded + VALUES(refunded)
+"""
+
+# Statements are shared with the asyncio booking app (aio_app.py)
+RECORD_REVENUE_SQL = """
+    INSERT INTO daily_hotel_revenue (day, hotel_id, payments, revenue, refunds, refunded)
+    VALUES (COALESCE(%s, CURDATE()), %s, %s, %s, %s, %s)
+""" + REVENUE_UPDATE
+
+# The refund time is not recorded on payments, so a backfill counts a
+# refund on the day of the payment it reverses. Derived names differ from
+# the table's, as above
+PAYMENTS_BACKFILL_SQL = """
+    INSERT INTO daily_hotel_revenue (day, hotel_id, payments, revenue, refunds, refunded)
+    SELECT paid_on, hotel, COUNT(*), SUM(paid_amount), SUM(is_refund), SUM(IF(is_refund, paid_amount, 0))
+    FROM ({source}) paid
+    GROUP BY paid_on, hotel
+""" + REVENUE_UPDATE
+
+PAYMENTS_SOURCE = """
+    SELECT DATE(p.created_at) as paid_on, b.hotel_id as hotel, p.amount as paid_amount,
+           p.payment_status = 'refunded' as is_refund
+    FROM {payments} p
+    JOIN {bookings} b ON p.booking_id = b.id
+    WHERE p.payment_status IN ('completed', 'refunded')
+    AND p.created_at >= %s AND p.created_at < %s
+"""
+
+
+def record_booking_params(hotel_id, check_in, check_out, total_amount):
+    return (hotel_id, check_out, check_in, total_amount, check_in)
+
+
+def record_booking(cursor, hotel_id, check_in, check_out, total_amount):
+    """Count a new booking; call inside the transaction that inserts it."""
+    cursor.execute(BOOKING_STATS_UPSERT.format(source=NEW_BOOKING_SOURCE),
+                   record_booking_params(hotel_id, check_in, check_out, total_amount))
+
+
+def payment_params(day, hotel_id, amount):
+    return (day, hotel_id, 1, amount, 0, 0)
+
+
+def refund_params(day, hotel_id, amount):
+    return (day, hotel_id, 0, 0, 1, amount)
+
+
+def _sources(cursor, template, params=()):
+    """(sql, params) of `template` over the live tables and, once they exist, their archives."""
+    if archive.archive_tables_exist(cursor):
+        return archive.history(template, params)
+    # Migration 7 backfills before migration 10 creates the archive
+    return template.format(**archive.LIVE_TABLES), tuple(params)
+
+
+def _months(cursor, table):
+    sql, _ = _sources(cursor, f"SELECT MIN(created_at) as first, MAX(created_at) as last FROM {{{table}}}")
+    cursor.execute(f"SELECT MIN(first), MAX(last) FROM ({sql}) bounds")
+    first, last = cursor.fetchone()
+    if first is None:
+        return []
+    months = []
+    start = date(first.year, first.month, 1)
+    while start <= last.date():
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        months.append((start, end))
+        start = end
+    return months
+
+
+def backfill(cursor):
+    """Recompute both rollup tables from live and archived bookings and payments."""
+    cursor.execute("DELETE FROM daily_booking_stats")
+    cursor.execute("DELETE FROM daily_hotel_revenue")
+    # One month per statement keeps each one a bounded range scan on the
+    # created_at indexes
+    for start, end in _months(cursor, 'bookings'):
+        source, params = _sources(cursor, BOOKINGS_SOURCE, (start, end))
+        cursor.execute(BOOKING_STATS_UPSERT.format(source=source), params)
+    for start, end in _months(cursor, 'payments'):
+        source, params = _sources(cursor, PAYMENTS_SOURCE, (start, end))
+        cursor.execute(PAYMENTS_BACKFILL_SQL.format(source=source), params)
@@ -0,0 +1,109 @@
+"""Data steps run by the migration runner (common/migrate.py).
+
+The sample catalog, the admin account and the backfill of the counter
+tables used to run in each service's init_db() at every boot; they now run
+once, as migrations. Each step only writes when its target is empty, so
+existing databases are left alone.
+"""
+import hashlib
+
+# booking-service/availability.py ROOMS_PER_TYPE
+ROOMS_PER_TYPE = 10
+
+SAMPLE_HOTELS = [
+    ("Grand Palace Hotel", "New York", "Luxury hotel in Manhattan", "WiFi, Pool, Spa, Gym, Restaurant", 350.00, 100),
+    ("Beach Resort", "Miami", "Beachfront resort with ocean views", "Beach Access, Pool, Bar, WiFi", 250.00, 80),
+    ("Mountain Lodge", "Colorado", "Cozy lodge in the mountains", "Fireplace, WiFi, Restaurant, Hiking", 180.00, 60),
+    ("Business Hotel", "Chicago", "Modern hotel for business travelers", "WiFi, Conference Room, Gym", 220.00, 120),
+    ("Boutique Inn", "San Francisco", "Charming boutique hotel", "WiFi, Breakfast, Concierge", 290.00, 40)
+]
+
+SAMPLE_ROOM_TYPES = [
+    (1, "Deluxe Suite", 450.00, 2, "King bed, City view, Mini bar"),
+    (1, "Standard Room", 300.00, 2, "Queen bed, WiFi"),
+    (2, "Ocean View", 320.00, 2, "Ocean view, Balcony"),
+    (2, "Garden View", 200.00, 2, "Garden view, Patio"),
+    (3, "Mountain View", 220.00, 2, "Mountain view, Fireplace"),
+    (4, "Business Suite", 280.00, 2, "Desk, Meeting area"),
+    (5, "Boutique Room", 250.00, 2, "Unique decor, Premium amenities")
+]
+
+SAMPLE_REVIEWS = [
+    (1, 1, None, 5, "Excellent service and beautiful rooms!"),
+    (1, 2, None, 4, "Great location and nice beach access."),
+    (1, 3, None, 4, "Cozy mountain lodge with great hiking trails."),
+    (1, 4, None, 3, "Good for business trips, convenient location."),
+    (1, 5, None, 5, "Charming boutique hotel with amazing breakfast."),
+    (2, 1, None, 4, "Luxury hotel with outstanding amenities."),
+    (2, 2, None, 5, "Perfect beachfront location for vacation."),
+    (2, 3, None, 3, "Nice mountain views but rooms could be updated."),
+]
+
+
+def _empty(cursor, sql):
+    cursor.execute(sql)
+    return cursor.fetchone()[0] == 0
+
+
+def seed_admin(cursor):
+    if _empty(cursor, "SELECT COUNT(*) FROM users WHERE is_admin = TRUE"):
+        admin_password = hashlib.sha256("admin123".encode()).hexdigest()
+        cursor.execute("""
+            INSERT INTO users (username, email, password_hash, first_name, last_name, is_admin)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, ("admin", "admin@hotel.com", admin_password, "Admin", "User", True))
+
+
+def seed_catalog(cursor):
+    if _empty(cursor, "SELECT COUNT(*) FROM hotels"):
+        cursor.executemany("""
+            INSERT INTO hotels (name, location, description, amenities, price_per_night, total_rooms)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, SAMPLE_HOTELS)
+        cursor.executemany("""
+            INSERT INTO room_types (hotel_id, type_name, price, capacity, amenities)
+            VALUES (%s, %s, %s, %s, %s)
+        """, SAMPLE_ROOM_TYPES)
+
+
+def seed_reviews(cursor):
+    if _empty(cursor, "SELECT COUNT(*) FROM reviews"):
+        cursor.executemany("""
+            INSERT INTO reviews (user_id, hotel_id, booking_id, rating, comment)
+            VALUES (%s, %s, %s, %s, %s)
+        """, SAMPLE_REVIEWS)
+
+
+def backfill_rating_stats(cursor):
+    # Same aggregation as review-service/rating_stats.py
+    if _empty(cursor, "SELECT COUNT(*) FROM hotel_rating_stats"):
+        cursor.execute("""
+            INSERT INTO hotel_rating_stats (hotel_id, rating_sum, rating_count,
+                                            rating_1, rating_2, rating_3, rating_4, rating_5)
+            SELECT hotel_id, SUM(rating), COUNT(*),
+                   SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+            FROM reviews
+            WHERE hotel_id IS NOT NULL AND rating IS NOT NULL
+            GROUP BY hotel_id
+        """)
+
+
+def backfill_room_availability(cursor):
+    # SQL form of booking-service/availability.py rebuild(): one row per
+    # night held by a booking that is not cancelled
+    if _empty(cursor, "SELECT COUNT(*) FROM room_availability"):
+        cursor.execute("""
+            INSERT INTO room_availability (hotel_id, room_type_id, available_date, available_rooms)
+            WITH RECURSIVE nights (hotel_id, room_type_id, night, check_out_date) AS (
+                SELECT hotel_id, room_type_id, check_in_date, check_out_date
+                FROM bookings
+                WHERE status != 'cancelled' AND check_out_date > check_in_date
+                UNION ALL
+                SELECT hotel_id, room_type_id, night + INTERVAL 1 DAY, check_out_date
+                FROM nights
+                WHERE night + INTERVAL 1 DAY < check_out_date
+            )
+            SELECT hotel_id, room_type_id, night, %s - COUNT(*)
+            FROM nights
+            GROUP BY hotel_id, room_type_id, night
+        """, (ROOMS_PER_TYPE,))
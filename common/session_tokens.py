@@ -0,0 +1,226 @@
+"""Stateless signed session tokens.
+
+With SESSION_TOKEN_MODE=signed, user-service issues tokens that carry
+their own claims instead of a random id backed by a user_sessions row:
+
+    base64url(claims JSON) "." base64url(HMAC-SHA256(SESSION_SECRET, claims))
+
+claims: sub (user id), adm (admin flag), iat and exp (epoch seconds) and
+jti (random token id). Login writes nothing and verify() is a CPU-only
+check, so any service that shares SESSION_SECRET can authenticate a
+request without calling user-service.
+
+Tokens cannot be deleted, so logout and forced expiry go through a small
+revocation list:
+- revoked_sessions: one row per logged-out jti until the token expires.
+- session_cutoffs: tokens a user was issued at or before not_before are
+  invalid (force-expire every session of that user).
+
+RevocationList keeps both in memory per worker and reloads them every
+SESSION_REVOCATION_REFRESH seconds, which bounds how long a revocation
+takes to reach other workers and replicas. Revocations made by the worker
+itself apply at once. The list also expires opaque sessions cached by
+user-service (user-service/sessions.py): a force-expiry through the
+cutoffs, a logout through a revoked_sessions row keyed by a digest of the
+token (opaque_claims()).
+
+SESSION_SECRET_PREVIOUS is still accepted when verifying, so the secret
+can be rotated without logging everyone out.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+
+SESSION_TOKEN_MODE = os.getenv('SESSION_TOKEN_MODE', 'opaque')
+SESSION_SECRET = os.getenv('SESSION_SECRET', '')
+SESSION_SECRET_PREVIOUS = os.getenv('SESSION_SECRET_PREVIOUS', '')
+SESSION_REVOCATION_REFRESH = int(os.getenv('SESSION_REVOCATION_REFRESH', 5))
+
+TOKEN_MODES = ('opaque', 'signed')
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _sign(secret, payload):
+    return hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+
+
+def looks_signed(token):
+    # Opaque tokens are uuid4 strings, which never contain a dot
+    return '.' in token
+
+
+def opaque_claims(token, user_id, lifetime):
+    """Revocation claims for an opaque token; only a digest of it is stored."""
+    return {"sub": user_id, "jti": opaque_jti(token), "exp": int(time.time()) + lifetime}
+
+
+def opaque_jti(token):
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def issue(user_id, is_admin, lifetime, secret=None):
+    """Return (token, claims) for a session lasting `lifetime` seconds."""
+    secret = secret or SESSION_SECRET
+    if not secret:
+        raise RuntimeError("SESSION_SECRET must be set to issue signed session tokens")
+    now = int(time.time())
+    claims = {"sub": user_id, "adm": bool(is_admin), "iat": now, "exp": now + lifetime,
+              "jti": uuid.uuid4().hex}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return f"{payload}.{_b64encode(_sign(secret, payload))}", claims
+
+
+def verify(token, secrets=None):
+    """Claims of a correctly signed, unexpired token, else None.
+
+    Does not consult the revocation list; see RevocationList.is_revoked().
+    """
+    secrets = [s for s in (secrets or (SESSION_SECRET, SESSION_SECRET_PREVIOUS)) if s]
+    payload, dot, signature = token.partition('.')
+    if not dot or not secrets:
+        return None
+    try:
+        signature = _b64decode(signature)
+    except (ValueError, binascii.Error):
+        return None
+    if not any(hmac.compare_digest(signature, _sign(secret, payload)) for secret in secrets):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if claims.get('exp', 0) <= time.time():
+        return None
+    return claims
+
+
+def purge_expired(cursor):
+    """Drop revocations for tokens that have expired anyway; returns rows removed."""
+    cursor.execute("DELETE FROM revoked_sessions WHERE expires_at < NOW()")
+    removed = cursor.rowcount
+    cursor.execute("DELETE FROM session_cutoffs WHERE expires_at < NOW()")
+    return removed + cursor.rowcount
+
+
+class RevocationList:
+    def __init__(self, get_connection, refresh_interval=SESSION_REVOCATION_REFRESH):
+        self.get_connection = get_connection
+        self.refresh_interval = refresh_interval
+        self._revoked = frozenset()
+        self._cutoffs = {}
+        # Revocations made here, kept until the token expires so a reload
+        # that read the tables before they committed does not drop them
+        self._local_revoked = {}
+        self._local_cutoffs = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self._refresher_pid = None
+
+    def refresh(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT jti FROM revoked_sessions WHERE expires_at > NOW()")
+            revoked = frozenset(jti for jti, in cursor.fetchall())
+            cursor.execute("""
+                SELECT user_id, UNIX_TIMESTAMP(not_before) FROM session_cutoffs
+                WHERE expires_at > NOW()
+            """)
+            cutoffs = {user_id: int(not_before) for user_id, not_before in cursor.fetchall()}
+        finally:
+            cursor.close()
+            conn.close()
+        now = time.time()
+        with self._lock:
+            self._local_revoked = {jti: exp for jti, exp in self._local_revoked.items() if exp > now}
+            self._local_cutoffs = {user_id: cutoff for user_id, cutoff in self._local_cutoffs.items()
+                                   if cutoff[1] > now}
+            self._revoked = revoked | frozenset(self._local_revoked)
+            for user_id, (not_before, _) in self._local_cutoffs.items():
+                cutoffs[user_id] = max(cutoffs.get(user_id, -1), not_before)
+            self._cutoffs = cutoffs
+            self._loaded_at = now
+
+    def _load_once(self):
+        if self._loaded_at is None:
+            # A worker must not accept tokens before it has seen the list once
+            self.refresh()
+
+    def is_revoked(self, claims):
+        if self.is_cut_off(claims['sub'], claims['iat']):
+            return True
+        return claims['jti'] in self._revoked
+
+    def is_cut_off(self, user_id, issued_at):
+        """Whether user_id's sessions from issued_at (epoch seconds) were force-expired."""
+        self._load_once()
+        return issued_at <= self._cutoffs.get(user_id, -1)
+
+    def is_jti_revoked(self, jti):
+        self._load_once()
+        return jti in self._revoked
+
+    def revoke(self, cursor, claims):
+        """Revoke one token; call inside the caller's transaction."""
+        cursor.execute("""
+            INSERT IGNORE INTO revoked_sessions (jti, user_id, expires_at)
+            VALUES (%s, %s, FROM_UNIXTIME(%s))
+        """, (claims['jti'], claims['sub'], claims['exp']))
+        with self._lock:
+            self._local_revoked[claims['jti']] = claims['exp']
+            self._revoked = self._revoked | {claims['jti']}
+
+    def revoke_user(self, cursor, user_id, lifetime):
+        """Invalidate every token issued to user_id so far.
+
+        lifetime is the longest a token lives; the cutoff is dropped after it.
+        """
+        now = int(time.time())
+        cursor.execute("""
+            INSERT INTO session_cutoffs (user_id, not_before, expires_at)
+            VALUES (%s, FROM_UNIXTIME(%s), FROM_UNIXTIME(%s))
+            ON DUPLICATE KEY UPDATE not_before = VALUES(not_before), expires_at = VALUES(expires_at)
+        """, (user_id, now, now + lifetime))
+        with self._lock:
+            self._local_cutoffs[user_id] = (now, now + lifetime)
+            self._cutoffs = {**self._cutoffs, user_id: now}
+
+    def stats(self):
+        return {
+            "revoked_tokens": len(self._revoked),
+            "revoked_users": len(self._cutoffs),
+            "age_seconds": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+        }
+
+    def start_refresher(self):
+        # Started lazily from a request so each forked worker gets its own thread
+        if self.refresh_interval <= 0 or self._refresher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._refresher_pid == os.getpid():
+                return
+            self._refresher_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.refresh_interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep the last list; revocations elsewhere arrive late
+                    print(f"Error refreshing session revocations: {e}")
+
+        threading.Thread(target=run, name='session-revocations', daemon=True).start()
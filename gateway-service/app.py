@@ -0,0 +1,162 @@
+from flask import Flask, jsonify, request
+from flask_cors import CORS
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from common.metrics import REGISTRY, instrument_app
+from common.compression import register_compression
+from common.fast_json import FastJSONProvider
+
+app = Flask(__name__)
+app.json = FastJSONProvider(app)
+CORS(app)
+instrument_app(app, 'gateway-service')
+register_compression(app)
+
+HOTEL_SERVICE_URL = os.getenv('HOTEL_SERVICE_URL', 'http://hotel-service:5001')
+BOOKING_SERVICE_URL = os.getenv('BOOKING_SERVICE_URL', 'http://booking-service:5002')
+REVIEW_SERVICE_URL = os.getenv('REVIEW_SERVICE_URL', 'http://review-service:5004')
+
+# Seconds each dependency may take before the page is returned without it
+HOTEL_TIMEOUT = float(os.getenv('HOTEL_TIMEOUT', 2.0))
+ROOMS_TIMEOUT = float(os.getenv('ROOMS_TIMEOUT', 2.0))
+REVIEWS_TIMEOUT = float(os.getenv('REVIEWS_TIMEOUT', 1.5))
+RATING_TIMEOUT = float(os.getenv('RATING_TIMEOUT', 1.0))
+AVAILABILITY_TIMEOUT = float(os.getenv('AVAILABILITY_TIMEOUT', 2.0))
+
+# Keep-alive connections per downstream host, shared by all request threads
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+FANOUT_THREADS = int(os.getenv('FANOUT_THREADS', 32))
+
+http = requests.Session()
+http.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE,
+                                  pool_block=False, max_retries=0))
+executor = ThreadPoolExecutor(max_workers=FANOUT_THREADS, thread_name_prefix='fanout')
+
+# Read-your-writes markers of common/replicas.py (not imported: it needs
+# MySQL). The client's are forwarded to every downstream call, and a newer
+# one a downstream write returns is relayed back to the client
+LAST_WRITE_COOKIE = 'db_last_write'
+LAST_WRITE_HEADER = 'X-Last-Write'
+STICKY_SECONDS = int(os.getenv('DB_STICKY_SECONDS', 60))
+
+dependency_duration = REGISTRY.histogram(
+    'gateway_dependency_duration_seconds', 'Downstream call latency by dependency and outcome',
+    ['dependency', 'outcome'])
+
+class DependencyError(Exception):
+    pass
+
+def last_write_forward():
+    """requests keyword arguments carrying the client's last write, if any."""
+    header = request.headers.get(LAST_WRITE_HEADER)
+    cookie = request.cookies.get(LAST_WRITE_COOKIE)
+    return {"headers": {LAST_WRITE_HEADER: header} if header else None,
+            "cookies": {LAST_WRITE_COOKIE: cookie} if cookie else None}
+
+def relay_last_write(response, results):
+    """Pass the newest last write a downstream call reported on to the client."""
+    stamps = []
+    for _, _, written_at in results.values():
+        try:
+            stamps.append(float(written_at))
+        except (TypeError, ValueError):
+            pass
+    if stamps:
+        written_at = f"{max(stamps):.3f}"
+        response.headers[LAST_WRITE_HEADER] = written_at
+        response.set_cookie(LAST_WRITE_COOKIE, written_at, max_age=STICKY_SECONDS,
+                            httponly=True, samesite='Lax')
+    return response
+
+def fetch(name, url, params, timeout, forward=None):
+    started = time.monotonic()
+    outcome = "error"
+    try:
+        response = http.get(url, params=params, timeout=timeout, **(forward or {}))
+        if response.status_code >= 500:
+            raise DependencyError(f"HTTP {response.status_code}")
+        outcome = "ok"
+        written_at = response.headers.get(LAST_WRITE_HEADER) or response.cookies.get(LAST_WRITE_COOKIE)
+        return response.status_code, response.json(), written_at
+    finally:
+        dependency_duration.observe(time.monotonic() - started, dependency=name, outcome=outcome)
+
+def fan_out(calls, forward=None):
+    """Run {name: (url, params, timeout)} in parallel.
+
+    forward holds extra requests arguments for every call (see
+    last_write_forward()). Returns ({name: (status, body, last write)},
+    {name: reason}) once every call has finished or run out of time.
+    """
+    started = time.monotonic()
+    futures = {name: executor.submit(fetch, name, url, params, timeout, forward)
+               for name, (url, params, timeout) in calls.items()}
+    results, errors = {}, {}
+    for name, future in futures.items():
+        remaining = calls[name][2] - (time.monotonic() - started)
+        try:
+            results[name] = future.result(timeout=max(remaining, 0))
+        except FutureTimeout:
+            future.cancel()
+            errors[name] = "timed out"
+        except requests.Timeout:
+            errors[name] = "timed out"
+        except requests.ConnectionError:
+            errors[name] = "connection failed"
+        except Exception as e:
+            errors[name] = str(e) or type(e).__name__
+    return results, errors
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({"status": "healthy", "service": "gateway-service"})
+
+@app.route('/pages/hotels/<int:hotel_id>', methods=['GET'])
+def hotel_page(hotel_id):
+    try:
+        check_in = request.args.get('check_in')
+        check_out = request.args.get('check_out')
+
+        calls = {
+            "hotel": (f"{HOTEL_SERVICE_URL}/hotels/{hotel_id}", None, HOTEL_TIMEOUT),
+            "rooms": (f"{HOTEL_SERVICE_URL}/hotels/{hotel_id}/rooms", None, ROOMS_TIMEOUT),
+            "reviews": (f"{REVIEW_SERVICE_URL}/reviews/hotel/{hotel_id}", None, REVIEWS_TIMEOUT),
+            "rating": (f"{REVIEW_SERVICE_URL}/reviews/hotel/{hotel_id}/average", None, RATING_TIMEOUT),
+        }
+        if check_in and check_out:
+            calls["availability"] = (f"{BOOKING_SERVICE_URL}/availability",
+                                     {"hotel_id": hotel_id, "check_in": check_in, "check_out": check_out},
+                                     AVAILABILITY_TIMEOUT)
+
+        results, errors = fan_out(calls, last_write_forward())
+
+        # The page cannot be rendered without the hotel itself
+        if "hotel" in errors:
+            return jsonify({"error": "Hotel service unavailable", "unavailable": errors}), 502
+        status, hotel, _ = results["hotel"]
+        if status == 404:
+            return jsonify({"error": "Hotel not found"}), 404
+
+        page = {"hotel": hotel}
+        for name in calls:
+            if name == "hotel":
+                continue
+            if name in results and results[name][0] == 200:
+                page[name] = results[name][1]
+            else:
+                page[name] = None
+                if name not in errors:
+                    errors[name] = f"HTTP {results[name][0]}"
+        page["unavailable"] = errors
+        page["partial"] = bool(errors)
+
+        return relay_last_write(jsonify(page), results)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+if __name__ == '__main__':
+    # Development server only; the container runs gunicorn (see common/gunicorn_conf.py)
+    app.run(host='0.0.0.0', port=5006, debug=os.getenv('FLASK_DEBUG') == '1')
@@ -1,181 +1,267 @@
-from flask import Flask, jsonify, request
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
-import mysql.connector
 import os
 import json
+import time
+from common.db import get_db_connection, pool_stats
+from common.metrics import instrument_app
+from common.query_profile import register_query_report
+from common.readiness import register_readiness
+from common.replicas import get_read_connection, register_read_routing
+from common.conditional import changes, conditional
+from common.compression import register_compression
+from common.fast_json import FastJSONProvider
+from common.cache import ResponseCache
+from common.bulk import BulkError, bulk_items, build_rows, insert_batches, bulk_result
+from search import SearchIndexHolder, parse_amenities
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
+instrument_app(app, 'hotel-service')
+register_query_report(app)
+register_readiness(app, get_db_connection)
+register_read_routing(app)
+register_compression(app)
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql-db'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'database': os.getenv('DB_NAME', 'hotel_booking'),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
+# Entries are keyed by the catalog's table versions (common/conditional.py),
+# so a write through any worker or replica makes every worker miss; the
+# TTL only ages out the superseded entries. The versions themselves are
+# kept per worker for CATALOG_VERSION_MAX_AGE seconds, so a hit needs no
+# database round trip; a write through another worker shows up after that
+CATALOG_VERSION_MAX_AGE = float(os.getenv('CATALOG_VERSION_MAX_AGE', 2))
+catalog_cache = ResponseCache('hotel-catalog',
+                              ttl=int(os.getenv('CATALOG_CACHE_TTL', 300)),
+                              max_entries=int(os.getenv('CATALOG_CACHE_SIZE', 2048)))
 
-def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+def cached_json(key, load):
+    # Without a version (@conditional could not read it) nothing would ever
+    # supersede the entry, so the body is served uncached
+    version = g.get('content_version')
+    key = f"{key}@{version}"
+    body = catalog_cache.get(key) if version else None
+    if body is None:
+        data = load()
+        if data is None:
+            return None
+        body = app.json.dumps(data)
+        if version:
+            catalog_cache.set(key, body)
+    return app.response_class(body, mimetype='application/json')
 
-def init_db():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create hotels table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS hotels (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                location VARCHAR(255) NOT NULL,
-                description TEXT,
-                amenities TEXT,
-                price_per_night DECIMAL(10,2),
-                total_rooms INT DEFAULT 50,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create room_types table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS room_types (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                hotel_id INT,
-                type_name VARCHAR(100) NOT NULL,
-                price DECIMAL(10,2),
-                capacity INT,
-                amenities TEXT,
-                FOREIGN KEY (hotel_id) REFERENCES hotels(id)
-            )
-        """)
-        
-        # Insert sample data
-        cursor.execute("SELECT COUNT(*) FROM hotels")
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            sample_hotels = [
-                ("Grand Palace Hotel", "New York", "Luxury hotel in Manhattan", "WiFi, Pool, Spa, Gym, Restaurant", 350.00, 100),
-                ("Beach Resort", "Miami", "Beachfront resort with ocean views", "Beach Access, Pool, Bar, WiFi", 250.00, 80),
-                ("Mountain Lodge", "Colorado", "Cozy lodge in the mountains", "Fireplace, WiFi, Restaurant, Hiking", 180.00, 60),
-                ("Business Hotel", "Chicago", "Modern hotel for business travelers", "WiFi, Conference Room, Gym", 220.00, 120),
-                ("Boutique Inn", "San Francisco", "Charming boutique hotel", "WiFi, Breakfast, Concierge", 290.00, 40)
-            ]
-            
-            for hotel in sample_hotels:
-                cursor.execute("""
-                    INSERT INTO hotels (name, location, description, amenities, price_per_night, total_rooms)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                """, hotel)
-            
-            # Insert room types
-            room_types = [
-                (1, "Deluxe Suite", 450.00, 2, "King bed, City view, Mini bar"),
-                (1, "Standard Room", 300.00, 2, "Queen bed, WiFi"),
-                (2, "Ocean View", 320.00, 2, "Ocean view, Balcony"),
-                (2, "Garden View", 200.00, 2, "Garden view, Patio"),
-                (3, "Mountain View", 220.00, 2, "Mountain view, Fireplace"),
-                (4, "Business Suite", 280.00, 2, "Desk, Meeting area"),
-                (5, "Boutique Room", 250.00, 2, "Unique decor, Premium amenities")
-            ]
-            
-            for room_type in room_types:
-                cursor.execute("""
-                    INSERT INTO room_types (hotel_id, type_name, price, capacity, amenities)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, room_type)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("Database initialized successfully")
-    except Exception as e:
-        print(f"Error initializing database: {e}")
+# Ratings come from review-service, so the index is also rebuilt on age
+search_index = SearchIndexHolder(get_db_connection,
+                                 max_age=int(os.getenv('SEARCH_INDEX_MAX_AGE', 60)))
+
+SEARCH_SORTS = ('price', '-price', 'rating')
+MAX_SEARCH_LIMIT = 100
+
+# Cache fills after a catalog write must not read a replica that has not
+# applied it yet, or the stale rows would be cached for the whole TTL
+catalog_written_at = None
+
+def invalidate_hotel():
+    global catalog_written_at
+    catalog_written_at = time.time()
+    search_index.invalidate()
+
+INSERT_HOTEL_SQL = """
+    INSERT INTO hotels (name, location, description, amenities, price_per_night, total_rooms)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+INSERT_ROOM_TYPE_SQL = """
+    INSERT INTO room_types (hotel_id, type_name, price, capacity, amenities)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+def hotel_row(data):
+    return (data['name'], data['location'], data['description'],
+            data['amenities'], float(data['price_per_night']), int(data.get('total_rooms', 50)))
+
+def room_type_row(hotel_id, data):
+    return (hotel_id, data['type_name'], float(data['price']),
+            int(data['capacity']), data.get('amenities', ''))
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "hotel-service"})
+    return jsonify({"status": "healthy", "service": "hotel-service", "db_pool": pool_stats(),
+                    "catalog_cache": catalog_cache.stats()})
 
 @app.route('/hotels', methods=['GET'])
+@conditional(get_read_connection, 'hotels', max_age=CATALOG_VERSION_MAX_AGE)
 def get_hotels():
-    try:
-        conn = get_db_connection()
+    def load():
+        conn = get_read_connection(since=catalog_written_at)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM hotels ORDER BY created_at DESC")
         hotels = cursor.fetchall()
         cursor.close()
         conn.close()
-        return jsonify(hotels)
+        return hotels
+    
+    try:
+        return cached_json('hotels', load)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/hotels/search', methods=['GET'])
+def search_hotels():
+    try:
+        args = request.args
+        sort = args.get('sort', 'price')
+        if sort not in SEARCH_SORTS:
+            return jsonify({"error": f"sort must be one of {', '.join(SEARCH_SORTS)}"}), 400
+        try:
+            min_price = args.get('min_price', type=float)
+            max_price = args.get('max_price', type=float)
+            guests = args.get('guests', type=int)
+            limit = min(max(int(args.get('limit', 20)), 1), MAX_SEARCH_LIMIT)
+            offset = max(int(args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({"error": "Invalid numeric parameter"}), 400
+        
+        result = search_index.get().search(location=args.get('location'),
+                                           min_price=min_price,
+                                           max_price=max_price,
+                                           amenities=parse_amenities(args.get('amenities')),
+                                           guests=guests,
+                                           sort=sort,
+                                           offset=offset,
+                                           limit=limit)
+        result.update({"offset": offset, "limit": limit})
+        return jsonify(result)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/hotels/<int:hotel_id>', methods=['GET'])
+@conditional(get_read_connection, 'hotels', max_age=CATALOG_VERSION_MAX_AGE)
 def get_hotel(hotel_id):
-    try:
-        conn = get_db_connection()
+    def load():
+        conn = get_read_connection(since=catalog_written_at)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM hotels WHERE id = %s", (hotel_id,))
         hotel = cursor.fetchone()
         cursor.close()
         conn.close()
-        
-        if hotel:
-            return jsonify(hotel)
+        return hotel
+    
+    try:
+        response = cached_json(f'hotel:{hotel_id}', load)
+        if response is not None:
+            return response
         else:
             return jsonify({"error": "Hotel not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/hotels/<int:hotel_id>/rooms', methods=['GET'])
+@conditional(get_read_connection, 'room_types', max_age=CATALOG_VERSION_MAX_AGE)
 def get_hotel_rooms(hotel_id):
-    try:
-        conn = get_db_connection()
+    def load():
+        conn = get_read_connection(since=catalog_written_at)
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT * FROM room_types WHERE hotel_id = %s", (hotel_id,))
         rooms = cursor.fetchall()
         cursor.close()
         conn.close()
-        return jsonify(rooms)
+        return rooms
+    
+    try:
+        return cached_json(f'hotel:{hotel_id}:rooms', load)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/hotels', methods=['POST'])
+@changes(get_db_connection, 'hotels')
 def add_hotel():
     try:
         data = request.get_json()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO hotels (name, location, description, amenities, price_per_night, total_rooms)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (data['name'], data['location'], data['description'], 
-              data['amenities'], data['price_per_night'], data.get('total_rooms', 50)))
+        cursor.execute(INSERT_HOTEL_SQL, (data['name'], data['location'], data['description'], 
+                                          data['amenities'], data['price_per_night'], data.get('total_rooms', 50)))
         
         conn.commit()
         hotel_id = cursor.lastrowid
         cursor.close()
         conn.close()
+        invalidate_hotel()
         
         return jsonify({"message": "Hotel added successfully", "hotel_id": hotel_id}), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/hotels/bulk', methods=['POST'])
+@changes(get_db_connection, 'hotels')
+def add_hotels_bulk():
+    try:
+        items = bulk_items(request.get_json())
+        rows, errors = build_rows(items, hotel_row)
+        if not rows:
+            return jsonify(bulk_result(0, errors)), 400
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        insert_batches(cursor, INSERT_HOTEL_SQL, rows)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        invalidate_hotel()
+        
+        return jsonify(bulk_result(len(rows), errors)), 201
+    except BulkError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/hotels/<int:hotel_id>/rooms/bulk', methods=['POST'])
+@changes(get_db_connection, 'room_types')
+def add_hotel_rooms_bulk(hotel_id):
+    try:
+        items = bulk_items(request.get_json())
+        rows, errors = build_rows(items, lambda item: room_type_row(hotel_id, item))
+        if not rows:
+            return jsonify(bulk_result(0, errors)), 400
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM hotels WHERE id = %s", (hotel_id,))
+        if not cursor.fetchone():
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Hotel not found"}), 404
+        
+        insert_batches(cursor, INSERT_ROOM_TYPE_SQL, rows)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        invalidate_hotel()
+        
+        return jsonify(bulk_result(len(rows), errors)), 201
+    except BulkError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/hotels/<int:hotel_id>', methods=['DELETE'])
+@changes(get_db_connection, 'hotels', 'room_types')
 def delete_hotel(hotel_id):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        # room_types has no ON DELETE CASCADE; its rows go in the same transaction
+        cursor.execute("DELETE FROM room_types WHERE hotel_id = %s", (hotel_id,))
         cursor.execute("DELETE FROM hotels WHERE id = %s", (hotel_id,))
         conn.commit()
         cursor.close()
         conn.close()
+        invalidate_hotel()
         return jsonify({"message": "Hotel deleted successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    init_db()
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    # Development server only; the container runs gunicorn (see common/gunicorn_conf.py)
+    app.run(host='0.0.0.0', port=5001, debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
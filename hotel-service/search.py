@@ -0,0 +1,209 @@
+"""In-process search index for GET /hotels/search.
+
+Hotels are numbered by ascending price and every filter value (location,
+amenity, minimum room capacity) maps to a bitmap over those positions,
+stored as a Python int. A query ANDs the bitmaps together, a price range
+is a contiguous bit mask, and facet counts are popcounts, so a search over
+100k hotels costs a few big-int operations instead of a table scan.
+"""
+import bisect
+import threading
+import time
+
+PRICE_BUCKETS = [(0, 100), (100, 200), (200, 300), (300, 500), (500, None)]
+
+# int.bit_count() is only available from Python 3.10
+if hasattr(int, 'bit_count'):
+    def popcount(bits):
+        return bits.bit_count()
+else:
+    def popcount(bits):
+        return bin(bits).count('1')
+
+
+def parse_amenities(text):
+    return {a.strip().lower() for a in (text or '').split(',') if a.strip()}
+
+
+def iter_positions(bits, size, reverse=False):
+    """Yield the set bit positions of a bitmap of `size` bits in order."""
+    data = bits.to_bytes((size + 7) // 8, 'little')
+    byte_order = range(len(data) - 1, -1, -1) if reverse else range(len(data))
+    bit_order = range(7, -1, -1) if reverse else range(8)
+    for i in byte_order:
+        byte = data[i]
+        if byte:
+            for b in bit_order:
+                if byte >> b & 1:
+                    yield i * 8 + b
+
+
+class HotelSearchIndex:
+    def __init__(self, hotels):
+        # hotels: dicts from the hotels table plus average_rating and max_capacity
+        self.hotels = sorted(hotels, key=lambda h: (float(h['price_per_night'] or 0), h['id']))
+        self.prices = [float(h['price_per_night'] or 0) for h in self.hotels]
+        self.all_bits = (1 << len(self.hotels)) - 1
+        self.by_location = {}
+        self.location_names = {}
+        self.by_amenity = {}
+        capacity_bits = {}
+        for pos, hotel in enumerate(self.hotels):
+            bit = 1 << pos
+            location = (hotel['location'] or '').strip()
+            key = location.lower()
+            self.by_location[key] = self.by_location.get(key, 0) | bit
+            self.location_names.setdefault(key, location)
+            for amenity in parse_amenities(hotel['amenities']):
+                self.by_amenity[amenity] = self.by_amenity.get(amenity, 0) | bit
+            capacity = hotel.get('max_capacity') or 0
+            capacity_bits[capacity] = capacity_bits.get(capacity, 0) | bit
+
+        # by_min_capacity[c]: hotels with a room type for at least c guests
+        self.capacities = sorted(capacity_bits)
+        self.by_min_capacity = []
+        running = 0
+        for capacity in reversed(self.capacities):
+            running |= capacity_bits[capacity]
+            self.by_min_capacity.append(running)
+        self.by_min_capacity.reverse()
+
+        # Positions ordered by rating, best first, for sort=rating
+        self.rating_order = sorted(range(len(self.hotels)),
+                                   key=lambda pos: (-self.hotels[pos]['average_rating'], self.prices[pos]))
+        self.built_at = time.monotonic()
+
+    def _price_mask(self, min_price=None, max_price=None):
+        lo = 0 if min_price is None else bisect.bisect_left(self.prices, min_price)
+        hi = len(self.prices) if max_price is None else bisect.bisect_right(self.prices, max_price)
+        if hi <= lo:
+            return 0
+        return ((1 << hi) - 1) ^ ((1 << lo) - 1)
+
+    def _capacity_mask(self, guests):
+        index = bisect.bisect_left(self.capacities, guests)
+        return self.by_min_capacity[index] if index < len(self.capacities) else 0
+
+    def search(self, location=None, min_price=None, max_price=None, amenities=(), guests=None,
+               sort='price', offset=0, limit=20):
+        bits = self.all_bits
+        if location:
+            bits &= self.by_location.get(location.strip().lower(), 0)
+        for amenity in amenities:
+            bits &= self.by_amenity.get(amenity, 0)
+        if guests:
+            bits &= self._capacity_mask(guests)
+        if min_price is not None or max_price is not None:
+            bits &= self._price_mask(min_price, max_price)
+
+        total = popcount(bits)
+        wanted = offset + limit
+        if sort == 'rating':
+            if total <= 2000:
+                positions = sorted(iter_positions(bits, len(self.hotels)),
+                                   key=lambda pos: (-self.hotels[pos]['average_rating'], self.prices[pos]))
+                positions = positions[offset:wanted]
+            else:
+                # Dense result: walk the rating order until the page is full
+                member = bits.to_bytes((len(self.hotels) + 7) // 8, 'little')
+                positions = []
+                for pos in self.rating_order:
+                    if member[pos >> 3] >> (pos & 7) & 1:
+                        positions.append(pos)
+                        if len(positions) == wanted:
+                            break
+                positions = positions[offset:]
+        else:
+            positions = []
+            for pos in iter_positions(bits, len(self.hotels), reverse=(sort == '-price')):
+                positions.append(pos)
+                if len(positions) == wanted:
+                    break
+            positions = positions[offset:]
+
+        return {
+            "total": total,
+            "items": [self.hotels[pos] for pos in positions],
+            "facets": self.facets(bits),
+        }
+
+    def facets(self, bits):
+        price = {}
+        for low, high in PRICE_BUCKETS:
+            label = f"{low}-{high}" if high is not None else f"{low}+"
+            # Buckets are [low, high)
+            mask = self._price_mask(low)
+            if high is not None:
+                mask &= ~self._price_mask(high)
+            price[label] = popcount(bits & mask)
+        return {
+            "location": {self.location_names[key]: count for key, loc_bits in self.by_location.items()
+                         if (count := popcount(bits & loc_bits))},
+            "amenities": {amenity: count for amenity, am_bits in sorted(self.by_amenity.items())
+                          if (count := popcount(bits & am_bits))},
+            "price": price,
+        }
+
+
+def load_hotels(cursor):
+    cursor.execute("""
+        SELECT h.*, COALESCE(rt.max_capacity, 0) as max_capacity
+        FROM hotels h
+        LEFT JOIN (
+            SELECT hotel_id, MAX(capacity) as max_capacity
+            FROM room_types
+            GROUP BY hotel_id
+        ) rt ON rt.hotel_id = h.id
+    """)
+    hotels = cursor.fetchall()
+    ratings = {}
+    try:
+        # Maintained by review-service; may not exist yet on a fresh database
+        cursor.execute("SELECT hotel_id, rating_sum, rating_count FROM hotel_rating_stats")
+        for row in cursor.fetchall():
+            if row['rating_count']:
+                ratings[row['hotel_id']] = round(float(row['rating_sum']) / row['rating_count'], 1)
+    except Exception as e:
+        print(f"Error loading hotel ratings for search: {e}")
+    for hotel in hotels:
+        hotel['average_rating'] = ratings.get(hotel['id'], 0)
+    return hotels
+
+
+class SearchIndexHolder:
+    """Keeps the current index and rebuilds it when stale or invalidated."""
+
+    def __init__(self, get_connection, max_age):
+        self.get_connection = get_connection
+        self.max_age = max_age
+        self._index = None
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        self._stale = True
+
+    def get(self):
+        index = self._index
+        if index is not None and not self._stale and time.monotonic() - index.built_at < self.max_age:
+            return index
+        # One thread rebuilds; the others keep using the previous index
+        if not self._lock.acquire(blocking=index is None):
+            return index
+        try:
+            if self._index is index:
+                self._stale = False
+                conn = self.get_connection()
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    hotels = load_hotels(cursor)
+                finally:
+                    cursor.close()
+                    conn.close()
+                self._index = HotelSearchIndex(hotels)
+            return self._index
+        except Exception:
+            self._stale = True
+            raise
+        finally:
+            self._lock.release()
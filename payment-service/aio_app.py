@@ -0,0 +1,231 @@
+"""asyncio variant of the payment service, a benchmark target.
+
+Serves the core payment routes of app.py with the same JSON shapes on Quart
+and aiomysql, so a worker keeps handling other requests while one waits on
+MySQL:
+
+    pip install -r requirements-async.txt
+    PYTHONPATH=.. hypercorn --bind 0.0.0.0:5005 --workers 2 aio_app:app
+
+It is not a deployment target: /live, /ready, /metrics, /debug/queries,
+conditional GETs, compression, Idempotency-Key and read replicas exist
+only in app.py, which the container runs.
+"""
+from datetime import datetime
+import uuid
+
+import aiomysql
+from quart import Quart, jsonify, request
+from quart_cors import cors
+
+from common.aio_db import close_pool, connection, init_pool, pool_stats
+from common.aio_pagination import keyset_response
+from common import archive, conditional
+from common.db import get_db_connection
+import outbox
+
+app = cors(Quart(__name__), allow_origin='*')
+
+@app.before_serving
+async def startup():
+    # Warm the pool; if MySQL is not up yet the first request retries
+    try:
+        await init_pool()
+    except Exception as e:
+        print(f"Error connecting to database: {e}")
+    # The dispatcher is a thread on the blocking pool, as in app.py
+    outbox.start_dispatcher(get_db_connection)
+
+@app.after_serving
+async def shutdown():
+    await close_pool()
+
+async def fetch_all(sql, params=()):
+    async with connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchall()
+
+async def bump_versions(*tables):
+    # Same counters as app.py's @changes, bumped once the write has committed
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany(conditional.BUMP_SQL, conditional.bump_params(tables))
+                await conn.commit()
+    except Exception as e:
+        print(f"Error bumping table versions: {e}")
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    return jsonify({"status": "healthy", "service": "payment-service", "db_pool": pool_stats()})
+
+@app.route('/payments/process', methods=['POST'])
+async def process_payment():
+    try:
+        data = await request.get_json()
+        
+        # Generate unique transaction ID
+        transaction_id = str(uuid.uuid4())
+        
+        # Simulate payment processing (fake gateway)
+        payment_status = 'completed'  # Always successful for demo
+        
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("""
+                    INSERT INTO payments (booking_id, user_id, amount, payment_method, payment_status, transaction_id)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (data['booking_id'], data['user_id'], data['amount'],
+                      data['payment_method'], payment_status, transaction_id))
+                
+                payment_id = cursor.lastrowid
+                
+                # booking-service confirms the booking when the event is delivered
+                await cursor.execute(outbox.ENQUEUE_SQL, outbox.enqueue_params(
+                    outbox.PAYMENT_COMPLETED, transaction_id, {
+                        "booking_id": data['booking_id'],
+                        "payment_id": payment_id,
+                        "amount": data['amount'],
+                        "paid_on": datetime.now().date().isoformat()
+                    }))
+                
+                await conn.commit()
+        outbox.wake()
+        await bump_versions('payments')
+        
+        return jsonify({
+            "message": "Payment processed successfully",
+            "payment_id": payment_id,
+            "transaction_id": transaction_id,
+            "status": payment_status
+        }), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/invoices/generate', methods=['POST'])
+async def generate_invoice():
+    try:
+        data = await request.get_json()
+        
+        # Generate unique invoice number
+        invoice_number = f"INV-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
+        
+        # Calculate tax (10% tax rate)
+        tax_amount = data['amount'] * 0.10
+        total_amount = data['amount'] + tax_amount
+        
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("""
+                    INSERT INTO invoices (booking_id, user_id, invoice_number, amount, tax_amount, total_amount, status)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, (data['booking_id'], data['user_id'], invoice_number,
+                      data['amount'], tax_amount, total_amount, 'sent'))
+                
+                invoice_id = cursor.lastrowid
+                await conn.commit()
+        await bump_versions('invoices')
+        
+        return jsonify({
+            "message": "Invoice generated successfully",
+            "invoice_id": invoice_id,
+            "invoice_number": invoice_number,
+            "amount": data['amount'],
+            "tax_amount": tax_amount,
+            "total_amount": total_amount
+        }), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/payments/user/<int:user_id>', methods=['GET'])
+async def get_user_payments(user_id):
+    try:
+        sql, params = archive.history("""
+            SELECT p.*, b.check_in_date, b.check_out_date, h.name as hotel_name
+            FROM {payments} p
+            JOIN {bookings} b ON p.booking_id = b.id
+            JOIN hotels h ON b.hotel_id = h.id
+            WHERE p.user_id = %s
+        """, (user_id,))
+        payments = await fetch_all(sql + " ORDER BY created_at DESC", params)
+        return jsonify(payments)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/invoices/user/<int:user_id>', methods=['GET'])
+async def get_user_invoices(user_id):
+    try:
+        sql, params = archive.history("""
+            SELECT i.*, b.check_in_date, b.check_out_date, h.name as hotel_name
+            FROM {invoices} i
+            JOIN {bookings} b ON i.booking_id = b.id
+            JOIN hotels h ON b.hotel_id = h.id
+            WHERE i.user_id = %s
+        """, (user_id,))
+        invoices = await fetch_all(sql + " ORDER BY created_at DESC", params)
+        return jsonify(invoices)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/payments/all', methods=['GET'])
+async def get_all_payments():
+    try:
+        return await keyset_response(app, """
+            SELECT p.*, b.check_in_date, b.check_out_date, h.name as hotel_name, u.username
+            FROM {payments} p
+            JOIN {bookings} b ON p.booking_id = b.id
+            JOIN hotels h ON b.hotel_id = h.id
+            JOIN users u ON p.user_id = u.id
+        """.format(**archive.requested_tables(request.args)), key_prefix='p.')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/invoices/all', methods=['GET'])
+async def get_all_invoices():
+    try:
+        return await keyset_response(app, """
+            SELECT i.*, b.check_in_date, b.check_out_date, h.name as hotel_name, u.username
+            FROM {invoices} i
+            JOIN {bookings} b ON i.booking_id = b.id
+            JOIN hotels h ON b.hotel_id = h.id
+            JOIN users u ON i.user_id = u.id
+        """.format(**archive.requested_tables(request.args)), key_prefix='i.')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/payments/<int:payment_id>/refund', methods=['POST'])
+async def refund_payment(payment_id):
+    try:
+        async with connection() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("""
+                    SELECT booking_id, amount, payment_status, transaction_id
+                    FROM payments WHERE id = %s
+                    FOR UPDATE
+                """, (payment_id,))
+                payment = await cursor.fetchone()
+                if payment is None:
+                    await cursor.execute(archive.archived_row_sql('payments'), (payment_id,))
+                    archived = await cursor.fetchone()
+                    await conn.rollback()
+                    if archived:
+                        return jsonify({"error": "Payment is archived and can no longer be refunded"}), 409
+                    return jsonify({"error": "Payment not found"}), 404
+                await cursor.execute("UPDATE payments SET payment_status = 'refunded' WHERE id = %s", (payment_id,))
+                
+                if payment[2] != 'refunded':
+                    await cursor.execute(outbox.ENQUEUE_SQL, outbox.enqueue_params(
+                        outbox.PAYMENT_REFUNDED, payment[3], {
+                            "booking_id": payment[0],
+                            "payment_id": payment_id,
+                            "amount": payment[1],
+                            "refunded_on": datetime.now().date().isoformat()
+                        }))
+                
+                await conn.commit()
+        outbox.wake()
+        await bump_versions('payments')
+        return jsonify({"message": "Payment refunded successfully"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,71 +1,42 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import mysql.connector
 import os
 from datetime import datetime
 import uuid
+from common.db import get_db_connection, pool_stats
+from common.metrics import instrument_app
+from common.query_profile import register_query_report
+from common.readiness import register_readiness
+from common.replicas import get_read_connection, register_read_routing
+from common.conditional import changes, conditional
+from common.compression import register_compression
+from common.fast_json import FastJSONProvider, rows_response
+from common.pagination import keyset_response
+from common import archive
+from common.idempotency import IdempotencyStore, idempotent
+import outbox
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
+instrument_app(app, 'payment-service')
+register_query_report(app)
+register_readiness(app, get_db_connection)
+register_read_routing(app)
+register_compression(app)
+idempotency = IdempotencyStore(get_db_connection)
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql-db'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'database': os.getenv('DB_NAME', 'hotel_booking'),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
-
-def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
-
-def init_db():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create payments table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS payments (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                booking_id INT,
-                user_id INT,
-                amount DECIMAL(10,2),
-                payment_method VARCHAR(50),
-                payment_status ENUM('pending', 'completed', 'failed', 'refunded') DEFAULT 'pending',
-                transaction_id VARCHAR(255) UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create invoices table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS invoices (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                booking_id INT,
-                user_id INT,
-                invoice_number VARCHAR(50) UNIQUE,
-                amount DECIMAL(10,2),
-                tax_amount DECIMAL(10,2) DEFAULT 0,
-                total_amount DECIMAL(10,2),
-                status ENUM('draft', 'sent', 'paid', 'overdue') DEFAULT 'draft',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("Payment database initialized successfully")
-    except Exception as e:
-        print(f"Error initializing payment database: {e}")
+@app.before_request
+def ensure_outbox_dispatcher():
+    outbox.start_dispatcher(get_db_connection)
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "payment-service"})
+    return jsonify({"status": "healthy", "service": "payment-service", "db_pool": pool_stats()})
 
 @app.route('/payments/process', methods=['POST'])
+@idempotent(idempotency, 'payments.process')
+@changes(get_db_connection, 'payments')
 def process_payment():
     try:
         data = request.get_json()
@@ -86,14 +57,18 @@ def process_payment():
         
         payment_id = cursor.lastrowid
         
-        # Update booking status to confirmed
-        cursor.execute("""
-            UPDATE bookings SET status = 'confirmed' WHERE id = %s
-        """, (data['booking_id'],))
+        # booking-service confirms the booking when the event is delivered
+        outbox.enqueue(cursor, outbox.PAYMENT_COMPLETED, transaction_id, {
+            "booking_id": data['booking_id'],
+            "payment_id": payment_id,
+            "amount": data['amount'],
+            "paid_on": datetime.now().date().isoformat()
+        })
         
         conn.commit()
         cursor.close()
         conn.close()
+        outbox.wake()
         
         return jsonify({
             "message": "Payment processed successfully",
@@ -105,6 +80,8 @@ def process_payment():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/invoices/generate', methods=['POST'])
+@idempotent(idempotency, 'invoices.generate')
+@changes(get_db_connection, 'invoices')
 def generate_invoice():
     try:
         data = request.get_json()
@@ -141,98 +118,117 @@ def generate_invoice():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/payments/user/<int:user_id>', methods=['GET'])
+@conditional(get_read_connection, 'payments', 'bookings', 'hotels')
 def get_user_payments(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        # Includes archived stays
+        sql, params = archive.history("""
             SELECT p.*, b.check_in_date, b.check_out_date, h.name as hotel_name
-            FROM payments p
-            JOIN bookings b ON p.booking_id = b.id
+            FROM {payments} p
+            JOIN {bookings} b ON p.booking_id = b.id
             JOIN hotels h ON b.hotel_id = h.id
             WHERE p.user_id = %s
-            ORDER BY p.created_at DESC
         """, (user_id,))
-        payments = cursor.fetchall()
+        cursor.execute(sql + " ORDER BY created_at DESC", params)
+        response = rows_response(cursor)
         cursor.close()
         conn.close()
-        return jsonify(payments)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/invoices/user/<int:user_id>', methods=['GET'])
+@conditional(get_read_connection, 'invoices', 'bookings', 'hotels')
 def get_user_invoices(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        # Includes archived stays
+        sql, params = archive.history("""
             SELECT i.*, b.check_in_date, b.check_out_date, h.name as hotel_name
-            FROM invoices i
-            JOIN bookings b ON i.booking_id = b.id
+            FROM {invoices} i
+            JOIN {bookings} b ON i.booking_id = b.id
             JOIN hotels h ON b.hotel_id = h.id
             WHERE i.user_id = %s
-            ORDER BY i.created_at DESC
         """, (user_id,))
-        invoices = cursor.fetchall()
+        cursor.execute(sql + " ORDER BY created_at DESC", params)
+        response = rows_response(cursor)
         cursor.close()
         conn.close()
-        return jsonify(invoices)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/payments/all', methods=['GET'])
+@conditional(get_read_connection, 'payments', 'bookings', 'hotels', 'users')
 def get_all_payments():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
+        return keyset_response(app, get_read_connection, """
             SELECT p.*, b.check_in_date, b.check_out_date, h.name as hotel_name, u.username
-            FROM payments p
-            JOIN bookings b ON p.booking_id = b.id
+            FROM {payments} p
+            JOIN {bookings} b ON p.booking_id = b.id
             JOIN hotels h ON b.hotel_id = h.id
             JOIN users u ON p.user_id = u.id
-            ORDER BY p.created_at DESC
-        """)
-        payments = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(payments)
+        """.format(**archive.requested_tables(request.args)), key_prefix='p.')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/invoices/all', methods=['GET'])
+@conditional(get_read_connection, 'invoices', 'bookings', 'hotels', 'users')
 def get_all_invoices():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
+        return keyset_response(app, get_read_connection, """
             SELECT i.*, b.check_in_date, b.check_out_date, h.name as hotel_name, u.username
-            FROM invoices i
-            JOIN bookings b ON i.booking_id = b.id
+            FROM {invoices} i
+            JOIN {bookings} b ON i.booking_id = b.id
             JOIN hotels h ON b.hotel_id = h.id
             JOIN users u ON i.user_id = u.id
-            ORDER BY i.created_at DESC
-        """)
-        invoices = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(invoices)
+        """.format(**archive.requested_tables(request.args)), key_prefix='i.')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/payments/<int:payment_id>/refund', methods=['POST'])
+@changes(get_db_connection, 'payments')
 def refund_payment(payment_id):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        cursor.execute("""
+            SELECT booking_id, amount, payment_status, transaction_id
+            FROM payments WHERE id = %s
+            FOR UPDATE
+        """, (payment_id,))
+        payment = cursor.fetchone()
+        if payment is None:
+            # Payments of closed stays move to payments_archive and can no longer change
+            archived = archive.is_archived(cursor, 'payments', payment_id)
+            conn.rollback()
+            cursor.close()
+            conn.close()
+            if archived:
+                return jsonify({"error": "Payment is archived and can no longer be refunded"}), 409
+            return jsonify({"error": "Payment not found"}), 404
         cursor.execute("UPDATE payments SET payment_status = 'refunded' WHERE id = %s", (payment_id,))
+        
+        # Only the first refund of a payment is reported to booking-service
+        if payment[2] != 'refunded':
+            outbox.enqueue(cursor, outbox.PAYMENT_REFUNDED, payment[3], {
+                "booking_id": payment[0],
+                "payment_id": payment_id,
+                "amount": payment[1],
+                "refunded_on": datetime.now().date().isoformat()
+            })
+        
         conn.commit()
         cursor.close()
         conn.close()
+        outbox.wake()
         return jsonify({"message": "Payment refunded successfully"})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    init_db()
-    app.run(host='0.0.0.0', port=5005, debug=True)
\ No newline at end of file
+    # Development server only; the container runs gunicorn (see common/gunicorn_conf.py)
+    app.run(host='0.0.0.0', port=5005, debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
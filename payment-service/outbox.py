@@ -0,0 +1,170 @@
+"""Transactional outbox for events the payment service publishes.
+
+process_payment() records a payment.completed event in outbox_events in
+the same transaction as the payment row, and never touches the bookings
+table. A dispatcher thread delivers unpublished events in batches to
+booking-service (POST /events/payments), which confirms the bookings;
+events are marked published only after it accepts the batch. Delivery is
+at least once, so the consumer deduplicates on the transaction id.
+"""
+import json
+import os
+import threading
+import time
+
+import requests
+
+from common.metrics import REGISTRY
+
+BOOKING_SERVICE_URL = os.getenv('BOOKING_SERVICE_URL', 'http://booking-service:5002')
+OUTBOX_BATCH = int(os.getenv('OUTBOX_BATCH', 100))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', 1.0))
+OUTBOX_PUBLISH_TIMEOUT = float(os.getenv('OUTBOX_PUBLISH_TIMEOUT', 5.0))
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', 7))
+MAX_BACKOFF = 30
+
+PAYMENT_COMPLETED = 'payment.completed'
+PAYMENT_REFUNDED = 'payment.refunded'
+
+events_published = REGISTRY.counter(
+    'outbox_events_published_total', 'Outbox events accepted by the consumer', ['event_type'])
+publish_errors = REGISTRY.counter(
+    'outbox_publish_errors_total', 'Outbox batches that could not be delivered')
+
+
+# Shared with the asyncio app (aio_app.py)
+ENQUEUE_SQL = """
+    INSERT INTO outbox_events (event_type, event_key, payload)
+    VALUES (%s, %s, %s)
+"""
+
+
+def enqueue_params(event_type, event_key, payload):
+    return (event_type, event_key, json.dumps(payload, default=str))
+
+
+def enqueue(cursor, event_type, event_key, payload):
+    """Record an event; call inside the transaction that produced it."""
+    cursor.execute(ENQUEUE_SQL, enqueue_params(event_type, event_key, payload))
+
+
+class HttpPublisher:
+    """Deliver a batch to booking-service; raises unless it is accepted."""
+
+    def __init__(self, url=f"{BOOKING_SERVICE_URL}/events/payments", timeout=OUTBOX_PUBLISH_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def __call__(self, events):
+        response = self.session.post(self.url, json={"events": events}, timeout=self.timeout)
+        response.raise_for_status()
+
+
+def dispatch_batch(get_connection, publish, batch=OUTBOX_BATCH):
+    """Publish the oldest unpublished events; returns how many were sent."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        # One dispatcher across all workers and replicas keeps events in order
+        cursor.execute("SELECT GET_LOCK('outbox_dispatch', 0)")
+        if not cursor.fetchone()[0]:
+            return 0
+        try:
+            cursor.execute("""
+                SELECT id, event_type, event_key, payload
+                FROM outbox_events
+                WHERE published_at IS NULL
+                ORDER BY id
+                LIMIT %s
+            """, (batch,))
+            rows = cursor.fetchall()
+            conn.commit()
+            if not rows:
+                return 0
+            events = [{"id": row[0], "type": row[1], "key": row[2], **json.loads(row[3])}
+                      for row in rows]
+            ids = [row[0] for row in rows]
+            placeholders = ', '.join(['%s'] * len(ids))
+            try:
+                publish(events)
+            except Exception as e:
+                publish_errors.inc()
+                cursor.execute(f"""
+                    UPDATE outbox_events SET attempts = attempts + 1, last_error = %s
+                    WHERE id IN ({placeholders})
+                """, [str(e)[:255]] + ids)
+                conn.commit()
+                raise
+            cursor.execute(f"""
+                UPDATE outbox_events SET published_at = NOW(), attempts = attempts + 1, last_error = NULL
+                WHERE id IN ({placeholders})
+            """, ids)
+            conn.commit()
+            for event in events:
+                events_published.inc(event_type=event['type'])
+            return len(rows)
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('outbox_dispatch')")
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def purge_published(get_connection, days=OUTBOX_RETENTION_DAYS, batch=1000):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            DELETE FROM outbox_events
+            WHERE published_at < NOW() - INTERVAL %s DAY
+            LIMIT %s
+        """, (days, batch))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
+
+
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def wake():
+    """Ask this worker's dispatcher to run now rather than at the next poll."""
+    _wakeup.set()
+
+
+def start_dispatcher(get_connection, publish=None, interval=OUTBOX_POLL_INTERVAL):
+    # Started lazily from a request so each forked worker gets its own thread
+    global _dispatcher_pid
+    if interval <= 0 or _dispatcher_pid == os.getpid():
+        return
+    with _dispatcher_lock:
+        if _dispatcher_pid == os.getpid():
+            return
+        _dispatcher_pid = os.getpid()
+    publish = publish or HttpPublisher()
+
+    def run():
+        backoff = interval
+        last_purge = 0
+        while True:
+            _wakeup.clear()
+            try:
+                sent = dispatch_batch(get_connection, publish)
+                backoff = interval
+                if sent == OUTBOX_BATCH:
+                    continue
+                if time.monotonic() - last_purge > 3600:
+                    purge_published(get_connection)
+                    last_purge = time.monotonic()
+            except Exception as e:
+                print(f"Error dispatching outbox events: {e}")
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            _wakeup.wait(backoff)
+
+    threading.Thread(target=run, name='outbox-dispatcher', daemon=True).start()
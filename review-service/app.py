@@ -1,89 +1,59 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import mysql.connector
 import os
 from datetime import datetime
+from common.db import get_db_connection, pool_stats
+from common.metrics import instrument_app
+from common.query_profile import register_query_report
+from common.readiness import register_readiness
+from common.replicas import get_read_connection, register_read_routing
+from common.conditional import changes, conditional
+from common.compression import register_compression
+from common.fast_json import FastJSONProvider, rows_response
+from common.pagination import keyset_response
+from common.bulk import BulkError, bulk_items, build_rows, insert_batches, bulk_result
+import rating_stats
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
+instrument_app(app, 'review-service')
+register_query_report(app)
+register_readiness(app, get_db_connection)
+register_read_routing(app)
+register_compression(app)
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql-db'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'database': os.getenv('DB_NAME', 'hotel_booking'),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
+MAX_BATCH_HOTELS = 500
 
-def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+INSERT_REVIEW_SQL = """
+    INSERT INTO reviews (user_id, hotel_id, booking_id, rating, comment)
+    VALUES (%s, %s, %s, %s, %s)
+"""
 
-def init_db():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create reviews table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS reviews (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                hotel_id INT,
-                booking_id INT,
-                rating INT CHECK (rating >= 1 AND rating <= 5),
-                comment TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Insert sample reviews
-        cursor.execute("SELECT COUNT(*) FROM reviews")
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
-            sample_reviews = [
-                (1, 1, None, 5, "Excellent service and beautiful rooms!"),
-                (1, 2, None, 4, "Great location and nice beach access."),
-                (1, 3, None, 4, "Cozy mountain lodge with great hiking trails."),
-                (1, 4, None, 3, "Good for business trips, convenient location."),
-                (1, 5, None, 5, "Charming boutique hotel with amazing breakfast."),
-                (2, 1, None, 4, "Luxury hotel with outstanding amenities."),
-                (2, 2, None, 5, "Perfect beachfront location for vacation."),
-                (2, 3, None, 3, "Nice mountain views but rooms could be updated."),
-            ]
-            
-            for review in sample_reviews:
-                cursor.execute("""
-                    INSERT INTO reviews (user_id, hotel_id, booking_id, rating, comment)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, review)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("Review database initialized successfully")
-    except Exception as e:
-        print(f"Error initializing review database: {e}")
+def review_row(data):
+    rating = int(data['rating'])
+    if rating not in rating_stats.RATINGS:
+        raise ValueError("rating must be between 1 and 5")
+    return (int(data['user_id']), int(data['hotel_id']), data.get('booking_id'),
+            rating, data['comment'])
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "review-service"})
+    return jsonify({"status": "healthy", "service": "review-service", "db_pool": pool_stats()})
 
 @app.route('/reviews', methods=['POST'])
+@changes(get_db_connection, 'reviews')
 def create_review():
     try:
         data = request.get_json()
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO reviews (user_id, hotel_id, booking_id, rating, comment)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (data['user_id'], data['hotel_id'], data.get('booking_id'),
-              data['rating'], data['comment']))
+        cursor.execute(INSERT_REVIEW_SQL, (data['user_id'], data['hotel_id'], data.get('booking_id'),
+                                           data['rating'], data['comment']))
         
         review_id = cursor.lastrowid
+        rating_stats.add_review(cursor, data['hotel_id'], data['rating'])
         conn.commit()
         cursor.close()
         conn.close()
@@ -92,11 +62,35 @@ def create_review():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/reviews/bulk', methods=['POST'])
+@changes(get_db_connection, 'reviews')
+def create_reviews_bulk():
+    try:
+        items = bulk_items(request.get_json())
+        rows, errors = build_rows(items, review_row)
+        if not rows:
+            return jsonify(bulk_result(0, errors)), 400
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        insert_batches(cursor, INSERT_REVIEW_SQL, rows)
+        rating_stats.add_reviews(cursor, [(row[1], row[3]) for row in rows])
+        conn.commit()
+        cursor.close()
+        conn.close()
+        
+        return jsonify(bulk_result(len(rows), errors)), 201
+    except BulkError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/reviews/hotel/<int:hotel_id>', methods=['GET'])
+@conditional(get_read_connection, 'reviews', 'users')
 def get_hotel_reviews(hotel_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        conn = get_read_connection()
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT r.*, u.username, u.first_name, u.last_name
             FROM reviews r
@@ -104,18 +98,19 @@ def get_hotel_reviews(hotel_id):
             WHERE r.hotel_id = %s
             ORDER BY r.created_at DESC
         """, (hotel_id,))
-        reviews = cursor.fetchall()
+        response = rows_response(cursor)
         cursor.close()
         conn.close()
-        return jsonify(reviews)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/reviews/user/<int:user_id>', methods=['GET'])
+@conditional(get_read_connection, 'reviews', 'hotels')
 def get_user_reviews(user_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        conn = get_read_connection()
+        cursor = conn.cursor()
         cursor.execute("""
             SELECT r.*, h.name as hotel_name, h.location
             FROM reviews r
@@ -123,63 +118,70 @@ def get_user_reviews(user_id):
             WHERE r.user_id = %s
             ORDER BY r.created_at DESC
         """, (user_id,))
-        reviews = cursor.fetchall()
+        response = rows_response(cursor)
         cursor.close()
         conn.close()
-        return jsonify(reviews)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/reviews/hotel/<int:hotel_id>/average', methods=['GET'])
 def get_hotel_average_rating(hotel_id):
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT AVG(rating) as average_rating, COUNT(*) as total_reviews
-            FROM reviews
-            WHERE hotel_id = %s
-        """, (hotel_id,))
-        result = cursor.fetchone()
+        stats = rating_stats.fetch(cursor, [hotel_id])
         cursor.close()
         conn.close()
         
-        average_rating = float(result[0]) if result[0] else 0
-        total_reviews = result[1]
+        return jsonify(rating_stats.summary(hotel_id, stats.get(hotel_id)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/reviews/hotels/average', methods=['GET'])
+def get_hotels_average_rating():
+    try:
+        # e.g. /reviews/hotels/average?ids=1,2,3
+        hotel_ids = [int(i) for i in request.args.get('ids', '').split(',') if i.strip()]
+        if len(hotel_ids) > MAX_BATCH_HOTELS:
+            return jsonify({"error": f"At most {MAX_BATCH_HOTELS} hotel ids per request"}), 400
+        
+        conn = get_read_connection()
+        cursor = conn.cursor()
+        stats = rating_stats.fetch(cursor, hotel_ids)
+        cursor.close()
+        conn.close()
         
-        return jsonify({
-            "hotel_id": hotel_id,
-            "average_rating": round(average_rating, 1),
-            "total_reviews": total_reviews
-        })
+        return jsonify([rating_stats.summary(hotel_id, stats.get(hotel_id)) for hotel_id in hotel_ids])
+    except ValueError:
+        return jsonify({"error": "ids must be a comma-separated list of hotel ids"}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/reviews/all', methods=['GET'])
+@conditional(get_read_connection, 'reviews', 'users', 'hotels')
 def get_all_reviews():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
+        return keyset_response(app, get_read_connection, """
             SELECT r.*, u.username, u.first_name, u.last_name, h.name as hotel_name, h.location
             FROM reviews r
             LEFT JOIN users u ON r.user_id = u.id
             JOIN hotels h ON r.hotel_id = h.id
-            ORDER BY r.created_at DESC
-        """)
-        reviews = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return jsonify(reviews)
+        """, key_prefix='r.')
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/reviews/<int:review_id>', methods=['DELETE'])
+@changes(get_db_connection, 'reviews')
 def delete_review(review_id):
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
+        cursor.execute("SELECT hotel_id, rating FROM reviews WHERE id = %s FOR UPDATE", (review_id,))
+        review = cursor.fetchone()
         cursor.execute("DELETE FROM reviews WHERE id = %s", (review_id,))
+        if review and cursor.rowcount:
+            rating_stats.remove_review(cursor, review[0], review[1])
         conn.commit()
         cursor.close()
         conn.close()
@@ -188,5 +190,5 @@ def delete_review(review_id):
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    init_db()
-    app.run(host='0.0.0.0', port=5004, debug=True)
\ No newline at end of file
+    # Development server only; the container runs gunicorn (see common/gunicorn_conf.py)
+    app.run(host='0.0.0.0', port=5004, debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
@@ -0,0 +1,66 @@
+"""Per-hotel rating aggregates kept in the hotel_rating_stats table.
+
+Every change to reviews adjusts the hotel's row in the same transaction,
+so averages are read with a primary key lookup instead of a scan over all
+of the hotel's reviews. The table is created and backfilled by the
+migrations in common/migrate.py.
+"""
+
+RATINGS = (1, 2, 3, 4, 5)
+HISTOGRAM_COLUMNS = ', '.join(f'rating_{r}' for r in RATINGS)
+
+
+def _adjust(cursor, hotel_id, rating, delta):
+    histogram = [delta if r == rating else 0 for r in RATINGS]
+    cursor.execute(f"""
+        INSERT INTO hotel_rating_stats (hotel_id, rating_sum, rating_count, {HISTOGRAM_COLUMNS})
+        VALUES (%s, %s, %s, {', '.join(['%s'] * len(RATINGS))})
+        ON DUPLICATE KEY UPDATE
+            rating_sum = rating_sum + VALUES(rating_sum),
+            rating_count = rating_count + VALUES(rating_count),
+            {', '.join(f'rating_{r} = rating_{r} + VALUES(rating_{r})' for r in RATINGS)}
+    """, [hotel_id, rating * delta, delta] + histogram)
+
+
+def add_review(cursor, hotel_id, rating):
+    _adjust(cursor, hotel_id, int(rating), 1)
+
+
+def remove_review(cursor, hotel_id, rating):
+    _adjust(cursor, hotel_id, int(rating), -1)
+
+
+def add_reviews(cursor, hotel_ratings):
+    # One upsert per (hotel, rating) pair rather than one per review
+    counts = {}
+    for hotel_id, rating in hotel_ratings:
+        key = (hotel_id, int(rating))
+        counts[key] = counts.get(key, 0) + 1
+    for (hotel_id, rating), count in sorted(counts.items()):
+        _adjust(cursor, hotel_id, rating, count)
+
+
+def summary(hotel_id, row):
+    """Shape a stats row like the /reviews/hotel/<id>/average response."""
+    if row is None:
+        rating_sum, rating_count, histogram = 0, 0, [0] * len(RATINGS)
+    else:
+        rating_sum, rating_count, histogram = row[0], row[1], list(row[2:])
+    average_rating = rating_sum / rating_count if rating_count else 0
+    return {
+        "hotel_id": hotel_id,
+        "average_rating": round(average_rating, 1),
+        "total_reviews": rating_count,
+        "rating_distribution": {str(r): count for r, count in zip(RATINGS, histogram)},
+    }
+
+
+def fetch(cursor, hotel_ids):
+    if not hotel_ids:
+        return {}
+    cursor.execute(f"""
+        SELECT hotel_id, rating_sum, rating_count, {HISTOGRAM_COLUMNS}
+        FROM hotel_rating_stats
+        WHERE hotel_id IN ({', '.join(['%s'] * len(hotel_ids))})
+    """, list(hotel_ids))
+    return {row[0]: row[1:] for row in cursor.fetchall()}
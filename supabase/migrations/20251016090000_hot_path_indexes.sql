@@ -0,0 +1,29 @@
+USE hotel_booking;
+
+-- Indexes for the per-user and per-hotel lookups, the booking overlap
+-- predicate, the created_at keyset pages and the expired-session sweeper.
+-- The services apply the same set idempotently via `python -m common.migrate`.
+
+ALTER TABLE bookings
+    ADD INDEX idx_bookings_stay (hotel_id, room_type_id, status, check_in_date, check_out_date),
+    ADD INDEX idx_bookings_user_created (user_id, created_at),
+    ADD INDEX idx_bookings_created (created_at);
+
+ALTER TABLE reviews
+    ADD INDEX idx_reviews_hotel_created (hotel_id, created_at),
+    ADD INDEX idx_reviews_user_created (user_id, created_at),
+    ADD INDEX idx_reviews_created (created_at);
+
+ALTER TABLE payments
+    ADD INDEX idx_payments_user_created (user_id, created_at),
+    ADD INDEX idx_payments_created (created_at);
+
+ALTER TABLE invoices
+    ADD INDEX idx_invoices_user_created (user_id, created_at),
+    ADD INDEX idx_invoices_created (created_at);
+
+ALTER TABLE users
+    ADD INDEX idx_users_created (created_at);
+
+ALTER TABLE user_sessions
+    ADD INDEX idx_user_sessions_expires (expires_at);
@@ -0,0 +1,25 @@
+USE hotel_booking;
+
+-- Payment events written by payment-service in the payment transaction
+-- and the consumed-event record booking-service uses to skip redeliveries.
+-- The services apply the same tables via `python -m common.migrate`.
+
+CREATE TABLE IF NOT EXISTS outbox_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    event_type VARCHAR(64) NOT NULL,
+    event_key VARCHAR(255) NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INT NOT NULL DEFAULT 0,
+    last_error VARCHAR(255),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    published_at TIMESTAMP NULL,
+    UNIQUE KEY unique_outbox_event (event_type, event_key),
+    KEY idx_outbox_unpublished (published_at, id)
+);
+
+CREATE TABLE IF NOT EXISTS processed_events (
+    event_type VARCHAR(64) NOT NULL,
+    event_key VARCHAR(255) NOT NULL,
+    processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (event_type, event_key)
+);
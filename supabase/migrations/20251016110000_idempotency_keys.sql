@@ -0,0 +1,17 @@
+USE hotel_booking;
+
+-- Stored responses for requests sent with an Idempotency-Key header
+-- (common/idempotency.py). The services apply the same table via
+-- `python -m common.migrate`.
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    scope VARCHAR(64) NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash CHAR(64) NOT NULL,
+    status_code SMALLINT NULL,
+    response MEDIUMTEXT NULL,
+    locked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (scope, idempotency_key),
+    KEY idx_idempotency_expires (expires_at)
+);
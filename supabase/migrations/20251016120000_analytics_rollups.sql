@@ -0,0 +1,29 @@
+USE hotel_booking;
+
+-- Daily rollups behind booking-service's /analytics endpoints. The
+-- services create and backfill them via `python -m common.migrate`.
+
+CREATE TABLE IF NOT EXISTS daily_booking_stats (
+    day DATE NOT NULL,
+    hotel_id INT NOT NULL,
+    bookings INT NOT NULL DEFAULT 0,
+    nights INT NOT NULL DEFAULT 0,
+    booked_amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    lead_days_sum BIGINT NOT NULL DEFAULT 0,
+    lead_0_1 INT NOT NULL DEFAULT 0,
+    lead_2_7 INT NOT NULL DEFAULT 0,
+    lead_8_30 INT NOT NULL DEFAULT 0,
+    lead_31_90 INT NOT NULL DEFAULT 0,
+    lead_91_plus INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, hotel_id)
+);
+
+CREATE TABLE IF NOT EXISTS daily_hotel_revenue (
+    day DATE NOT NULL,
+    hotel_id INT NOT NULL,
+    payments INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    refunds INT NOT NULL DEFAULT 0,
+    refunded DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, hotel_id)
+);
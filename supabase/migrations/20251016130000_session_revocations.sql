@@ -0,0 +1,20 @@
+USE hotel_booking;
+
+-- Logout and forced expiry for signed session tokens
+-- (common/session_tokens.py). The services apply the same tables via
+-- `python -m common.migrate`.
+
+CREATE TABLE IF NOT EXISTS revoked_sessions (
+    jti CHAR(32) PRIMARY KEY,
+    user_id INT NOT NULL,
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    KEY idx_revoked_sessions_expires (expires_at)
+);
+
+CREATE TABLE IF NOT EXISTS session_cutoffs (
+    user_id INT PRIMARY KEY,
+    not_before TIMESTAMP NOT NULL,
+    expires_at TIMESTAMP NOT NULL,
+    KEY idx_session_cutoffs_expires (expires_at)
+);
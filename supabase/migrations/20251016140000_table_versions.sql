@@ -0,0 +1,15 @@
+USE hotel_booking;
+
+-- Version counters behind the ETags of the list endpoints
+-- (common/conditional.py). The services apply the same table via
+-- `python -m common.migrate`.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)
+);
+
+INSERT IGNORE INTO table_versions (table_name, version)
+VALUES ('hotels', 1), ('room_types', 1), ('reviews', 1), ('users', 1),
+       ('bookings', 1), ('payments', 1), ('invoices', 1);
@@ -0,0 +1,36 @@
+USE hotel_booking;
+
+-- Archive for closed stays (common/archive.py). The archiver moves each
+-- closed booking, together with its payments and invoices, from the live
+-- tables into these compressed tables, which are partitioned by month. It
+-- also splits monthly partitions off p_future as it goes. The services
+-- apply the same schema via `python -m common.migrate`.
+
+ALTER TABLE bookings ADD INDEX idx_bookings_check_out (check_out_date);
+ALTER TABLE payments ADD INDEX idx_payments_booking (booking_id);
+ALTER TABLE invoices ADD INDEX idx_invoices_booking (booking_id);
+
+-- Same columns as the live tables. Every unique key of a partitioned
+-- table must contain the partitioning column.
+CREATE TABLE IF NOT EXISTS bookings_archive LIKE bookings;
+ALTER TABLE bookings_archive
+    MODIFY id INT NOT NULL,
+    DROP PRIMARY KEY, ADD PRIMARY KEY (id, check_out_date),
+    ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+PARTITION BY RANGE COLUMNS (check_out_date) (PARTITION p_future VALUES LESS THAN (MAXVALUE));
+
+CREATE TABLE IF NOT EXISTS payments_archive LIKE payments;
+ALTER TABLE payments_archive
+    MODIFY id INT NOT NULL,
+    DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at),
+    DROP INDEX transaction_id, ADD INDEX transaction_id (transaction_id),
+    ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (PARTITION p_future VALUES LESS THAN (MAXVALUE));
+
+CREATE TABLE IF NOT EXISTS invoices_archive LIKE invoices;
+ALTER TABLE invoices_archive
+    MODIFY id INT NOT NULL,
+    DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at),
+    DROP INDEX invoice_number, ADD INDEX invoice_number (invoice_number),
+    ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (PARTITION p_future VALUES LESS THAN (MAXVALUE));
@@ -0,0 +1,59 @@
+import sqlite3
+from datetime import date
+
+from common import archive
+
+SCHEMA = """
+    CREATE TABLE {bookings} (id INTEGER PRIMARY KEY, user_id INT, check_out_date DATE, status TEXT);
+    CREATE TABLE {payments} (id INTEGER PRIMARY KEY, booking_id INT, amount NUMERIC, payment_status TEXT);
+    CREATE TABLE {invoices} (id INTEGER PRIMARY KEY, booking_id INT, total_amount NUMERIC, status TEXT);
+"""
+
+
+class SQLiteCursor:
+    """Runs the archiver's MySQL statements on sqlite, minus the row locks."""
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    def execute(self, sql, params=()):
+        sql = sql.replace('FOR UPDATE SKIP LOCKED', '').replace('%s', '?')
+        self._cursor.execute(sql, tuple(str(p) if isinstance(p, date) else p for p in params))
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+def database():
+    conn = sqlite3.connect(':memory:')
+    for tables in (archive.LIVE_TABLES, archive.ARCHIVE_TABLES):
+        conn.executescript(SCHEMA.format(**tables))
+    conn.executescript("""
+        INSERT INTO bookings VALUES (1, 7, '2025-01-10', 'confirmed');
+        INSERT INTO payments VALUES (10, 1, 250, 'completed');
+        INSERT INTO invoices VALUES (20, 1, 295, 'sent');
+
+        INSERT INTO bookings VALUES (2, 7, '2025-01-12', 'pending');
+        INSERT INTO payments VALUES (11, 2, 100, 'pending');
+        INSERT INTO invoices VALUES (21, 2, 118, 'sent');
+
+        INSERT INTO bookings VALUES (3, 8, '2025-09-01', 'confirmed');
+    """)
+    return conn
+
+
+def ids(conn, table):
+    return [row[0] for row in conn.execute(f"SELECT id FROM {table} ORDER BY id")]
+
+
+def test_invoiced_paid_booking_is_archived():
+    conn = database()
+    moved = archive.archive_batch(SQLiteCursor(conn), date(2025, 6, 1))
+
+    assert moved == 1
+    assert ids(conn, 'bookings_archive') == [1]
+    assert ids(conn, 'payments_archive') == [10]
+    assert ids(conn, 'invoices_archive') == [20]
+    # The pending payment and the recent stay stay live
+    assert ids(conn, 'bookings') == [2, 3]
+    assert ids(conn, 'invoices') == [21]
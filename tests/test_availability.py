@@ -0,0 +1,34 @@
+import os
+import sys
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'booking-service'))
+
+import availability  # noqa: E402
+
+
+def test_stay_dates():
+    assert availability.stay_dates({'check_in': '2025-12-01', 'check_out': '2025-12-03'}) == \
+        (date(2025, 12, 1), date(2025, 12, 3))
+
+
+@pytest.mark.parametrize('args, message', [
+    ({}, "check_in and check_out are required"),
+    ({'check_in': '2025-12-01'}, "check_in and check_out are required"),
+    ({'check_in': '2025-12-01', 'check_out': '03/12/2025'}, "must be dates"),
+    ({'check_in': '2025-02-30', 'check_out': '2025-03-02'}, "must be dates"),
+    ({'check_in': '2025-12-03', 'check_out': '2025-12-03'}, "check_out must be after check_in"),
+])
+def test_stay_dates_rejects_bad_params(args, message):
+    with pytest.raises(ValueError, match=message):
+        availability.stay_dates(args)
+
+
+def test_stay_dates_of_a_booking_body():
+    body = {'check_in_date': '2025-12-01', 'check_out_date': '2025-12-03'}
+    assert availability.stay_dates(body, 'check_in_date', 'check_out_date') == \
+        (date(2025, 12, 1), date(2025, 12, 3))
+    with pytest.raises(ValueError, match="check_in_date and check_out_date must be dates"):
+        availability.stay_dates({**body, 'check_in_date': '1/12/2025'}, 'check_in_date', 'check_out_date')
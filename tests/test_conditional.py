@@ -0,0 +1,65 @@
+from flask import Flask
+
+from common import conditional
+
+
+class FakeConnection:
+    def cursor(self):
+        return self
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def versioned_app(monkeypatch, max_age):
+    reads = []
+    version = {'hotels': 1}
+
+    def read_versions(cursor, tables):
+        reads.append(tuple(tables))
+        return f"v{version['hotels']}", None
+
+    def bump_versions(cursor, *tables):
+        version['hotels'] += 1
+
+    monkeypatch.setattr(conditional, 'read_versions', read_versions)
+    monkeypatch.setattr(conditional, 'bump_versions', bump_versions)
+    monkeypatch.setattr(conditional, '_versions', {})
+
+    app = Flask(__name__)
+
+    @app.route('/hotels', methods=['GET'])
+    @conditional.conditional(FakeConnection, 'hotels', max_age=max_age)
+    def hotels():
+        return {'hotels': []}
+
+    @app.route('/hotels', methods=['POST'])
+    @conditional.changes(FakeConnection, 'hotels')
+    def add_hotel():
+        return {'message': 'added'}, 201
+
+    return app.test_client(), reads
+
+
+def test_max_age_reuses_versions_until_a_local_write(monkeypatch):
+    client, reads = versioned_app(monkeypatch, max_age=60)
+
+    first = client.get('/hotels')
+    assert client.get('/hotels', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert len(reads) == 1
+
+    client.post('/hotels')
+    after = client.get('/hotels', headers={'If-None-Match': first.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != first.headers['ETag']
+    assert len(reads) == 2
+
+
+def test_without_max_age_versions_are_read_every_request(monkeypatch):
+    client, reads = versioned_app(monkeypatch, max_age=0)
+    client.get('/hotels')
+    client.get('/hotels')
+    assert len(reads) == 2
@@ -0,0 +1,54 @@
+import json
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+
+from common import fast_json
+
+# (name, MySQL type code) as in cursor.description
+COLUMNS = [('id', 3), ('name', 253), ('location', 253), ('price', 246),
+           ('check_in', 10), ('created_at', 7)]
+
+ROWS = [
+    (1, 'Hôtel Élysée', 'Zürich', Decimal('189.50'), date(2025, 12, 1), datetime(2025, 10, 5, 14, 30, 2)),
+    (2, '東京ホテル', 'Tōkyō 🏯', Decimal('12000.00'), None, datetime(2025, 1, 31, 0, 0, 0)),
+    (3, 'Plain', 'Goa', None, date(2024, 2, 29), datetime(2025, 3, 9, 23, 59, 59, tzinfo=timezone.utc)),
+]
+
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+
+def flask_body(app, value):
+    with app.app_context():
+        return app.json.response(value).get_data()
+
+
+def dict_rows():
+    names = [name for name, _ in COLUMNS]
+    return [dict(zip(names, row)) for row in ROWS]
+
+
+def test_row_encoder_parses_like_flask_with_non_ascii(app):
+    expected = flask_body(app, dict_rows())
+    body = fast_json.RowEncoder(COLUMNS).encode(ROWS)
+
+    assert json.loads(body) == json.loads(expected)
+    if fast_json.orjson is not None:
+        # Flask escapes non-ASCII text, orjson writes it as UTF-8
+        assert body != expected.rstrip(b'\n')
+        assert 'Zürich'.encode() in body
+
+
+def test_fast_provider_parses_like_flask_with_non_ascii(app):
+    fast_app = Flask(__name__)
+    fast_app.json = fast_json.FastJSONProvider(fast_app)
+
+    expected = flask_body(app, dict_rows())
+    assert json.loads(flask_body(fast_app, dict_rows())) == json.loads(expected)
+    with fast_app.app_context():
+        assert json.loads(fast_app.json.dumps({'name': 'Hôtel Élysée'})) == {'name': 'Hôtel Élysée'}
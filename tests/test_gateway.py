@@ -0,0 +1,63 @@
+import importlib.util
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def gateway():
+    spec = importlib.util.spec_from_file_location('gateway_app', os.path.join(ROOT, 'gateway-service', 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeResponse:
+    def __init__(self, body, headers=None):
+        self.status_code = 200
+        self._body = body
+        self.headers = headers or {}
+        self.cookies = {}
+
+    def json(self):
+        return self._body
+
+
+def test_hotel_page_forwards_and_relays_last_write(gateway, monkeypatch):
+    calls = []
+
+    def get(url, params=None, timeout=None, headers=None, cookies=None):
+        calls.append((url, headers, cookies))
+        if url.endswith('/rooms'):
+            return FakeResponse([], {'X-Last-Write': '1760000123.500'})
+        return FakeResponse({'id': 1})
+
+    monkeypatch.setattr(gateway.http, 'get', get)
+    client = gateway.app.test_client()
+    client.set_cookie('db_last_write', '1760000100.000')
+    response = client.get('/pages/hotels/1', headers={'X-Last-Write': '1760000100.000'})
+
+    assert response.status_code == 200
+    assert len(calls) == 4
+    for _, headers, cookies in calls:
+        assert headers == {'X-Last-Write': '1760000100.000'}
+        assert cookies == {'db_last_write': '1760000100.000'}
+    assert response.headers['X-Last-Write'] == '1760000123.500'
+    assert 'db_last_write=1760000123.500' in response.headers['Set-Cookie']
+
+
+def test_hotel_page_without_last_write_sends_none(gateway, monkeypatch):
+    calls = []
+
+    def get(url, params=None, timeout=None, headers=None, cookies=None):
+        calls.append((headers, cookies))
+        return FakeResponse({'id': 1})
+
+    monkeypatch.setattr(gateway.http, 'get', get)
+    response = gateway.app.test_client().get('/pages/hotels/1')
+
+    assert response.status_code == 200
+    assert set(calls) == {(None, None)}
+    assert 'X-Last-Write' not in response.headers
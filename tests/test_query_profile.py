@@ -0,0 +1,43 @@
+import logging
+
+import pytest
+from flask import Flask
+
+from common import query_profile
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(query_profile, 'profile', query_profile.QueryProfile(slow_ms=10))
+    app = Flask(__name__)
+    query_profile.register_query_report(app)
+    return app
+
+
+def test_report_only_from_localhost_without_token(app, monkeypatch):
+    monkeypatch.setattr(query_profile, 'QUERY_PROFILE_TOKEN', '')
+    client = app.test_client()
+    assert client.get('/debug/queries').status_code == 200
+    remote = {'REMOTE_ADDR': '10.0.0.8'}
+    assert client.get('/debug/queries', environ_base=remote).status_code == 403
+    assert client.delete('/debug/queries', environ_base=remote).status_code == 403
+
+
+def test_report_requires_token_when_set(app, monkeypatch):
+    monkeypatch.setattr(query_profile, 'QUERY_PROFILE_TOKEN', 's3cret')
+    client = app.test_client()
+    remote = {'REMOTE_ADDR': '10.0.0.8'}
+    assert client.get('/debug/queries').status_code == 403
+    assert client.get('/debug/queries', headers={'Authorization': 'Bearer wrong'},
+                      environ_base=remote).status_code == 403
+    assert client.get('/debug/queries', headers={'Authorization': 'Bearer s3cret'},
+                      environ_base=remote).status_code == 200
+
+
+def test_slow_query_is_logged(caplog):
+    profile = query_profile.QueryProfile(slow_ms=10)
+    with caplog.at_level(logging.WARNING, logger='common.query_profile'):
+        profile.record("INSERT INTO t VALUES (1)", (), 0.05)
+        profile.record("INSERT INTO t VALUES (2)", (), 0.001)
+    assert [record.getMessage() for record in caplog.records] == [
+        f"Slow query (50.0 ms) [{profile.report()['queries'][0]['id']}]: INSERT INTO t VALUES (?)"]
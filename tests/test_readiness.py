@@ -0,0 +1,76 @@
+import threading
+import time
+
+from common import db, readiness
+
+
+class FakeConnection:
+    in_transaction = False
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+def saturated_pool(size):
+    pool = db.ConnectionPool({}, size=size, timeout=5)
+    pool._connect = lambda: (FakeConnection(), time.monotonic())
+    return pool
+
+
+def test_pool_smaller_than_thread_count_sheds():
+    pool = saturated_pool(1)
+    held = pool.acquire()
+    assert not readiness.overloaded(pool.stats())
+
+    # Every other request thread of the worker queues for the one connection
+    waiters = [threading.Thread(target=lambda: pool.acquire().close())
+               for _ in range(readiness.WEB_THREADS - 1)]
+    for thread in waiters:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while pool.stats()['waiting'] < len(waiters) and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert readiness.DB_SHED_WAITING <= readiness.WEB_THREADS - 1
+    assert readiness.overloaded(pool.stats())
+    held.close()
+    for thread in waiters:
+        thread.join(2)
+    assert not readiness.overloaded(pool.stats())
+
+
+def test_long_wait_sheds_a_single_waiter(monkeypatch):
+    monkeypatch.setattr(readiness, 'DB_SHED_WAITING', 100)
+    monkeypatch.setattr(readiness, 'DB_SHED_WAIT_SECONDS', 0.05)
+    pool = saturated_pool(1)
+    held = pool.acquire()
+    waiter = threading.Thread(target=lambda: pool.acquire().close())
+    waiter.start()
+    time.sleep(0.1)
+
+    assert pool.stats()['waiting'] == 1
+    assert readiness.overloaded(pool.stats())
+    held.close()
+    waiter.join(2)
+
+
+def test_shedding_returns_503(monkeypatch):
+    from flask import Flask
+
+    monkeypatch.setattr(readiness, 'DB_SHED_WAITING', 3)
+    monkeypatch.setattr(readiness, 'pool_stats', lambda: {'waiting': 3, 'longest_wait': 0})
+    app = Flask(__name__)
+    readiness.register_readiness(app, db.get_db_connection)
+
+    @app.route('/bookings')
+    def bookings():
+        return 'ok'
+
+    client = app.test_client()
+    response = client.get('/bookings')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.get('/live').status_code == 200
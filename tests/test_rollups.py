@@ -0,0 +1,67 @@
+import re
+from datetime import date, datetime
+
+from common import rollups
+
+TABLE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)')
+
+
+class FakeCursor:
+    """Answers the statements backfill() reads with; records the rest."""
+
+    def __init__(self, created_at, archive=True):
+        self.created_at = created_at
+        self.archive = archive
+        self.executed = []
+        self._result = None
+
+    def execute(self, sql, params=()):
+        self.executed.append((sql, tuple(params)))
+        if 'information_schema.tables' in sql:
+            self._result = (len(params) if self.archive else 0,)
+        elif 'MIN(first)' in sql:
+            values = [value for table in TABLE.findall(sql) for value in self.created_at.get(table, [])]
+            self._result = (min(values), max(values)) if values else (None, None)
+
+    def fetchone(self):
+        return self._result
+
+
+def upserts(cursor, table):
+    return [(sql, params) for sql, params in cursor.executed if f"INSERT INTO {table}" in sql]
+
+
+def test_backfill_includes_archived_rows():
+    cursor = FakeCursor({
+        'bookings': [datetime(2025, 6, 3, 10)],
+        'bookings_archive': [datetime(2025, 4, 20, 9)],
+        'payments': [datetime(2025, 6, 3, 11)],
+        'payments_archive': [datetime(2025, 4, 20, 10)],
+    })
+    rollups.backfill(cursor)
+
+    bookings = upserts(cursor, 'daily_booking_stats')
+    # April, from the archive, through June
+    assert [params[:2] for _, params in bookings] == [
+        (date(2025, 4, 1), date(2025, 5, 1)),
+        (date(2025, 5, 1), date(2025, 6, 1)),
+        (date(2025, 6, 1), date(2025, 7, 1)),
+    ]
+    for sql, params in bookings:
+        assert set(TABLE.findall(sql)) >= {'bookings', 'bookings_archive'}
+        assert len(params) == 4
+
+    revenue = upserts(cursor, 'daily_hotel_revenue')
+    assert revenue[0][1][:2] == (date(2025, 4, 1), date(2025, 5, 1))
+    for sql, _ in revenue:
+        assert set(TABLE.findall(sql)) >= {'payments', 'payments_archive', 'bookings_archive'}
+
+
+def test_backfill_before_archive_exists_reads_live_tables():
+    cursor = FakeCursor({'bookings': [datetime(2025, 6, 3, 10)]}, archive=False)
+    rollups.backfill(cursor)
+
+    bookings = upserts(cursor, 'daily_booking_stats')
+    assert len(bookings) == 1
+    assert '_archive' not in bookings[0][0]
+    assert upserts(cursor, 'daily_hotel_revenue') == []
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'user-service'))
+
+from common import session_tokens  # noqa: E402
+from sessions import SessionCache  # noqa: E402
+
+
+class FakeCursor:
+    def execute(self, sql, params=()):
+        pass
+
+
+def revocation_list(cutoffs=None):
+    revocations = session_tokens.RevocationList(get_connection=None, refresh_interval=0)
+    # As if loaded from session_cutoffs by another worker
+    revocations._cutoffs = dict(cutoffs or {})
+    revocations._loaded_at = time.time()
+    return revocations
+
+
+def test_revoke_user_evicts_cached_sessions_locally():
+    revocations = revocation_list()
+    cache = SessionCache(revocations=revocations)
+    cache.store('token-a', {'id': 7}, 3600)
+    cache.store('token-b', {'id': 8}, 3600)
+    assert cache.lookup('token-a') == (True, {'id': 7})
+
+    revocations.revoke_user(FakeCursor(), 7, 3600)
+
+    assert cache.lookup('token-a') == (False, None)
+    assert cache.lookup('token-b') == (True, {'id': 8})
+    assert cache.stats()['entries'] == 1
+
+
+def test_cutoff_loaded_from_another_worker_evicts_cached_session():
+    revocations = revocation_list()
+    cache = SessionCache(revocations=revocations)
+    cache.store('token-a', {'id': 7}, 3600)
+
+    # The next reload brings the cutoff written elsewhere
+    revocations._cutoffs = {7: int(time.time())}
+
+    assert cache.lookup('token-a') == (False, None)
+
+
+def test_session_cached_after_cutoff_is_kept():
+    revocations = revocation_list({7: int(time.time()) - 60})
+    cache = SessionCache(revocations=revocations)
+    cache.store('token-a', {'id': 7}, 3600)
+
+    assert cache.lookup('token-a') == (True, {'id': 7})
+
+
+def test_logout_elsewhere_evicts_cached_session():
+    revocations = revocation_list()
+    cache = SessionCache(revocations=revocations)
+    cache.store('token-a', {'id': 7}, 3600)
+    cache.store('token-b', {'id': 7}, 3600)
+
+    # The next reload brings the logout handled by another worker
+    revocations._revoked = frozenset([session_tokens.opaque_jti('token-a')])
+
+    assert cache.lookup('token-a') == (False, None)
+    assert cache.lookup('token-b') == (True, {'id': 7})
+
+
+def test_logout_revokes_opaque_token_locally():
+    revocations = revocation_list()
+    cache = SessionCache(revocations=revocations)
+    cache.store('token-a', {'id': 7}, 3600)
+
+    claims = session_tokens.opaque_claims('token-a', 7, 300)
+    assert len(claims['jti']) == 32 and 'token-a' not in claims['jti']
+    revocations.revoke(FakeCursor(), claims)
+
+    assert cache.lookup('token-a') == (False, None)
@@ -1,81 +1,55 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import mysql.connector
 import os
 import hashlib
 import uuid
 from datetime import datetime
+from common import session_tokens
+from common.db import get_db_connection, pool_stats
+from common.metrics import instrument_app
+from common.query_profile import register_query_report
+from common.readiness import register_readiness
+from common.replicas import get_read_connection, register_read_routing
+from common.conditional import bump_versions, changes, conditional
+from common.compression import register_compression
+from common.fast_json import FastJSONProvider
+from common.pagination import keyset_response
+from sessions import SESSION_CACHE_MAX_TTL, SessionCache, start_sweeper
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)
+instrument_app(app, 'user-service')
+register_query_report(app)
+register_readiness(app, get_db_connection)
+register_read_routing(app)
+register_compression(app)
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'mysql-db'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'password'),
-    'database': os.getenv('DB_NAME', 'hotel_booking'),
-    'port': int(os.getenv('DB_PORT', 3306))
-}
+SESSION_LIFETIME = 24 * 3600  # seconds
+revocations = session_tokens.RevocationList(get_db_connection)
+session_cache = SessionCache(revocations=revocations)
 
-def get_db_connection():
-    return mysql.connector.connect(**DB_CONFIG)
+# opaque: random token backed by a user_sessions row (the default)
+# signed: HMAC-signed token validated without the database
+SESSION_TOKEN_MODE = session_tokens.SESSION_TOKEN_MODE
+if SESSION_TOKEN_MODE not in session_tokens.TOKEN_MODES:
+    raise RuntimeError(f"SESSION_TOKEN_MODE must be one of {', '.join(session_tokens.TOKEN_MODES)}")
+if SESSION_TOKEN_MODE == 'signed' and not session_tokens.SESSION_SECRET:
+    raise RuntimeError("SESSION_TOKEN_MODE=signed requires SESSION_SECRET")
 
-def init_db():
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Create users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                first_name VARCHAR(255),
-                last_name VARCHAR(255),
-                phone VARCHAR(20),
-                is_admin BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create sessions table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                user_id INT,
-                session_token VARCHAR(255) UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-        
-        # Create admin user if not exists
-        cursor.execute("SELECT COUNT(*) FROM users WHERE is_admin = TRUE")
-        admin_count = cursor.fetchone()[0]
-        
-        if admin_count == 0:
-            admin_password = hashlib.sha256("admin123".encode()).hexdigest()
-            cursor.execute("""
-                INSERT INTO users (username, email, password_hash, first_name, last_name, is_admin)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, ("admin", "admin@hotel.com", admin_password, "Admin", "User", True))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print("User database initialized successfully")
-    except Exception as e:
-        print(f"Error initializing user database: {e}")
+@app.before_request
+def ensure_session_sweeper():
+    start_sweeper(get_db_connection)
+    revocations.start_refresher()
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "user-service"})
+    return jsonify({"status": "healthy", "service": "user-service", "db_pool": pool_stats(),
+                    "session_cache": session_cache.stats(), "session_token_mode": SESSION_TOKEN_MODE,
+                    "session_revocations": revocations.stats()})
 
 @app.route('/users/register', methods=['POST'])
+@changes(get_db_connection, 'users')
 def register_user():
     try:
         data = request.get_json()
@@ -86,6 +60,8 @@ def register_user():
         cursor.execute("SELECT id FROM users WHERE email = %s OR username = %s", 
                       (data['email'], data['username']))
         if cursor.fetchone():
+            cursor.close()
+            conn.close()
             return jsonify({"error": "User already exists"}), 400
         
         # Hash password
@@ -130,41 +106,53 @@ def login_user():
             
             user_id = cursor.lastrowid
             conn.commit()
+            bump_versions(cursor, 'users')
+            conn.commit()
             
             # Fetch the newly created user
             cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
             user = cursor.fetchone()
         
         # Create session token
-        session_token = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO user_sessions (user_id, session_token, expires_at)
-            VALUES (%s, %s, DATE_ADD(NOW(), INTERVAL 24 HOUR))
-        """, (user['id'], session_token))
+        if SESSION_TOKEN_MODE == 'signed':
+            # Nothing to store; the token carries its own claims
+            session_token, _ = session_tokens.issue(user['id'], user['is_admin'], SESSION_LIFETIME)
+        else:
+            session_token = str(uuid.uuid4())
+            cursor.execute("""
+                INSERT INTO user_sessions (user_id, session_token, expires_at)
+                VALUES (%s, %s, DATE_ADD(NOW(), INTERVAL %s SECOND))
+            """, (user['id'], session_token, SESSION_LIFETIME))
+            conn.commit()
         
-        conn.commit()
         cursor.close()
         conn.close()
         
+        session_user = {
+            "id": user['id'],
+            "username": user['username'],
+            "email": user['email'],
+            "first_name": user['first_name'],
+            "last_name": user['last_name'],
+            "is_admin": user['is_admin']
+        }
+        if SESSION_TOKEN_MODE == 'opaque':
+            # The first validation after login is then served from the cache
+            session_cache.store(session_token, session_user, SESSION_LIFETIME)
+        
         return jsonify({
             "message": "Login successful",
-            "user": {
-                "id": user['id'],
-                "username": user['username'],
-                "email": user['email'],
-                "first_name": user['first_name'],
-                "last_name": user['last_name'],
-                "is_admin": user['is_admin']
-            },
+            "user": session_user,
             "session_token": session_token
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/users/profile/<int:user_id>', methods=['GET'])
+@conditional(get_read_connection, 'users')
 def get_user_profile(user_id):
     try:
-        conn = get_db_connection()
+        conn = get_read_connection()
         cursor = conn.cursor(dictionary=True)
         cursor.execute("SELECT id, username, email, first_name, last_name, phone, is_admin FROM users WHERE id = %s", (user_id,))
         user = cursor.fetchone()
@@ -181,17 +169,34 @@ def get_user_profile(user_id):
 @app.route('/users/validate/<session_token>', methods=['GET'])
 def validate_session(session_token):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT u.id, u.username, u.email, u.first_name, u.last_name, u.is_admin
-            FROM user_sessions s
-            JOIN users u ON s.user_id = u.id
-            WHERE s.session_token = %s AND s.expires_at > NOW()
-        """, (session_token,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        # Signed tokens are checked without the database in either mode, and
+        # opaque ones still work after switching to signed
+        if session_tokens.looks_signed(session_token):
+            claims = session_tokens.verify(session_token)
+            if claims is None or revocations.is_revoked(claims):
+                return jsonify({"valid": False}), 401
+            return jsonify({"valid": True, "user": {"id": claims['sub'], "is_admin": claims['adm']},
+                            "expires_in": claims['exp'] - int(datetime.now().timestamp())})
+        
+        found, user = session_cache.lookup(session_token)
+        if not found:
+            conn = get_db_connection()
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("""
+                SELECT u.id, u.username, u.email, u.first_name, u.last_name, u.is_admin,
+                       TIMESTAMPDIFF(SECOND, NOW(), s.expires_at) as expires_in
+                FROM user_sessions s
+                JOIN users u ON s.user_id = u.id
+                WHERE s.session_token = %s AND s.expires_at > NOW()
+            """, (session_token,))
+            user = cursor.fetchone()
+            cursor.close()
+            conn.close()
+            
+            if user:
+                session_cache.store(session_token, user, user.pop('expires_in'))
+            else:
+                session_cache.store_invalid(session_token)
         
         if user:
             return jsonify({"valid": True, "user": user})
@@ -200,19 +205,66 @@ def validate_session(session_token):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/users', methods=['GET'])
-def get_all_users():
+@app.route('/users/logout', methods=['POST'])
+def logout_user():
     try:
+        data = request.get_json()
+        if session_tokens.looks_signed(data['session_token']):
+            claims = session_tokens.verify(data['session_token'])
+            # An invalid or expired token is already logged out
+            if claims:
+                conn = get_db_connection()
+                cursor = conn.cursor()
+                revocations.revoke(cursor, claims)
+                conn.commit()
+                cursor.close()
+                conn.close()
+            return jsonify({"message": "Logout successful"})
+        
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, username, email, first_name, last_name, phone, is_admin, created_at FROM users ORDER BY created_at DESC")
-        users = cursor.fetchall()
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id FROM user_sessions WHERE session_token = %s FOR UPDATE",
+                       (data['session_token'],))
+        session = cursor.fetchone()
+        cursor.execute("DELETE FROM user_sessions WHERE session_token = %s", (data['session_token'],))
+        if session:
+            # Other workers drop their cached copy on the next revocation reload
+            revocations.revoke(cursor, session_tokens.opaque_claims(data['session_token'], session[0],
+                                                                    SESSION_CACHE_MAX_TTL))
+        conn.commit()
         cursor.close()
         conn.close()
-        return jsonify(users)
+        session_cache.evict(data['session_token'])
+        return jsonify({"message": "Logout successful"})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Force-expire every session of a user, signed or opaque
+@app.route('/users/<int:user_id>/sessions/revoke', methods=['POST'])
+def revoke_user_sessions(user_id):
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        revocations.revoke_user(cursor, user_id, SESSION_LIFETIME)
+        cursor.execute("DELETE FROM user_sessions WHERE user_id = %s", (user_id,))
+        removed = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        conn.close()
+        # Cached opaque sessions of the user are dropped through the cutoff
+        return jsonify({"message": "Sessions revoked", "opaque_sessions_removed": removed})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/users', methods=['GET'])
+@conditional(get_read_connection, 'users')
+def get_all_users():
+    try:
+        return keyset_response(app, get_read_connection,
+                               "SELECT id, username, email, first_name, last_name, phone, is_admin, created_at FROM users")
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    init_db()
-    app.run(host='0.0.0.0', port=5003, debug=True)
\ No newline at end of file
+    # Development server only; the container runs gunicorn (see common/gunicorn_conf.py)
+    app.run(host='0.0.0.0', port=5003, debug=os.getenv('FLASK_DEBUG') == '1')
\ No newline at end of file
@@ -0,0 +1,137 @@
+"""Session token cache and expired-session sweeper for the user service.
+
+Validated sessions are cached per worker process until the session
+expires, capped at SESSION_CACHE_MAX_TTL. Unknown or expired tokens are
+cached as misses for SESSION_NEGATIVE_TTL seconds.
+
+Logout and force-expiry (POST /users/<id>/sessions/revoke) go through the
+revocation list (common/session_tokens.py) as well: logout revokes the
+token's digest for SESSION_CACHE_MAX_TTL, force-expiry writes a cutoff
+for the user. A cached session that either covers is evicted on its next
+lookup and read again from user_sessions, which no longer has it: at
+once in the worker that handled the request, and within
+SESSION_REVOCATION_REFRESH seconds elsewhere.
+"""
+import os
+import threading
+import time
+
+from common import session_tokens
+from common.cache import LocalBackend
+
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', 100000))
+SESSION_CACHE_MAX_TTL = int(os.getenv('SESSION_CACHE_MAX_TTL', 300))
+SESSION_NEGATIVE_TTL = int(os.getenv('SESSION_NEGATIVE_TTL', 30))
+SESSION_SWEEP_INTERVAL = int(os.getenv('SESSION_SWEEP_INTERVAL', 600))
+SESSION_SWEEP_BATCH = int(os.getenv('SESSION_SWEEP_BATCH', 1000))
+
+_INVALID = object()
+
+
+class SessionCache:
+    def __init__(self, max_entries=SESSION_CACHE_SIZE, revocations=None):
+        self._entries = LocalBackend(max_entries)
+        self._revocations = revocations
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def lookup(self, token):
+        """Return ``(found, user)``; user is None for a cached invalid token."""
+        entry = self._entries.get(token)
+        if entry is not None and entry is not _INVALID:
+            user, cached_at = entry
+            # Cached in the second of the cutoff or before it, or logged out
+            if self._revocations and (self._revocations.is_cut_off(user['id'], int(cached_at))
+                                      or self._revocations.is_jti_revoked(session_tokens.opaque_jti(token))):
+                self.evict(token)
+                entry = None
+        if entry is None:
+            self._count('misses')
+            return False, None
+        if entry is _INVALID:
+            self._count('negative_hits')
+            return True, None
+        self._count('hits')
+        return True, user
+
+    def store(self, token, user, expires_in):
+        ttl = min(expires_in, SESSION_CACHE_MAX_TTL)
+        if ttl > 0:
+            self._count('evictions', self._entries.set(token, (user, time.time()), ttl))
+
+    def store_invalid(self, token):
+        self._count('evictions', self._entries.set(token, _INVALID, SESSION_NEGATIVE_TTL))
+
+    def evict(self, token):
+        self._entries.delete([token])
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        return {'entries': self._entries.size(), **counters}
+
+
+def sweep_expired(get_connection):
+    """Delete expired sessions in batches; returns the number of rows removed.
+
+    Revocations of signed tokens that have expired are dropped as well.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    removed = 0
+    try:
+        # Only one worker across all replicas sweeps at a time
+        cursor.execute("SELECT GET_LOCK('user_sessions_sweep', 0)")
+        if not cursor.fetchone()[0]:
+            return 0
+        try:
+            removed += session_tokens.purge_expired(cursor)
+            conn.commit()
+            while True:
+                cursor.execute("""
+                    DELETE FROM user_sessions
+                    WHERE expires_at < NOW()
+                    LIMIT %s
+                """, (SESSION_SWEEP_BATCH,))
+                deleted = cursor.rowcount
+                conn.commit()
+                removed += deleted
+                if deleted < SESSION_SWEEP_BATCH:
+                    return removed
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK('user_sessions_sweep')")
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+_sweeper_pid = None
+_sweeper_lock = threading.Lock()
+
+
+def start_sweeper(get_connection, interval=SESSION_SWEEP_INTERVAL):
+    # Started lazily from a request so each forked worker gets its own thread
+    global _sweeper_pid
+    if interval <= 0 or _sweeper_pid == os.getpid():
+        return
+    with _sweeper_lock:
+        if _sweeper_pid == os.getpid():
+            return
+        _sweeper_pid = os.getpid()
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                removed = sweep_expired(get_connection)
+                if removed:
+                    print(f"Removed {removed} expired sessions")
+            except Exception as e:
+                print(f"Error sweeping expired sessions: {e}")
+
+    threading.Thread(target=run, name='session-sweeper', daemon=True).start()